@@ -1,11 +1,77 @@
 # File: custom_components/apc_pdu/__init__.py
 
+import asyncio
+import itertools
 import logging
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers import config_validation as cv
-from .const import DOMAIN
+from .cache import (
+    async_discover_metadata,
+    async_get_metadata_cache,
+    async_revalidate_metadata,
+    cache_key,
+    entry_pdus,
+    metadata_from_config,
+    pdu_config,
+)
+from .const import (
+    DOMAIN,
+    FLEET_DISCOVERY_CONCURRENCY,
+    STARTUP_POLL_STEP,
+    STARTUP_POLL_SPREAD,
+    CONF_CURRENT_DEADBAND,
+    CONF_POWER_DEADBAND,
+    CONF_PERCENT_DEADBAND,
+    CONF_HEARTBEAT,
+    DEFAULT_CURRENT_DEADBAND,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_PERCENT_DEADBAND,
+    DEFAULT_HEARTBEAT,
+    CONF_CURRENT_INTERVAL,
+    CONF_OUTLET_INTERVAL,
+    CONF_METADATA_INTERVAL,
+    CONF_PROBE_INTERVAL,
+    CONF_METRICS,
+    CONF_VOLTAGE,
+    CONF_POWER_FACTOR,
+    CONF_ENERGY_METHOD,
+    DEFAULT_VOLTAGE,
+    DEFAULT_POWER_FACTOR,
+    ENERGY_METHOD_TRAPEZOIDAL,
+    CONF_GUARD_LIMIT,
+    CONF_GUARD_HYSTERESIS,
+    CONF_GUARD_SHED_ORDER,
+    DEFAULT_GUARD_LIMIT,
+    DEFAULT_GUARD_HYSTERESIS,
+    CONF_TIMEOUT,
+    CONF_RETRIES,
+    CONF_MAX_REPETITIONS,
+    CONF_MAX_IN_FLIGHT,
+    CONF_CONFIRM_MODE,
+    CONF_CONFIRM_DELAY,
+    CONF_CONFIRM_TIMEOUT,
+    CONFIRM_READ_BACK,
+    DEFAULT_BULK_REPETITIONS,
+    SENSOR_UPDATE_INTERVAL,
+    SWITCH_UPDATE_INTERVAL,
+    METADATA_UPDATE_INTERVAL,
+    PROBE_UPDATE_INTERVAL,
+    SNMP_TIMEOUT,
+    SNMP_RETRIES,
+    SNMP_MAX_IN_FLIGHT,
+    SET_CONFIRM_DELAY,
+    SET_CONFIRM_TIMEOUT,
+)
+from .coordinator import APCPDUCoordinator
+from .fleet import FleetScheduler
+from .guard import parse_shed_order
+from .metrics import async_register_metrics_view
+from .polling import PublishPolicy, DATA_CURRENT, DATA_OUTLETS, DATA_METADATA, DATA_PROBES
+from .services import async_setup_services
+from .snmp import APCPDUSession, no_capabilities, snmp_credentials
+from .trap import async_get_trap_listener, async_release_trap_listener
 
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
@@ -13,14 +79,86 @@ _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["switch", "sensor"]
 
+# Counter handing out first-poll slots to PDUs as they are set up
+DATA_STARTUP_SLOTS = f"{DOMAIN}_startup_slots"
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the APC PDU component."""
     _LOGGER.info("Setting up APC PDU component")
+    await async_setup_services(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up APC PDU from a config entry."""
-    _LOGGER.info("Setting up APC PDU config entry for %s", entry.data.get("host"))
+    fleet = bool(entry.data.get("fleet"))
+    configs = entry_pdus(entry)
+    _LOGGER.info(
+        "Setting up APC PDU config entry for %s",
+        f"{len(configs)} PDUs" if fleet else entry.data.get("host"),
+    )
+    
+    cache = await async_get_metadata_cache(hass)
+    pdus = {}
+    
+    async def close_sessions() -> None:
+        for pdu in pdus.values():
+            await pdu["session"].async_close()
+    
+    # Fleet PDUs are set up in parallel, a few at a time
+    semaphore = asyncio.Semaphore(FLEET_DISCOVERY_CONCURRENCY)
+    
+    async def setup_pdu(config) -> None:
+        async with semaphore:
+            pdus[config["host"]] = await _async_setup_pdu(
+                hass, entry, config, cache, managed=fleet
+            )
+    
+    try:
+        await asyncio.gather(*(setup_pdu(config) for config in configs))
+    except Exception:
+        await close_sessions()
+        raise
+    
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {"pdus": pdus, "scheduler": None}
+    coordinators = [pdu["coordinator"] for pdu in pdus.values()]
+    
+    # No SNMP before the entities exist: they start from their last known
+    # state, and each PDU's first poll runs in the background a slot after
+    # the previous one, so a PDU that is down only leaves its own entities
+    # unavailable and never holds up startup.
+    slots = hass.data.setdefault(DATA_STARTUP_SLOTS, itertools.count())
+    for coordinator in coordinators:
+        cancel = coordinator.defer_first_refresh(next(slots) * STARTUP_POLL_STEP % STARTUP_POLL_SPREAD)
+        if cancel is not None:
+            entry.async_on_unload(cancel)
+    
+    if entry.data.get("traps"):
+        # Push outlet changes from SNMP traps; polling drops to reconciliation
+        try:
+            listener = await async_get_trap_listener(hass)
+            for pdu in pdus.values():
+                session = pdu["session"]
+                try:
+                    address = await session.async_resolve()
+                except OSError as e:
+                    _LOGGER.warning("Could not resolve %s for SNMP traps, polling only: %s", session.host, e)
+                    continue
+                listener.register(address, session.community, pdu["coordinator"])
+                pdu["coordinator"].policy.push_enabled = True
+        except OSError as e:
+            _LOGGER.warning("Could not start SNMP trap listener, polling only: %s", e)
+    
+    if fleet:
+        # One staggered poll loop instead of a timer per PDU
+        scheduler = FleetScheduler(hass, coordinators)
+        scheduler.async_start(entry)
+        hass.data[DOMAIN][entry.entry_id]["scheduler"] = scheduler
+    
+    if entry.options.get(CONF_METRICS):
+        async_register_metrics_view(hass)
+    
+    # Tuning changed in the options applies without reloading the entry
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
     
     try:
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -28,15 +166,169 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         return True
     except Exception as e:
         _LOGGER.exception("Failed to forward setup to platforms: %s", e)
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        _release_traps(hass, pdus)
+        await close_sessions()
         return False
 
+async def _async_setup_pdu(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    config,
+    cache,
+    managed: bool = False,
+) -> dict:
+    """Create the session and coordinator of one PDU in an entry."""
+    host = config["host"]
+    
+    # One persistent SNMP session per PDU, shared by all platforms
+    options = entry.options
+    session = APCPDUSession(
+        host,
+        entry.data["community"],
+        timeout=options.get(CONF_TIMEOUT, SNMP_TIMEOUT),
+        retries=options.get(CONF_RETRIES, SNMP_RETRIES),
+        max_in_flight=options.get(CONF_MAX_IN_FLIGHT, SNMP_MAX_IN_FLIGHT),
+        credentials=snmp_credentials(entry.data),
+    )
+    
+    # Build everything from cached metadata when we have it, so a restart
+    # needs no table walks. A background probe rediscovers only if the PDU
+    # rebooted or was swapped.
+    metadata = cache.get(cache_key(config))
+    discovered = metadata is not None
+    if not discovered:
+        # Setup never waits on the PDU: metering support is discovered once
+        # it answers, and the entry reloaded if it has any
+        metadata = metadata_from_config(config, no_capabilities())
+    else:
+        entry.async_create_background_task(
+            hass,
+            async_revalidate_metadata(hass, entry, config, session, cache, metadata),
+            f"{DOMAIN}_revalidate_{entry.entry_id}_{host}",
+        )
+    capabilities = metadata["capabilities"]
+    
+    # One coordinator polls all outlet states, the total current and metering
+    coordinator = APCPDUCoordinator(
+        hass,
+        session,
+        int(metadata["outlet_count"]),
+        capabilities,
+        managed=managed,
+    )
+    _apply_options(entry, session, coordinator)
+    
+    @callback
+    def _async_cache_outlet_names() -> None:
+        """Keep cached outlet names in step with the periodic metadata poll."""
+        names = (coordinator.data or {}).get("outlet_names")
+        if names:
+            names = {str(num): name for num, name in names.items()}
+            if names != metadata["outlet_names"]:
+                metadata["outlet_names"] = names
+                cache.async_set(cache_key(pdu_config(entry, host)), metadata)
+    
+    entry.async_on_unload(coordinator.async_add_listener(_async_cache_outlet_names))
+    
+    async def _async_discover() -> None:
+        nonlocal discovered
+        # An incomplete walk is tried again after the next successful poll
+        discovered = await async_discover_metadata(hass, entry, session, cache, metadata)
+    
+    @callback
+    def _async_discover_when_reachable() -> None:
+        """Start discovering the capabilities after the first successful poll."""
+        nonlocal discovered
+        if discovered or not coordinator.last_update_success:
+            return
+        discovered = True
+        entry.async_create_background_task(
+            hass, _async_discover(), f"{DOMAIN}_discover_{entry.entry_id}_{host}"
+        )
+    
+    if not discovered:
+        entry.async_on_unload(coordinator.async_add_listener(_async_discover_when_reachable))
+    
+    return {
+        "session": session,
+        "coordinator": coordinator,
+        "capabilities": capabilities,
+        "metadata": metadata,
+    }
+
+def _publish_policy(entry: ConfigEntry) -> PublishPolicy:
+    """Build the sensor publishing policy from the entry options."""
+    options = entry.options
+    return PublishPolicy(
+        current_deadband=options.get(CONF_CURRENT_DEADBAND, DEFAULT_CURRENT_DEADBAND),
+        power_deadband=options.get(CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND),
+        percent_deadband=options.get(CONF_PERCENT_DEADBAND, DEFAULT_PERCENT_DEADBAND),
+        heartbeat=options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT),
+    )
+
+def _apply_options(
+    entry: ConfigEntry, session: APCPDUSession, coordinator: APCPDUCoordinator
+) -> None:
+    """Apply the polling, SNMP and publishing options to a running PDU."""
+    options = entry.options
+    session.configure(
+        options.get(CONF_TIMEOUT, SNMP_TIMEOUT),
+        options.get(CONF_RETRIES, SNMP_RETRIES),
+        options.get(CONF_MAX_IN_FLIGHT, SNMP_MAX_IN_FLIGHT),
+    )
+    coordinator.apply_options(
+        intervals={
+            DATA_CURRENT: options.get(CONF_CURRENT_INTERVAL, SENSOR_UPDATE_INTERVAL),
+            DATA_OUTLETS: options.get(CONF_OUTLET_INTERVAL, SWITCH_UPDATE_INTERVAL),
+            DATA_METADATA: options.get(CONF_METADATA_INTERVAL, METADATA_UPDATE_INTERVAL),
+            DATA_PROBES: options.get(CONF_PROBE_INTERVAL, PROBE_UPDATE_INTERVAL),
+        },
+        max_repetitions=options.get(CONF_MAX_REPETITIONS, DEFAULT_BULK_REPETITIONS),
+        confirm_mode=options.get(CONF_CONFIRM_MODE, CONFIRM_READ_BACK),
+        confirm_delay=options.get(CONF_CONFIRM_DELAY, SET_CONFIRM_DELAY),
+        confirm_timeout=options.get(CONF_CONFIRM_TIMEOUT, SET_CONFIRM_TIMEOUT),
+        publish=_publish_policy(entry),
+        voltage=options.get(CONF_VOLTAGE, DEFAULT_VOLTAGE),
+        power_factor=options.get(CONF_POWER_FACTOR, DEFAULT_POWER_FACTOR),
+        energy_method=options.get(CONF_ENERGY_METHOD, ENERGY_METHOD_TRAPEZOIDAL),
+        guard_limit=options.get(CONF_GUARD_LIMIT, DEFAULT_GUARD_LIMIT),
+        guard_hysteresis=options.get(CONF_GUARD_HYSTERESIS, DEFAULT_GUARD_HYSTERESIS),
+        shed_order=parse_shed_order(options.get(CONF_GUARD_SHED_ORDER, "")),
+    )
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Retune the running sessions and coordinators after an options change."""
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if entry_data is None:
+        return
+    for pdu in entry_data["pdus"].values():
+        _apply_options(entry, pdu["session"], pdu["coordinator"])
+        if entry_data["scheduler"] is None:
+            # Restart the coordinator's timer on the new intervals
+            await pdu["coordinator"].async_request_refresh()
+    if entry_data["scheduler"] is not None:
+        entry_data["scheduler"].reschedule()
+    if entry.options.get(CONF_METRICS):
+        async_register_metrics_view(hass)
+
+def _release_traps(hass: HomeAssistant, pdus: dict) -> None:
+    for pdu in pdus.values():
+        if pdu["coordinator"].policy.push_enabled:
+            async_release_trap_listener(hass, pdu["session"].address)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    _LOGGER.info("Unloading APC PDU config entry for %s", entry.data.get("host"))
+    _LOGGER.info("Unloading APC PDU config entry %s", entry.title)
     
     try:
-        await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-        return True
+        unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+        if unload_ok:
+            pdus = hass.data[DOMAIN].pop(entry.entry_id)["pdus"]
+            _release_traps(hass, pdus)
+            for pdu in pdus.values():
+                await pdu["session"].async_close()
+        return unload_ok
     except Exception as e:
         _LOGGER.exception("Failed to unload APC PDU entry: %s", e)
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,240 @@
+# File: custom_components/apc_pdu/cache.py
+
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    METADATA_STORAGE_KEY,
+    METADATA_STORAGE_VERSION,
+    METADATA_SAVE_DELAY,
+    UPTIME_TOLERANCE,
+)
+from .snmp import (
+    APCPDUSession,
+    discover_capabilities,
+    discover_device_info,
+    discover_outlets,
+    probe_device,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_METADATA_CACHE = f"{DOMAIN}_metadata_cache"
+
+
+class _MetadataStore(Store):
+    """Metadata storage that drops records of older versions."""
+
+    async def _async_migrate_func(
+        self, old_major_version: int, old_minor_version: int, old_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        # Version 1 records predate probe discovery. Dropping them makes
+        # each PDU rediscover its capabilities in the background.
+        _LOGGER.debug(
+            "Dropping %d cached PDU records of version %d", len(old_data), old_major_version
+        )
+        return {}
+
+
+class MetadataCache:
+    """Discovered PDU metadata persisted across restarts, keyed by serial number.
+
+    Each record holds the outlet count and names, device info, metering
+    capabilities and the sysUpTime seen at a given wall-clock time. That
+    uptime baseline lets a single GET tell whether the PDU has rebooted or
+    been swapped since the metadata was discovered.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store = _MetadataStore(hass, METADATA_STORAGE_VERSION, METADATA_STORAGE_KEY)
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        """Load the cache from storage."""
+        self._data = await self._store.async_load() or {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached metadata for a PDU."""
+        return self._data.get(key)
+
+    def async_set(self, key: str, metadata: Dict[str, Any]) -> None:
+        """Store metadata for a PDU, writing to disk shortly after."""
+        self._data[key] = metadata
+        self._store.async_delay_save(lambda: self._data, METADATA_SAVE_DELAY)
+
+
+async def async_get_metadata_cache(hass: HomeAssistant) -> MetadataCache:
+    """Return the shared metadata cache, loading it on first use."""
+    cache = hass.data.get(DATA_METADATA_CACHE)
+    if cache is None:
+        cache = MetadataCache(hass)
+        await cache.async_load()
+        hass.data[DATA_METADATA_CACHE] = cache
+    return cache
+
+
+def entry_pdus(entry: ConfigEntry) -> List[Mapping[str, Any]]:
+    """Return the per-PDU config of an entry.
+
+    A single PDU entry keeps host, outlet count, names and device info at the
+    top level of its data; a fleet entry keeps a list of them under "pdus".
+    """
+    if entry.data.get("fleet"):
+        return list(entry.data["pdus"])
+    return [entry.data]
+
+
+def pdu_config(entry: ConfigEntry, host: str) -> Mapping[str, Any]:
+    """Return the current stored config of one PDU in an entry."""
+    return next(config for config in entry_pdus(entry) if config["host"] == host)
+
+
+def cache_key(config: Mapping[str, Any]) -> str:
+    """Return the cache key for a PDU, the serial number where known."""
+    serial = config.get("device_info", {}).get("serial_number")
+    return serial or f"host:{config['host']}"
+
+
+def metadata_from_config(config: Mapping[str, Any], capabilities: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a metadata record from the data stored by the config flow."""
+    return {
+        "outlet_count": int(config["outlet_count"]),
+        "outlet_names": dict(config.get("outlet_names", {})),
+        "device_info": dict(config.get("device_info", {})),
+        "capabilities": capabilities,
+    }
+
+
+def _async_update_pdu_config(
+    hass: HomeAssistant, entry: ConfigEntry, host: str, changes: Dict[str, Any]
+) -> Mapping[str, Any]:
+    """Update the stored config of one PDU in an entry and return it."""
+    if not entry.data.get("fleet"):
+        data = {**entry.data, **changes}
+        hass.config_entries.async_update_entry(entry, data=data)
+        return data
+    pdus = [
+        {**pdu, **changes} if pdu["host"] == host else pdu
+        for pdu in entry.data["pdus"]
+    ]
+    hass.config_entries.async_update_entry(entry, data={**entry.data, "pdus": pdus})
+    return next(pdu for pdu in pdus if pdu["host"] == host)
+
+
+def is_unchanged(metadata: Dict[str, Any], serial: Optional[str], uptime: Optional[float]) -> bool:
+    """Return True if the probe shows the same PDU running since the cached baseline."""
+    if serial is None or uptime is None or "uptime" not in metadata:
+        return False
+    cached_serial = metadata["device_info"].get("serial_number")
+    if cached_serial and serial != cached_serial:
+        return False
+    # Uptime keeps growing with wall-clock time until the PDU reboots
+    expected = metadata["uptime"] + (time.time() - metadata["probed_at"])
+    return uptime >= expected - UPTIME_TOLERANCE
+
+
+async def async_probe_baseline(session: APCPDUSession, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Record the current sysUpTime baseline in a metadata record."""
+    _, uptime = await probe_device(session)
+    if uptime is not None:
+        metadata["uptime"] = uptime
+        metadata["probed_at"] = time.time()
+    return metadata
+
+
+async def async_discover_metadata(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    session: APCPDUSession,
+    cache: MetadataCache,
+    metadata: Dict[str, Any],
+) -> bool:
+    """Discover the capabilities of a PDU that has no cached metadata yet.
+
+    Runs in the background once the PDU first answered a poll, after
+    entities were built from the config flow's data alone. The entry is
+    reloaded if the PDU turns out to have metering tables or probes.
+    Returns False if discovery did not complete; nothing is stored then.
+    """
+    capabilities = await discover_capabilities(session)
+    if capabilities is None:
+        return False
+    config = pdu_config(entry, session.host)
+    fresh = await async_probe_baseline(session, metadata_from_config(config, capabilities))
+    cache.async_set(cache_key(config), fresh)
+    
+    if capabilities != metadata["capabilities"]:
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+    return True
+
+
+async def async_revalidate_metadata(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    config: Mapping[str, Any],
+    session: APCPDUSession,
+    cache: MetadataCache,
+    metadata: Dict[str, Any],
+) -> None:
+    """Probe the PDU and rediscover everything only if it changed.
+
+    Runs in the background after entities were built from the cache. If the
+    outlet count or metering capabilities changed the entry is reloaded;
+    if only names changed the entry data is updated in place.
+    """
+    serial, uptime = await probe_device(session)
+    
+    if is_unchanged(metadata, serial, uptime):
+        _LOGGER.debug("Cached metadata for PDU %s is still valid", session.host)
+        metadata["uptime"] = uptime
+        metadata["probed_at"] = time.time()
+        cache.async_set(cache_key(config), metadata)
+        return
+    
+    if serial is None:
+        _LOGGER.debug("PDU %s did not answer the metadata probe", session.host)
+        return
+    
+    _LOGGER.info("PDU %s changed since it was last seen, rediscovering", session.host)
+    outlets = await discover_outlets(session)
+    if not outlets:
+        return
+    device_info = await discover_device_info(session)
+    capabilities = await discover_capabilities(session)
+    if capabilities is None:
+        # Keep the cached record, the next start probes again
+        return
+    
+    fresh = {
+        "outlet_count": len(outlets),
+        "outlet_names": {str(num): name for num, name in outlets},
+        "device_info": device_info,
+        "capabilities": capabilities,
+        "uptime": uptime,
+        "probed_at": time.time(),
+    }
+    
+    # A swapped PDU is stored under its own serial number
+    config = _async_update_pdu_config(
+        hass,
+        entry,
+        session.host,
+        {
+            "outlet_count": fresh["outlet_count"],
+            "outlet_names": fresh["outlet_names"],
+            "device_info": device_info,
+        },
+    )
+    cache.async_set(cache_key(config), fresh)
+    
+    if (
+        fresh["outlet_count"] != metadata["outlet_count"]
+        or capabilities != metadata["capabilities"]
+    ):
+        hass.config_entries.async_schedule_reload(entry.entry_id)
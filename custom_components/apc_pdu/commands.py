@@ -0,0 +1,119 @@
+# File: custom_components/apc_pdu/commands.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .const import OUTLET_ON
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PendingCommands:
+    """Outlet commands sent to a PDU but not yet seen to take effect.
+
+    Each outlet has at most one pending command: the target state and a
+    deadline, normally the outlet's configured power-on or power-off delay
+    plus a grace period. A newer command for the same outlet replaces the
+    earlier one. Polls and traps resolve commands by reporting the outlet's
+    actual state; until then entities show the target state.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, Tuple[int, float]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._pending)
+
+    def add(self, outlet: int, state: int, deadline: float) -> None:
+        """Track a command, cancelling any earlier one for the outlet."""
+        self._pending[outlet] = (state, deadline)
+
+    def state(self, outlet: int) -> Optional[int]:
+        """Return the state an outlet was last commanded to, if still pending."""
+        pending = self._pending.get(outlet)
+        return None if pending is None else pending[0]
+
+    def resolve(
+        self, outlets: Dict[int, int], now: Optional[float] = None
+    ) -> Tuple[List[int], List[int]]:
+        """Apply reported outlet states.
+
+        Returns the outlets whose command was confirmed, because the outlet
+        reached the target state, and those whose command passed its
+        deadline unconfirmed. Both are dropped, so the reported state shows
+        again.
+        """
+        now = time.monotonic() if now is None else now
+        confirmed, expired = [], []
+        for outlet, (state, deadline) in list(self._pending.items()):
+            if outlets.get(outlet) == state:
+                del self._pending[outlet]
+                confirmed.append(outlet)
+            elif now >= deadline and outlet in outlets:
+                del self._pending[outlet]
+                expired.append(outlet)
+        return confirmed, expired
+
+
+def plan_power_up(
+    groups: List[Tuple[Any, List[int]]],
+    delay: float,
+    pdu_delay: float = 0.0,
+) -> List[Tuple[float, List[Tuple[Any, Dict[int, int]]]]]:
+    """Plan a staggered power-up of outlets on one or more PDUs.
+
+    groups lists each PDU's coordinator with its outlets in switch-on
+    order. Outlets of one PDU come on delay seconds apart to spread the
+    inrush current; each PDU starts pdu_delay seconds after the previous
+    one. Returns the steps sorted by offset in seconds, each holding the
+    commands every PDU gets at that moment.
+    """
+    steps: Dict[float, Dict[Any, Dict[int, int]]] = {}
+    for number, (coordinator, outlets) in enumerate(groups):
+        for position, outlet in enumerate(outlets):
+            offset = round(number * pdu_delay + position * delay, 3)
+            steps.setdefault(offset, {}).setdefault(coordinator, {})[outlet] = OUTLET_ON
+    return [(offset, list(steps[offset].items())) for offset in sorted(steps)]
+
+
+async def async_run_power_up(
+    plan: List[Tuple[float, List[Tuple[Any, Dict[int, int]]]]]
+) -> List[str]:
+    """Run a power-up plan, returning the hosts where a step failed.
+
+    Each PDU runs its own steps, so a slow or unreachable PDU never holds
+    up the others. A step that finished late pushes back the rest of that
+    PDU's steps, keeping their spacing rather than sending them back to
+    back.
+    """
+    chains: Dict[Any, List[Tuple[float, Dict[int, int]]]] = {}
+    for offset, commands in plan:
+        for coordinator, outlets in commands:
+            chains.setdefault(coordinator, []).append((offset, outlets))
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def run_chain(coordinator, steps: List[Tuple[float, Dict[int, int]]]) -> bool:
+        ok = True
+        previous = None
+        for offset, outlets in steps:
+            due = start + offset
+            if previous is not None:
+                # At least the planned gap after the previous SET returned
+                due = max(due, loop.time() + offset - previous)
+            await asyncio.sleep(max(due - loop.time(), 0))
+            if not await coordinator.async_set_outlets(outlets):
+                _LOGGER.warning(
+                    "Power-up of outlets %s on PDU %s failed", list(outlets), coordinator.host
+                )
+                ok = False
+            previous = offset
+        return ok
+
+    results = await asyncio.gather(*(
+        run_chain(coordinator, steps) for coordinator, steps in chains.items()
+    ))
+    return [coordinator.host for coordinator, ok in zip(chains, results) if not ok]
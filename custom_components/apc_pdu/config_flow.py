@@ -1,69 +1,130 @@
+import asyncio
+from typing import Optional
+
 from homeassistant import config_entries
+from homeassistant.core import callback
 import voluptuous as vol
 from homeassistant.exceptions import HomeAssistantError
-from .const import DOMAIN
-from .snmp import discover_outlets, discover_device_info
+from .const import (
+    DOMAIN,
+    DISCOVERY_TIMEOUT,
+    DISCOVERY_PROBE_TIMEOUT,
+    FLEET_DISCOVERY_CONCURRENCY,
+    FLEET_DISCOVERY_BATCH_TIME,
+    SNMP_TIMEOUT,
+    SNMP_RETRIES,
+    CONF_SNMP_VERSION,
+    CONF_USERNAME,
+    CONF_AUTH_PROTOCOL,
+    CONF_AUTH_KEY,
+    CONF_PRIV_PROTOCOL,
+    CONF_PRIV_KEY,
+    SNMP_VERSION_2C,
+    SNMP_VERSION_3,
+    SNMP_AUTH_PROTOCOLS,
+    SNMP_PRIV_PROTOCOLS,
+    SNMP_MAX_IN_FLIGHT,
+    SENSOR_UPDATE_INTERVAL,
+    SWITCH_UPDATE_INTERVAL,
+    METADATA_UPDATE_INTERVAL,
+    PROBE_UPDATE_INTERVAL,
+    SET_CONFIRM_DELAY,
+    SET_CONFIRM_TIMEOUT,
+    CONF_CURRENT_INTERVAL,
+    CONF_OUTLET_INTERVAL,
+    CONF_METADATA_INTERVAL,
+    CONF_PROBE_INTERVAL,
+    CONF_METRICS,
+    CONF_VOLTAGE,
+    CONF_POWER_FACTOR,
+    CONF_ENERGY_METHOD,
+    CONF_GUARD_LIMIT,
+    CONF_GUARD_HYSTERESIS,
+    CONF_GUARD_SHED_ORDER,
+    DEFAULT_GUARD_LIMIT,
+    DEFAULT_GUARD_HYSTERESIS,
+    DEFAULT_VOLTAGE,
+    DEFAULT_POWER_FACTOR,
+    ENERGY_METHOD_TRAPEZOIDAL,
+    ENERGY_METHODS,
+    CONF_TIMEOUT,
+    CONF_RETRIES,
+    CONF_MAX_REPETITIONS,
+    CONF_MAX_IN_FLIGHT,
+    CONF_CONFIRM_MODE,
+    CONF_CONFIRM_DELAY,
+    CONF_CONFIRM_TIMEOUT,
+    CONFIRM_READ_BACK,
+    CONFIRM_MODES,
+    DEFAULT_BULK_REPETITIONS,
+    CONF_CURRENT_DEADBAND,
+    CONF_POWER_DEADBAND,
+    CONF_PERCENT_DEADBAND,
+    CONF_HEARTBEAT,
+    DEFAULT_CURRENT_DEADBAND,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_PERCENT_DEADBAND,
+    DEFAULT_HEARTBEAT,
+)
+from .fleet import TooManyHostsError, async_discover_pdus, is_host_list, parse_hosts
+from .guard import parse_shed_order
+from .snmp import (
+    APCPDUSession,
+    discover_device_info,
+    discover_outlets,
+    probe_reachable,
+    snmp_credentials,
+)
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+class _DiscoveryError(Exception):
+    """Discovery failed; the argument is the error key to show on the form."""
+
+
 class APCPDUConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     
+    def __init__(self) -> None:
+        self._discovery: Optional[asyncio.Task] = None
+        self._result = None
+        self._error: Optional[str] = None
+    
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return APCPDUOptionsFlow()
+    
     async def async_step_user(self, user_input=None):
         errors = {}
+        if self._error:
+            # Back from a failed discovery
+            errors["base"] = self._error
+            self._error = None
+        invalid = user_input is not None and _validate_credentials(user_input)
         
-        if user_input is not None:
-            try:
-                # Test connection and discover outlets
-                host = user_input["host"]
-                community = user_input["community"]
-                
-                _LOGGER.info("Testing connection to PDU at %s", host)
-                
-                # Discover outlets using executor
-                outlets = await self.hass.async_add_executor_job(
-                    discover_outlets, host, community
-                )
-                
-                # Discover device information
-                device_info = await self.hass.async_add_executor_job(
-                    discover_device_info, host, community
-                )
-                
-                if not outlets:
-                    _LOGGER.error("No outlets discovered on PDU %s", host)
-                    errors["base"] = "no_outlets_found"
-                else:
-                    # Store discovered outlet information
-                    outlet_count = len(outlets)
-                    outlet_names = {str(num): name for num, name in outlets}
-                    
-                    _LOGGER.info("Discovered %d outlets on PDU %s", outlet_count, host)
-                    
-                    config_data = {
-                        "host": host,
-                        "community": community,
-                        "outlet_count": outlet_count,
-                        "outlet_names": outlet_names,
-                        "device_info": device_info,
-                    }
-                    
-                    # Use device name for title if available, otherwise fall back to host
-                    device_name = device_info.get("name", f"APC PDU ({host})")
-                    
-                    return self.async_create_entry(
-                        title=device_name, 
-                        data=config_data
-                    )
-                    
-            except Exception as e:
-                _LOGGER.exception("Failed to connect to PDU at %s: %s", user_input.get("host"), e)
-                errors["base"] = "connection_failed"
+        if invalid:
+            errors["base"] = invalid
+        
+        elif user_input is not None:
+            # Discover on the event loop while the UI shows progress
+            self._discovery = self.hass.async_create_task(self._async_discover(user_input))
+            return await self.async_step_discover()
 
         schema = vol.Schema({
             vol.Required("host"): str,
             vol.Required("community", default="public"): str,
+            vol.Optional("traps", default=False): bool,
+            # SNMPv3 (USM); the community is ignored when version 3 is chosen
+            vol.Optional(CONF_SNMP_VERSION, default=SNMP_VERSION_2C): vol.In(
+                [SNMP_VERSION_2C, SNMP_VERSION_3]
+            ),
+            vol.Optional(CONF_USERNAME, default=""): str,
+            vol.Optional(CONF_AUTH_PROTOCOL, default="sha1"): vol.In(SNMP_AUTH_PROTOCOLS),
+            vol.Optional(CONF_AUTH_KEY, default=""): str,
+            vol.Optional(CONF_PRIV_PROTOCOL, default="aes"): vol.In(SNMP_PRIV_PROTOCOLS),
+            vol.Optional(CONF_PRIV_KEY, default=""): str,
         })
         
         return self.async_show_form(
@@ -73,5 +134,259 @@ class APCPDUConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             description_placeholders={
                 "error_connection": "Could not connect to the PDU. Please check the host and SNMP community string.",
                 "error_no_outlets": "No outlets were discovered on this PDU. Please verify this is an APC Smart PDU.",
+                "error_timeout": "Discovery did not finish in time. Please check the hosts and SNMP settings.",
             }
-        )
\ No newline at end of file
+        )
+    
+    async def async_step_discover(self, user_input=None):
+        """Show progress until discovery is done, then create the entry or go back."""
+        if not self._discovery.done():
+            return self.async_show_progress(
+                step_id="discover",
+                progress_action="discover",
+                progress_task=self._discovery,
+            )
+        try:
+            self._result = self._discovery.result()
+        except _DiscoveryError as e:
+            self._error = e.args[0]
+            return self.async_show_progress_done(next_step_id="user")
+        return self.async_show_progress_done(next_step_id="finish")
+    
+    async def async_step_finish(self, user_input=None):
+        title, data = self._result
+        return self.async_create_entry(title=title, data=data)
+    
+    async def _async_discover(self, user_input):
+        """Discover the PDU or fleet, returning the title and data of the entry."""
+        host = user_input["host"]
+        community = user_input["community"]
+        traps = user_input.get("traps", False)
+        credentials = _credentials_data(user_input)
+        
+        if is_host_list(host):
+            # Several hosts or a CIDR range make one fleet entry
+            try:
+                return await self._async_discover_fleet(host, community, traps, credentials)
+            except TooManyHostsError:
+                raise _DiscoveryError("too_many_hosts")
+            except ValueError as e:
+                _LOGGER.error("Invalid host list %s: %s", host, e)
+                raise _DiscoveryError("invalid_hosts")
+            except _DiscoveryError:
+                raise
+            except Exception as e:
+                _LOGGER.exception("Failed to discover PDUs on %s: %s", host, e)
+                raise _DiscoveryError("connection_failed")
+        
+        try:
+            async with asyncio.timeout(DISCOVERY_TIMEOUT):
+                return await self._async_discover_pdu(host, community, traps, credentials)
+        except TimeoutError:
+            _LOGGER.error("Discovery of PDU %s did not finish within %d seconds", host, DISCOVERY_TIMEOUT)
+            raise _DiscoveryError("timeout")
+        except _DiscoveryError:
+            raise
+        except Exception as e:
+            _LOGGER.exception("Failed to connect to PDU at %s: %s", host, e)
+            raise _DiscoveryError("connection_failed")
+    
+    async def _async_discover_pdu(self, host, community, traps, credentials):
+        """Test the connection to one PDU and discover its outlets."""
+        _LOGGER.info("Testing connection to PDU at %s", host)
+        
+        # A single short attempt first, so an unreachable host fails within
+        # a second instead of after the full retry cycle
+        session = APCPDUSession(
+            host, community,
+            timeout=DISCOVERY_PROBE_TIMEOUT, retries=1,
+            credentials=snmp_credentials({"community": community, **credentials}),
+        )
+        try:
+            await session.async_connect()
+            if not await probe_reachable(session):
+                _LOGGER.error("PDU %s did not answer", host)
+                raise _DiscoveryError("connection_failed")
+            session.configure(SNMP_TIMEOUT, SNMP_RETRIES)
+            
+            # Outlets and device information at the same time
+            outlets, device_info = await asyncio.gather(
+                discover_outlets(session), discover_device_info(session)
+            )
+        finally:
+            await session.async_close()
+        
+        if not outlets:
+            _LOGGER.error("No outlets discovered on PDU %s", host)
+            raise _DiscoveryError("no_outlets_found")
+        
+        # Store discovered outlet information
+        outlet_count = len(outlets)
+        outlet_names = {str(num): name for num, name in outlets}
+        
+        _LOGGER.info("Discovered %d outlets on PDU %s", outlet_count, host)
+        
+        config_data = {
+            "host": host,
+            "community": community,
+            "outlet_count": outlet_count,
+            "outlet_names": outlet_names,
+            "device_info": device_info,
+            "traps": traps,
+            **credentials,
+        }
+        
+        # Use device name for title if available, otherwise fall back to host
+        device_name = device_info.get("name", f"APC PDU ({host})")
+        return device_name, config_data
+    
+    async def _async_discover_fleet(self, hosts_spec, community, traps, credentials):
+        """Discover every PDU in a host list or CIDR range for a fleet entry."""
+        hosts = parse_hosts(hosts_spec)
+        _LOGGER.info("Discovering PDUs on %d hosts", len(hosts))
+        
+        # The hosts are probed in batches, so the deadline grows with their number
+        batches = -(-len(hosts) // FLEET_DISCOVERY_CONCURRENCY)
+        deadline = DISCOVERY_TIMEOUT + batches * FLEET_DISCOVERY_BATCH_TIME
+        try:
+            async with asyncio.timeout(deadline):
+                pdus = await async_discover_pdus(
+                    hosts, community,
+                    credentials=snmp_credentials({"community": community, **credentials}),
+                )
+        except TimeoutError:
+            _LOGGER.error(
+                "Discovery of %d hosts did not finish within %d seconds", len(hosts), deadline
+            )
+            raise _DiscoveryError("timeout")
+        if not pdus:
+            _LOGGER.error("No PDUs discovered on %s", hosts_spec)
+            raise _DiscoveryError("no_outlets_found")
+        
+        config_data = {
+            "fleet": True,
+            "hosts": hosts_spec,
+            "community": community,
+            "pdus": pdus,
+            "traps": traps,
+            **credentials,
+        }
+        
+        return f"APC PDU fleet ({len(pdus)} PDUs)", config_data
+
+
+class APCPDUOptionsFlow(config_entries.OptionsFlow):
+    """Tune polling, SNMP, publishing, metrics and the guard of a running entry.
+
+    Every PDU of the entry picks up the new values without a reload.
+    """
+    
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        if user_input is not None:
+            try:
+                parse_shed_order(user_input.get(CONF_GUARD_SHED_ORDER, ""))
+            except ValueError:
+                errors[CONF_GUARD_SHED_ORDER] = "invalid_shed_order"
+            else:
+                return self.async_create_entry(data=user_input)
+        
+        options = {**self.config_entry.options, **(user_input or {})}
+        
+        def default(key, value):
+            return {"default": options.get(key, value)}
+        
+        seconds = vol.All(vol.Coerce(int), vol.Range(min=1))
+        schema = vol.Schema({
+            # Poll interval per data class
+            vol.Optional(CONF_CURRENT_INTERVAL, **default(CONF_CURRENT_INTERVAL, SENSOR_UPDATE_INTERVAL)): seconds,
+            vol.Optional(CONF_OUTLET_INTERVAL, **default(CONF_OUTLET_INTERVAL, SWITCH_UPDATE_INTERVAL)): seconds,
+            vol.Optional(CONF_METADATA_INTERVAL, **default(CONF_METADATA_INTERVAL, METADATA_UPDATE_INTERVAL)): seconds,
+            vol.Optional(CONF_PROBE_INTERVAL, **default(CONF_PROBE_INTERVAL, PROBE_UPDATE_INTERVAL)): seconds,
+            # SNMP session
+            vol.Optional(CONF_TIMEOUT, **default(CONF_TIMEOUT, SNMP_TIMEOUT)): vol.All(
+                vol.Coerce(float), vol.Range(min=0.5, max=30)
+            ),
+            vol.Optional(CONF_RETRIES, **default(CONF_RETRIES, SNMP_RETRIES)): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=10)
+            ),
+            vol.Optional(CONF_MAX_REPETITIONS, **default(CONF_MAX_REPETITIONS, DEFAULT_BULK_REPETITIONS)): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=200)
+            ),
+            vol.Optional(CONF_MAX_IN_FLIGHT, **default(CONF_MAX_IN_FLIGHT, SNMP_MAX_IN_FLIGHT)): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=16)
+            ),
+            # Outlet command confirmation
+            vol.Optional(CONF_CONFIRM_MODE, **default(CONF_CONFIRM_MODE, CONFIRM_READ_BACK)): vol.In(CONFIRM_MODES),
+            vol.Optional(CONF_CONFIRM_DELAY, **default(CONF_CONFIRM_DELAY, SET_CONFIRM_DELAY)): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=30)
+            ),
+            vol.Optional(CONF_CONFIRM_TIMEOUT, **default(CONF_CONFIRM_TIMEOUT, SET_CONFIRM_TIMEOUT)): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=600)
+            ),
+            # Sensor publishing
+            vol.Optional(CONF_CURRENT_DEADBAND, **default(CONF_CURRENT_DEADBAND, DEFAULT_CURRENT_DEADBAND)): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional(CONF_POWER_DEADBAND, **default(CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND)): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional(CONF_PERCENT_DEADBAND, **default(CONF_PERCENT_DEADBAND, DEFAULT_PERCENT_DEADBAND)): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=100)
+            ),
+            vol.Optional(CONF_HEARTBEAT, **default(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)): vol.All(
+                vol.Coerce(int), vol.Range(min=0)
+            ),
+            # Energy estimate on PDUs without kWh counters
+            vol.Optional(CONF_VOLTAGE, **default(CONF_VOLTAGE, DEFAULT_VOLTAGE)): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=480)
+            ),
+            vol.Optional(CONF_POWER_FACTOR, **default(CONF_POWER_FACTOR, DEFAULT_POWER_FACTOR)): vol.All(
+                vol.Coerce(float), vol.Range(min=0.1, max=1)
+            ),
+            vol.Optional(CONF_ENERGY_METHOD, **default(CONF_ENERGY_METHOD, ENERGY_METHOD_TRAPEZOIDAL)): vol.In(ENERGY_METHODS),
+            # Overcurrent guard, off while the limit is 0
+            vol.Optional(CONF_GUARD_LIMIT, **default(CONF_GUARD_LIMIT, DEFAULT_GUARD_LIMIT)): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional(CONF_GUARD_HYSTERESIS, **default(CONF_GUARD_HYSTERESIS, DEFAULT_GUARD_HYSTERESIS)): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            ),
+            vol.Optional(CONF_GUARD_SHED_ORDER, **default(CONF_GUARD_SHED_ORDER, "")): str,
+            # OpenMetrics endpoint
+            vol.Optional(CONF_METRICS, **default(CONF_METRICS, False)): bool,
+        })
+        
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
+
+
+def _credentials_data(user_input):
+    """Return the SNMPv3 settings to store in the entry, empty for v2c."""
+    if user_input.get(CONF_SNMP_VERSION) != SNMP_VERSION_3:
+        return {}
+    data = {
+        CONF_SNMP_VERSION: SNMP_VERSION_3,
+        CONF_USERNAME: user_input[CONF_USERNAME],
+    }
+    if user_input.get(CONF_AUTH_KEY):
+        data[CONF_AUTH_PROTOCOL] = user_input.get(CONF_AUTH_PROTOCOL, "sha1")
+        data[CONF_AUTH_KEY] = user_input[CONF_AUTH_KEY]
+        if user_input.get(CONF_PRIV_KEY) and user_input.get(CONF_PRIV_PROTOCOL) != "none":
+            data[CONF_PRIV_PROTOCOL] = user_input[CONF_PRIV_PROTOCOL]
+            data[CONF_PRIV_KEY] = user_input[CONF_PRIV_KEY]
+    return data
+
+
+def _validate_credentials(user_input):
+    """Return an error key if the SNMPv3 settings cannot work, else None."""
+    if user_input.get(CONF_SNMP_VERSION) != SNMP_VERSION_3:
+        return None
+    if not user_input.get(CONF_USERNAME):
+        return "username_required"
+    # RFC 3414 passphrases must be at least 8 characters
+    for key in (CONF_AUTH_KEY, CONF_PRIV_KEY):
+        if user_input.get(key) and len(user_input[key]) < 8:
+            return "key_too_short"
+    if user_input.get(CONF_PRIV_KEY) and not user_input.get(CONF_AUTH_KEY):
+        return "priv_requires_auth"
+    return None
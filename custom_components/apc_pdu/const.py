@@ -4,21 +4,169 @@ DOMAIN = "apc_pdu"
 
 # Base OIDs for APC Smart PDUs
 BASE_OID = "1.3.6.1.4.1.318.1.1.4.4.2.1.3"  # Outlet control
+MASTER_CONTROL_OID = "1.3.6.1.4.1.318.1.1.4.2.1.0"  # sPDUMasterControlSwitch
 CURRENT_OID = "1.3.6.1.4.1.318.1.1.12.2.3.1.1.2.1"  # Total current reading
 
 # Discovery OIDs for outlet information
 OUTLET_INDEX_OID = "1.3.6.1.4.1.318.1.1.12.3.3.1.1.1"  # Outlet indices
 OUTLET_NAME_OID = "1.3.6.1.4.1.318.1.1.12.3.3.1.1.2"   # Outlet names
 
+# Outlet configuration OIDs (sPDUOutletConfigTable), values in seconds, -1 = never
+OUTLET_POWER_ON_DELAY_OID = "1.3.6.1.4.1.318.1.1.4.5.2.1.2"   # sPDUOutletPowerOnTime
+OUTLET_POWER_OFF_DELAY_OID = "1.3.6.1.4.1.318.1.1.4.5.2.1.4"  # sPDUOutletPowerOffTime
+OUTLET_REBOOT_DURATION_OID = "1.3.6.1.4.1.318.1.1.4.5.2.1.5"  # sPDUOutletRebootDuration
+
+# MIB-2 system OIDs
+SYS_UPTIME_OID = "1.3.6.1.2.1.1.3.0"                    # sysUpTime
+
 # Device information OIDs
 DEVICE_NAME_OID = "1.3.6.1.4.1.318.1.1.12.1.1.0"       # Device name
 DEVICE_MODEL_OID = "1.3.6.1.4.1.318.1.1.12.1.5.0"      # Device model
 DEVICE_SERIAL_OID = "1.3.6.1.4.1.318.1.1.12.1.6.0"     # Serial number
 
+# Metering OIDs (rPDU2 MIB), values in tenths unless noted
+OUTLET_METERED_CURRENT_OID = "1.3.6.1.4.1.318.1.1.26.9.4.3.1.6"  # Per-outlet current
+OUTLET_METERED_POWER_OID = "1.3.6.1.4.1.318.1.1.26.9.4.3.1.7"    # Per-outlet power (W)
+OUTLET_METERED_ENERGY_OID = "1.3.6.1.4.1.318.1.1.26.9.4.3.1.11"  # Per-outlet energy
+PHASE_CURRENT_OID = "1.3.6.1.4.1.318.1.1.26.6.3.1.5"             # Per-phase current
+BANK_CURRENT_OID = "1.3.6.1.4.1.318.1.1.26.8.3.1.5"              # Per-bank current
+
+# Environmental probe OIDs (rPDU2SensorTempHumidityStatusTable)
+PROBE_NAME_OID = "1.3.6.1.4.1.318.1.1.26.10.2.2.1.3"         # Probe name
+PROBE_TEMPERATURE_OID = "1.3.6.1.4.1.318.1.1.26.10.2.2.1.8"  # Temperature, tenths of a degree C
+PROBE_HUMIDITY_OID = "1.3.6.1.4.1.318.1.1.26.10.2.2.1.10"    # Relative humidity %, -1 without a humidity sensor
+
+# APC trap OIDs (SNMPv2 form of the PowerNet enterprise traps)
+TRAP_OUTLET_ON_OID = "1.3.6.1.4.1.318.0.41"   # outletOn
+TRAP_OUTLET_OFF_OID = "1.3.6.1.4.1.318.0.42"  # outletOff
+TRAP_ARG_INTEGER_OID = "1.3.6.1.4.1.318.2.3.1.0"  # mtrapargsInteger, the outlet number
+
+# Outlet control values (sPDUOutletCtl)
+OUTLET_ON = 1
+OUTLET_OFF = 2
+OUTLET_REBOOT = 3
+OUTLET_ON_DELAYED = 5  # after the outlet's power-on delay
+OUTLET_OFF_DELAYED = 6  # after the outlet's power-off delay
+OUTLET_REBOOT_DELAYED = 7
+
+# Master control values (sPDUMasterControlSwitch)
+MASTER_ALL_ON = 1
+MASTER_ALL_ON_SEQUENCE = 2  # each outlet after its power-on delay
+MASTER_ALL_OFF = 3
+MASTER_REBOOT_ALL = 4
+MASTER_REBOOT_ALL_SEQUENCE = 5
+MASTER_ALL_OFF_SEQUENCE = 7
+
 DEFAULT_PORT = 161
 DEFAULT_COMMUNITY = "public"
 DEFAULT_NUM_OUTLETS = 8
 
+# SNMP session settings
+SNMP_TIMEOUT = 3  # seconds per attempt
+SNMP_RETRIES = 3
+SNMP_MAX_IN_FLIGHT = 2  # concurrent requests per PDU, NMCs only handle a few
+SNMP_MAX_QUEUED = 8  # poll requests allowed to wait before polls are skipped
+SET_CONFIRM_DELAY = 0.5  # seconds before the confirmation poll after a SET
+SET_CONFIRM_TIMEOUT = 10  # seconds, on top of the outlet's delay, to see a SET take effect
+POWER_UP_DELAY = 1  # seconds between outlets of one PDU in a power-up sequence
+DEFAULT_MAX_REPETITIONS = 25  # rows per GETBULK request
+SNMP_MAX_MESSAGE_SIZE = 1472  # bytes, largest response the agent is assumed to send
+SNMP_STATS_WINDOW = 256  # recent exchanges kept per operation for latency percentiles
+
+# SNMPv3 (USM) credentials
+CONF_SNMP_VERSION = "snmp_version"
+CONF_USERNAME = "username"
+CONF_AUTH_PROTOCOL = "auth_protocol"
+CONF_AUTH_KEY = "auth_key"
+CONF_PRIV_PROTOCOL = "priv_protocol"
+CONF_PRIV_KEY = "priv_key"
+SNMP_VERSION_2C = "2c"
+SNMP_VERSION_3 = "3"
+SNMP_AUTH_PROTOCOLS = ["md5", "sha1"]
+SNMP_PRIV_PROTOCOLS = ["none", "des", "aes"]
+SNMP_V3_KEY_CACHE = 256  # localized privacy keys kept, one per user and engine
+
+# Trap receiver
+TRAP_PORT = 162
+TRAP_RECONCILE_INTERVAL = 300  # seconds between outlet polls while traps are healthy
+TRAP_HEALTH_WINDOW = 86400  # seconds a received trap counts as proof traps arrive
+
 # Update intervals
-SWITCH_UPDATE_INTERVAL = 30  # seconds
-SENSOR_UPDATE_INTERVAL = 30  # seconds
\ No newline at end of file
+SWITCH_UPDATE_INTERVAL = 30  # seconds, outlet states
+SENSOR_UPDATE_INTERVAL = 30  # seconds, total current and metering
+METADATA_UPDATE_INTERVAL = 3600  # seconds, outlet names and device info
+PROBE_UPDATE_INTERVAL = 300  # seconds, temperature and humidity probes
+FAST_POLL_INTERVAL = 2  # seconds, after a SET or detected change
+FAST_POLL_WINDOW = 20  # seconds
+MAX_BACKOFF_INTERVAL = 600  # seconds, while the PDU is unreachable
+STARTUP_POLL_STEP = 0.5  # seconds between the first polls of successive PDUs
+STARTUP_POLL_SPREAD = 10  # seconds, first polls wrap around within this window
+
+# Sensor publishing, all overridable in the entry options
+CONF_CURRENT_DEADBAND = "current_deadband"
+CONF_POWER_DEADBAND = "power_deadband"
+CONF_PERCENT_DEADBAND = "percent_deadband"
+CONF_HEARTBEAT = "heartbeat"
+DEFAULT_CURRENT_DEADBAND = 0.0  # A, smallest current change written
+DEFAULT_POWER_DEADBAND = 0.0  # W, smallest power change written
+DEFAULT_PERCENT_DEADBAND = 0.0  # % of the last written value
+DEFAULT_HEARTBEAT = 3600  # seconds, longest a sensor goes without a state write, 0 = never
+
+# Polling and SNMP tuning, all overridable in the entry options
+CONF_CURRENT_INTERVAL = "current_interval"
+CONF_OUTLET_INTERVAL = "outlet_interval"
+CONF_METADATA_INTERVAL = "metadata_interval"
+CONF_PROBE_INTERVAL = "probe_interval"
+CONF_TIMEOUT = "timeout"
+CONF_RETRIES = "retries"
+CONF_MAX_REPETITIONS = "max_repetitions"
+CONF_MAX_IN_FLIGHT = "max_in_flight"
+CONF_CONFIRM_MODE = "confirm_mode"
+CONF_CONFIRM_DELAY = "confirm_delay"
+CONF_CONFIRM_TIMEOUT = "confirm_timeout"
+CONFIRM_READ_BACK = "read_back"  # read the outlets back confirm_delay after a SET
+CONFIRM_POLL = "poll"  # leave confirmation to the fast poll and traps
+CONFIRM_MODES = [CONFIRM_READ_BACK, CONFIRM_POLL]
+DEFAULT_BULK_REPETITIONS = 0  # rows per GETBULK, 0 = a whole table per request
+
+# OpenMetrics endpoint, enabled in the entry options
+CONF_METRICS = "metrics"
+
+# Energy estimate for PDUs without kWh counters, overridable in the entry options
+CONF_VOLTAGE = "voltage"
+CONF_POWER_FACTOR = "power_factor"
+CONF_ENERGY_METHOD = "energy_method"
+DEFAULT_VOLTAGE = 230  # V, supply voltage the total current is drawn at
+DEFAULT_POWER_FACTOR = 1.0
+ENERGY_METHOD_TRAPEZOIDAL = "trapezoidal"
+ENERGY_METHOD_LEFT = "left"
+ENERGY_METHOD_RIGHT = "right"
+ENERGY_METHODS = [ENERGY_METHOD_TRAPEZOIDAL, ENERGY_METHOD_LEFT, ENERGY_METHOD_RIGHT]
+ENERGY_SAMPLE_RING = 64  # recent power samples kept per PDU
+ENERGY_MAX_GAP_POLLS = 3  # current poll intervals a span may last and still be integrated
+
+# Overcurrent guard, configured in the entry options
+CONF_GUARD_LIMIT = "guard_limit"
+CONF_GUARD_HYSTERESIS = "guard_hysteresis"
+CONF_GUARD_SHED_ORDER = "guard_shed_order"
+DEFAULT_GUARD_LIMIT = 0.0  # A, total current at which outlets are shed, 0 = off
+DEFAULT_GUARD_HYSTERESIS = 1.0  # A below the limit the current must drop to clear the guard
+GUARD_NEAR_RATIO = 0.9  # share of the limit from which the PDU is polled quickly
+EVENT_OVERCURRENT = f"{DOMAIN}_overcurrent"  # fired for every guard action
+
+# Config flow discovery
+DISCOVERY_TIMEOUT = 30  # seconds, deadline for discovering a single PDU
+DISCOVERY_PROBE_TIMEOUT = 1  # seconds, single attempt to see whether the host answers at all
+
+# Fleet entries
+FLEET_MAX_HOSTS = 1024  # addresses a host list or CIDR range may expand to
+FLEET_DISCOVERY_CONCURRENCY = 16  # hosts probed at once during discovery
+FLEET_DISCOVERY_TIMEOUT = 1  # seconds, most addresses in a range will not answer
+FLEET_DISCOVERY_BATCH_TIME = 3  # seconds added to the deadline per batch of concurrently probed hosts
+FLEET_MAX_CONCURRENT_POLLS = 8  # PDUs polled at once by the fleet scheduler
+
+# Metadata cache
+METADATA_STORAGE_KEY = "apc_pdu.metadata"
+METADATA_STORAGE_VERSION = 2
+METADATA_SAVE_DELAY = 10  # seconds
+UPTIME_TOLERANCE = 120  # seconds of clock drift allowed before assuming a reboot
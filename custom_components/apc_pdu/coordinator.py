@@ -0,0 +1,580 @@
+# File: custom_components/apc_pdu/coordinator.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .const import (
+    DOMAIN,
+    BASE_OID,
+    CURRENT_OID,
+    OUTLET_METERED_CURRENT_OID,
+    OUTLET_METERED_POWER_OID,
+    OUTLET_METERED_ENERGY_OID,
+    PHASE_CURRENT_OID,
+    BANK_CURRENT_OID,
+    PROBE_TEMPERATURE_OID,
+    PROBE_HUMIDITY_OID,
+    MASTER_CONTROL_OID,
+    OUTLET_POWER_ON_DELAY_OID,
+    OUTLET_POWER_OFF_DELAY_OID,
+    OUTLET_REBOOT_DURATION_OID,
+    MASTER_ALL_ON,
+    MASTER_ALL_ON_SEQUENCE,
+    MASTER_ALL_OFF,
+    MASTER_ALL_OFF_SEQUENCE,
+    MASTER_REBOOT_ALL,
+    MASTER_REBOOT_ALL_SEQUENCE,
+    OUTLET_ON,
+    OUTLET_OFF,
+    OUTLET_REBOOT,
+    OUTLET_ON_DELAYED,
+    OUTLET_OFF_DELAYED,
+    OUTLET_REBOOT_DELAYED,
+    SET_CONFIRM_DELAY,
+    SET_CONFIRM_TIMEOUT,
+    DEFAULT_MAX_REPETITIONS,
+    DEFAULT_BULK_REPETITIONS,
+    CONFIRM_READ_BACK,
+    DEFAULT_VOLTAGE,
+    DEFAULT_POWER_FACTOR,
+    ENERGY_MAX_GAP_POLLS,
+    DEFAULT_GUARD_LIMIT,
+    DEFAULT_GUARD_HYSTERESIS,
+    EVENT_OVERCURRENT,
+    TRAP_OUTLET_ON_OID,
+    TRAP_OUTLET_OFF_OID,
+    TRAP_ARG_INTEGER_OID,
+)
+from .snmp import (
+    APCPDUSession,
+    PRIORITY_POLL,
+    control_priority,
+    current_priority,
+    discover_device_info,
+    discover_outlets,
+    oid_index,
+)
+from .commands import PendingCommands
+from .energy import EnergyAccumulator
+from .guard import OvercurrentGuard, GUARD_SHED, GUARD_SHED_FAILED
+from .polling import (
+    PollingPolicy,
+    PublishPolicy,
+    DATA_CURRENT,
+    DATA_OUTLETS,
+    DATA_METADATA,
+    DATA_PROBES,
+)
+from .snapshot import PDUSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+# GETBULK non-repeaters behave like GETNEXT, so asking for the column returns
+# its first row, which is CURRENT_OID.
+_CURRENT_COLUMN_OID = CURRENT_OID.rsplit(".", 1)[0]
+
+# Metering columns: data key, column OID, capability and scale to base units
+_METERING_COLUMNS = [
+    ("outlet_current", OUTLET_METERED_CURRENT_OID, "metered_outlets", 0.1),
+    ("outlet_power", OUTLET_METERED_POWER_OID, "metered_outlets", 1.0),
+    ("outlet_energy", OUTLET_METERED_ENERGY_OID, "metered_outlets", 0.1),
+    ("phase_current", PHASE_CURRENT_OID, "phases", 0.1),
+    ("bank_current", BANK_CURRENT_OID, "banks", 0.1),
+]
+
+# Probe columns, same layout. Read as GETNEXT non-repeaters of the row before
+# each probe, so they ride in the GETBULK that reads the total current.
+_PROBE_COLUMNS = [
+    ("probe_temperature", PROBE_TEMPERATURE_OID, "probes", 0.1),
+    ("probe_humidity", PROBE_HUMIDITY_OID, "humidity_probes", 1.0),
+]
+
+# Outlet command -> master control command doing the same to every outlet
+_MASTER_COMMANDS = {
+    OUTLET_ON: MASTER_ALL_ON,
+    OUTLET_OFF: MASTER_ALL_OFF,
+    OUTLET_REBOOT: MASTER_REBOOT_ALL,
+    OUTLET_ON_DELAYED: MASTER_ALL_ON_SEQUENCE,
+    OUTLET_OFF_DELAYED: MASTER_ALL_OFF_SEQUENCE,
+    OUTLET_REBOOT_DELAYED: MASTER_REBOOT_ALL_SEQUENCE,
+}
+
+# Outlet command -> state the outlet ends up in
+_COMMAND_STATES = {
+    OUTLET_ON: OUTLET_ON,
+    OUTLET_OFF: OUTLET_OFF,
+    OUTLET_REBOOT: OUTLET_ON,
+    OUTLET_ON_DELAYED: OUTLET_ON,
+    OUTLET_OFF_DELAYED: OUTLET_OFF,
+    OUTLET_REBOOT_DELAYED: OUTLET_ON,
+}
+
+_TRAP_OUTLET_STATES = {TRAP_OUTLET_ON_OID: OUTLET_ON, TRAP_OUTLET_OFF_OID: OUTLET_OFF}
+
+# Configured delays that pass before a command's final state is reached
+_DELAY_OIDS = {
+    OUTLET_ON: [OUTLET_POWER_ON_DELAY_OID],
+    OUTLET_OFF: [OUTLET_POWER_OFF_DELAY_OID],
+    OUTLET_REBOOT: [OUTLET_REBOOT_DURATION_OID],
+    OUTLET_ON_DELAYED: [OUTLET_POWER_ON_DELAY_OID],
+    OUTLET_OFF_DELAYED: [OUTLET_POWER_OFF_DELAY_OID],
+    OUTLET_REBOOT_DELAYED: [
+        OUTLET_POWER_OFF_DELAY_OID, OUTLET_REBOOT_DURATION_OID, OUTLET_POWER_ON_DELAY_OID,
+    ],
+}
+
+
+class APCPDUCoordinator(DataUpdateCoordinator):
+    """Class to manage fetching APC PDU data from SNMP.
+
+    A single coordinator polls every outlet state and the total current for
+    one PDU, and all switch and sensor entities read from it. A PollingPolicy
+    decides which data classes are due on each cycle and when the next one
+    runs. Coordinators of a fleet entry are managed: they run no timer of
+    their own and are refreshed by the entry's FleetScheduler instead.
+    """
+    
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: APCPDUSession,
+        outlet_count: int,
+        capabilities: Optional[Dict[str, Any]] = None,
+        policy: Optional[PollingPolicy] = None,
+        managed: bool = False,
+        publish: Optional[PublishPolicy] = None,
+    ):
+        """Initialize the coordinator."""
+        self.policy = policy or PollingPolicy()
+        self.publish = publish or PublishPolicy()
+        self.managed = managed
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_{session.host}",
+            update_interval=None if managed else self.policy.next_interval(),
+        )
+        self.session = session
+        self.host = session.host
+        self.outlet_count = outlet_count
+        self.capabilities = capabilities or {}
+        self.pending = PendingCommands()
+        self._delays: Dict[str, float] = {}
+        
+        # Tunable from the entry options, see apply_options
+        self.max_repetitions = DEFAULT_BULK_REPETITIONS
+        self.confirm_mode = CONFIRM_READ_BACK
+        self.confirm_delay = SET_CONFIRM_DELAY
+        self.confirm_timeout = SET_CONFIRM_TIMEOUT
+        self.first_refresh_delay = 0.0
+        self.voltage = DEFAULT_VOLTAGE
+        self.power_factor = DEFAULT_POWER_FACTOR
+        self.guard = OvercurrentGuard()
+        
+        # Without per-outlet kWh counters energy is integrated from the total current
+        self.energy: Optional[EnergyAccumulator] = None
+        if not self.capabilities.get("metered_outlets"):
+            self.energy = EnergyAccumulator()
+        
+        # Only walk the metering columns this PDU actually has
+        self._metering_columns = [
+            column for column in _METERING_COLUMNS
+            if self.capabilities.get(column[2])
+        ]
+        
+        self._probe_columns = [
+            column for column in _PROBE_COLUMNS
+            if self.capabilities.get(column[2])
+        ]
+        
+        # Entities read states and readings from here, by index
+        reading_rows = {
+            key: max(self.capabilities[capability])
+            for key, _, capability, _ in self._metering_columns + self._probe_columns
+        }
+        if self.energy is not None:
+            reading_rows["total_energy"] = 0
+        self.snapshot = PDUSnapshot(outlet_count, reading_rows)
+        
+        # Names and device info were just discovered by the config flow
+        self.policy.mark_polled({DATA_METADATA})
+        
+    async def _async_update_data(self):
+        """Fetch data from APC PDU."""
+        if self.session.congested and current_priority() == PRIORITY_POLL and self.data:
+            # Backpressure: keep the last snapshot rather than queue another poll
+            _LOGGER.debug("PDU %s is still busy, skipping this poll", self.host)
+            return self.data
+        
+        now = time.monotonic()
+        due = self.policy.due(now)
+        if current_priority() != PRIORITY_POLL:
+            # Confirmation reads after a SET always include the outlets
+            due.add(DATA_OUTLETS)
+        if not due & {DATA_CURRENT, DATA_OUTLETS}:
+            # Probes wait for the next request that goes out anyway
+            due.discard(DATA_PROBES)
+        
+        try:
+            data = await self._async_poll(due)
+        except Exception as err:
+            # Back off while the PDU is unreachable
+            self.policy.record_failure()
+            self._reschedule()
+            if isinstance(err, UpdateFailed):
+                raise
+            _LOGGER.exception("Error communicating with APC PDU at %s", self.host)
+            raise UpdateFailed(f"Error communicating with APC PDU: {err}")
+        
+        self.policy.mark_polled(due, now)
+        self._update_snapshot(data)
+        if DATA_CURRENT in due and self.guard.enabled:
+            await self._async_guard(data)
+        self._reschedule()
+        return data
+    
+    def _update_snapshot(self, data: dict) -> None:
+        """Publish new data to the snapshot before listeners run."""
+        renamed = self.data and data.get("outlet_names") != self.data.get("outlet_names")
+        self.snapshot.update(data)
+        if renamed:
+            # Renamed outlets need their entities written too
+            self.snapshot.touch_outlets(range(1, self.outlet_count + 1))
+    
+    def apply_options(
+        self,
+        intervals: Dict[str, float],
+        max_repetitions: int,
+        confirm_mode: str,
+        confirm_delay: float,
+        confirm_timeout: float,
+        publish: PublishPolicy,
+        voltage: float = DEFAULT_VOLTAGE,
+        power_factor: float = DEFAULT_POWER_FACTOR,
+        energy_method: Optional[str] = None,
+        guard_limit: float = DEFAULT_GUARD_LIMIT,
+        guard_hysteresis: float = DEFAULT_GUARD_HYSTERESIS,
+        shed_order: Optional[List[int]] = None,
+    ) -> None:
+        """Apply tuning from the entry options, also while running.
+
+        New intervals take effect from the next refresh; a fleet's scheduler
+        or a requested refresh picks them up straight away.
+        """
+        self.policy.intervals.update(intervals)
+        self.max_repetitions = max_repetitions
+        self.confirm_mode = confirm_mode
+        self.confirm_delay = confirm_delay
+        self.confirm_timeout = confirm_timeout
+        self.publish = publish
+        self.voltage = voltage
+        self.power_factor = power_factor
+        if self.energy is not None:
+            if energy_method is not None:
+                self.energy.method = energy_method
+            self.energy.max_gap = ENERGY_MAX_GAP_POLLS * self.policy.intervals[DATA_CURRENT]
+        self.guard.configure(
+            guard_limit,
+            guard_hysteresis,
+            [outlet for outlet in shed_order or [] if outlet <= self.outlet_count],
+        )
+        self._reschedule()
+    
+    def defer_first_refresh(self, delay: float) -> Optional[CALLBACK_TYPE]:
+        """Run the first poll delay seconds from now, in the background.
+
+        Until then entities show their restored state. The coordinator's own
+        timer is only armed by a refresh, so the first one is scheduled here
+        and the returned callback cancels it. A fleet's scheduler reads
+        first_refresh_delay instead.
+        """
+        self.first_refresh_delay = delay
+        if self.managed:
+            return None
+        
+        @callback
+        def _async_first_refresh(_now) -> None:
+            self.hass.async_create_task(self.async_refresh())
+        
+        return async_call_later(self.hass, delay, _async_first_refresh)
+    
+    def _repetitions(self, rows: int) -> int:
+        """Return the GETBULK size for rows, capped by the max_repetitions option."""
+        if self.max_repetitions:
+            return min(rows, self.max_repetitions)
+        return rows
+    
+    def _reschedule(self) -> None:
+        """Follow the polling policy, unless a fleet scheduler drives this coordinator."""
+        if not self.managed:
+            self.update_interval = self.policy.next_interval()
+    
+    async def _async_poll(self, due: set) -> dict:
+        """Poll the due data classes, keeping the previous values of the rest."""
+        data = dict(self.data) if self.data else {"outlets": {}, "total_current": None}
+        
+        if DATA_CURRENT in due or DATA_OUTLETS in due:
+            # Total current and every outlet state in a single GETBULK request
+            scalar_oids = [_CURRENT_COLUMN_OID] if DATA_CURRENT in due else []
+            if DATA_PROBES in due:
+                scalar_oids += self._probe_oids()
+            repeating_oids = [BASE_OID] if DATA_OUTLETS in due else []
+            repetitions = self._repetitions(self.outlet_count)
+            paged = DATA_OUTLETS in due and repetitions < self.outlet_count
+            if paged:
+                # More outlets than this NMC may return at once, walk them in pages
+                repeating_oids = []
+            scalars, rows = {}, {}
+            if scalar_oids or repeating_oids:
+                result = await self.session.async_bulk_get(
+                    scalar_oids, repeating_oids, max_repetitions=repetitions
+                )
+                if result is None:
+                    raise UpdateFailed(f"No response from APC PDU at {self.host}")
+                scalars, rows = result
+            if paged:
+                column = (await self.session.async_bulk_table(
+                    [BASE_OID], max_repetitions=repetitions
+                ))[BASE_OID]
+                if not column:
+                    raise UpdateFailed(f"No response from APC PDU at {self.host}")
+                rows = {f"{BASE_OID}.{outlet}": value for outlet, value in column.items()}
+            
+            if DATA_OUTLETS in due:
+                outlets = {}
+                for oid, value in rows.items():
+                    outlet = oid_index(oid, BASE_OID)
+                    if outlet is not None:
+                        outlets[outlet] = int(value)
+                if data["outlets"] and outlets and outlets != data["outlets"]:
+                    # Something switched an outlet, watch closely for a while
+                    self.policy.trigger_fast_poll()
+                data["outlets"] = outlets
+                self._resolve_pending(outlets)
+            
+            if DATA_CURRENT in due:
+                current_value = scalars.get(CURRENT_OID)
+                if current_value is not None:
+                    # Convert from deciamps to amps (typical APC PDU format)
+                    data["total_current"] = int(current_value) / 10.0
+                    _LOGGER.debug("PDU total current: %.1f A", data["total_current"])
+                    if self.energy is not None:
+                        self.energy.add(
+                            time.monotonic(),
+                            data["total_current"] * self.voltage * self.power_factor,
+                        )
+                        data["total_energy"] = {0: self.energy.total_kwh}
+                else:
+                    _LOGGER.warning("Failed to read total current from PDU")
+                    data["total_current"] = None
+                
+                if self._metering_columns:
+                    await self._async_update_metering(data)
+            
+            if DATA_PROBES in due:
+                self._update_probes(data, scalars)
+        
+        if DATA_METADATA in due:
+            await self._async_update_metadata(data)
+        
+        return data
+    
+    async def _async_guard(self, data: dict) -> None:
+        """Check the total current against the guard and shed outlets if needed.
+
+        Runs right after the poll, so the SET goes out without waiting for an
+        automation. Every outlet to shed goes in one SET.
+        """
+        current = data.get("total_current")
+        states = {outlet: self.outlet_state(outlet) for outlet in self.guard.shed_order}
+        actions, shed = self.guard.evaluate(current, states, data.get("outlet_current") or {})
+        if self.guard.watching:
+            self.policy.trigger_fast_poll()
+        for action in actions:
+            self._fire_guard_event(action, current)
+        if shed:
+            _LOGGER.warning(
+                "PDU %s at %.1f A of a %.1f A limit, shedding outlets %s",
+                self.host, current, self.guard.limit, shed,
+            )
+            sent = await self.async_set_outlets({outlet: OUTLET_OFF for outlet in shed})
+            self._fire_guard_event(GUARD_SHED if sent else GUARD_SHED_FAILED, current, shed)
+    
+    def _fire_guard_event(
+        self, action: str, current: Optional[float], outlets: Optional[List[int]] = None
+    ) -> None:
+        """Record a guard action on the event bus for auditing."""
+        self.hass.bus.async_fire(EVENT_OVERCURRENT, {
+            "host": self.host,
+            "action": action,
+            "current": current,
+            "limit": self.guard.limit,
+            "hysteresis": self.guard.hysteresis,
+            "outlets": outlets or [],
+        })
+    
+    @callback
+    def async_handle_trap(self, trap_oid: str, values: Dict[str, Any]) -> None:
+        """Apply a trap from the PDU to the snapshot without polling."""
+        self.policy.push_received()
+        
+        state = _TRAP_OUTLET_STATES.get(trap_oid)
+        outlet = values.get(TRAP_ARG_INTEGER_OID)
+        if state is not None and isinstance(outlet, int) and self.data:
+            data = dict(self.data)
+            data["outlets"] = {**data["outlets"], outlet: state}
+            self._resolve_pending({outlet: state})
+            self._update_snapshot(data)
+            self.async_set_updated_data(data)
+            return
+        
+        # Any other APC event (load thresholds, ...) triggers a debounced refresh
+        self.hass.async_create_task(self.async_request_refresh())
+    
+    def outlet_state(self, outlet: int) -> Optional[int]:
+        """Return an outlet's state, the commanded one while a SET is pending."""
+        pending = self.pending.state(outlet)
+        if pending is not None:
+            return pending
+        return self.snapshot.outlet(outlet)
+    
+    def _resolve_pending(self, outlets: Dict[int, int]) -> None:
+        """Confirm pending commands against reported outlet states."""
+        if not self.pending:
+            return
+        confirmed, expired = self.pending.resolve(outlets)
+        # Entities drop the pending flag, or fall back to the reported state
+        self.snapshot.touch_outlets(confirmed + expired)
+        if expired:
+            _LOGGER.warning("State change not confirmed for outlets %s on PDU %s", expired, self.host)
+        if self.pending:
+            # Keep polling quickly until every command is confirmed or expired
+            self.policy.trigger_fast_poll()
+    
+    async def _async_update_metadata(self, data: dict) -> None:
+        """Re-read outlet names and device information."""
+        # Outlet delays are re-read on the next command
+        self._delays.clear()
+        outlets = await discover_outlets(
+            self.session, self._repetitions(DEFAULT_MAX_REPETITIONS)
+        )
+        if outlets:
+            data["outlet_names"] = {num: name for num, name in outlets}
+        device_info = await discover_device_info(self.session)
+        if device_info:
+            data["device_info"] = device_info
+    
+    async def _async_update_metering(self, data: dict) -> None:
+        """Read all metering columns with one GETBULK table walk."""
+        rows = max(len(self.capabilities.get(column[2], [])) for column in self._metering_columns)
+        table = await self.session.async_bulk_table(
+            [column[1] for column in self._metering_columns],
+            max_repetitions=self._repetitions(rows + 1),
+        )
+        for key, oid, _, scale in self._metering_columns:
+            data[key] = {index: int(value) * scale for index, value in table[oid].items()}
+
+    def _probe_oids(self) -> List[str]:
+        """Return the GETNEXT OIDs that read every probe column."""
+        return [
+            f"{oid}.{row - 1}"
+            for _, oid, capability, _ in self._probe_columns
+            for row in self.capabilities[capability]
+        ]
+    
+    def _update_probes(self, data: dict, scalars: Dict[str, Any]) -> None:
+        """Parse the probe readings out of the GETBULK scalars."""
+        for key, oid, _, scale in self._probe_columns:
+            readings = {}
+            for reply_oid, value in scalars.items():
+                row = oid_index(reply_oid, oid)
+                # A disconnected humidity sensor reads -1
+                if row is None or (key == "probe_humidity" and int(value) < 0):
+                    continue
+                readings[row] = int(value) * scale
+            data[key] = readings
+    
+    async def _async_outlet_delays(self, outlets: Dict[int, int]) -> Dict[int, float]:
+        """Return the configured time each outlet command takes to complete.
+
+        Delays are read once and cached until the next metadata poll. PDUs
+        without the outlet configuration table report no delay.
+        """
+        oids = {
+            outlet: [f"{column}.{outlet}" for column in _DELAY_OIDS[command]]
+            for outlet, command in outlets.items()
+        }
+        missing = list({oid for column in oids.values() for oid in column if oid not in self._delays})
+        if missing:
+            values = await self.session.async_get_many(missing)
+            for oid, value in values.items():
+                # -1 means the PDU never switches the outlet by itself
+                self._delays[oid] = max(int(value), 0) if value is not None else 0
+        return {
+            outlet: sum(self._delays.get(oid, 0) for oid in column)
+            for outlet, column in oids.items()
+        }
+    
+    async def async_set_outlets(self, outlets: Dict[int, int]) -> bool:
+        """Send outlet commands with one SET and confirm them in the background.
+
+        outlets maps outlet number to an sPDUOutletCtl command: on, off,
+        reboot or their delayed variants. When every outlet gets the same
+        command the PDU's master control is used (the delayed variants map
+        to its sequenced commands), falling back to a multi-varbind SET on
+        the outlet control column if the device does not support it. A
+        rejected master command is not tried again on the session.
+        
+        Returns as soon as the SET is accepted. Entities show the state the
+        command ends in right away, and the next poll or trap confirms it.
+        An outlet that has not switched by the end of its configured delays
+        plus the confirm timeout falls back to the state the PDU reports.
+        """
+        if not outlets:
+            return True
+        
+        with control_priority():
+            delays = await self._async_outlet_delays(outlets)
+        
+        sent = False
+        commands = set(outlets.values())
+        if len(commands) == 1 and set(outlets) == set(range(1, self.outlet_count + 1)):
+            command = _MASTER_COMMANDS.get(next(iter(commands)))
+            # rPDU2 models reject it, which the session remembers
+            if command is not None and (MASTER_CONTROL_OID, command) not in self.session.unsupported:
+                sent = await self.session.async_set(MASTER_CONTROL_OID, command, optional=True)
+        
+        if not sent:
+            sent = await self.session.async_set_many(
+                {f"{BASE_OID}.{outlet}": command for outlet, command in outlets.items()}
+            )
+        if not sent:
+            return False
+        
+        now = time.monotonic()
+        for outlet, command in outlets.items():
+            self.pending.add(
+                outlet, _COMMAND_STATES[command], now + delays[outlet] + self.confirm_timeout
+            )
+        self.snapshot.touch_outlets(outlets)
+        self.async_update_listeners()
+        
+        self.policy.trigger_fast_poll()
+        if self.confirm_mode == CONFIRM_READ_BACK:
+            self.hass.async_create_task(self._async_confirm())
+        return True
+    
+    async def _async_confirm(self) -> None:
+        """Read the outlets back once the PDU had a moment to act on a SET."""
+        await asyncio.sleep(self.confirm_delay)
+        with control_priority():
+            await self.async_refresh()
@@ -0,0 +1,58 @@
+# File: custom_components/apc_pdu/diagnostics.py
+
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_USERNAME, CONF_AUTH_KEY, CONF_PRIV_KEY
+
+TO_REDACT = {"community", "serial_number", CONF_USERNAME, CONF_AUTH_KEY, CONF_PRIV_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "pdus": {
+            host: _pdu_diagnostics(pdu) for host, pdu in entry_data["pdus"].items()
+        },
+    }
+
+
+def _pdu_diagnostics(pdu: Dict[str, Any]) -> Dict[str, Any]:
+    """Return diagnostics for one PDU of an entry."""
+    coordinator = pdu["coordinator"]
+    session = pdu["session"]
+    policy = coordinator.policy
+    data = coordinator.data or {}
+    
+    return {
+        "capabilities": {key: len(rows) for key, rows in pdu["capabilities"].items()},
+        "polling": {
+            "intervals": dict(policy.intervals),
+            "update_interval": (
+                coordinator.update_interval.total_seconds()
+                if coordinator.update_interval else None
+            ),
+            "managed": coordinator.managed,
+            "failures": policy.failures,
+            "fast_polling": policy.fast_polling,
+            "push_enabled": policy.push_enabled,
+            "push_healthy": policy.push_healthy,
+            "last_update_success": coordinator.last_update_success,
+        },
+        "state": {
+            "outlets": data.get("outlets"),
+            "total_current": data.get("total_current"),
+        },
+        "snmp": {
+            "address": session.address,
+            "congested": session.congested,
+            **session.stats.as_dict(),
+        },
+    }
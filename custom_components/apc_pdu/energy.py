@@ -0,0 +1,107 @@
+# File: custom_components/apc_pdu/energy.py
+
+from array import array
+from typing import Optional
+
+from .const import (
+    ENERGY_METHOD_LEFT,
+    ENERGY_METHOD_RIGHT,
+    ENERGY_METHOD_TRAPEZOIDAL,
+    ENERGY_MAX_GAP_POLLS,
+    ENERGY_SAMPLE_RING,
+    SENSOR_UPDATE_INTERVAL,
+)
+
+
+class EnergyAccumulator:
+    """Time-weighted energy from power samples, for PDUs without kWh counters.
+
+    Samples go into a fixed-size ring of (monotonic time, watts) and each
+    span between two consecutive samples is added to the total with the
+    configured method: trapezoidal, left or right, as in Home Assistant's
+    integration helper. A span longer than max_gap, e.g. while the PDU was
+    unreachable, is not bridged: nothing is known about the load during it,
+    so it is counted as missed instead. The total survives restarts through
+    the energy sensor's restored state.
+    """
+
+    __slots__ = (
+        "method", "max_gap", "total_kwh", "gaps", "missed_seconds",
+        "_times", "_watts", "_head", "_count", "_restored",
+    )
+
+    def __init__(
+        self,
+        method: str = ENERGY_METHOD_TRAPEZOIDAL,
+        max_gap: float = ENERGY_MAX_GAP_POLLS * SENSOR_UPDATE_INTERVAL,
+        size: int = ENERGY_SAMPLE_RING,
+    ) -> None:
+        self.method = method
+        self.max_gap = max_gap
+        self.total_kwh = 0.0
+        self.gaps = 0
+        self.missed_seconds = 0.0
+        self._times = array("d", [0.0] * size)
+        self._watts = array("d", [0.0] * size)
+        self._head = 0
+        self._count = 0
+        self._restored = False
+
+    def _last(self) -> Optional[int]:
+        if not self._count:
+            return None
+        return (self._head - 1) % len(self._times)
+
+    def add(self, when: float, watts: float) -> float:
+        """Record a power sample and return the energy in kWh it added."""
+        added = 0.0
+        last = self._last()
+        if last is not None:
+            elapsed = when - self._times[last]
+            if elapsed <= 0:
+                return 0.0
+            if elapsed > self.max_gap:
+                self.gaps += 1
+                self.missed_seconds += elapsed
+            else:
+                previous = self._watts[last]
+                if self.method == ENERGY_METHOD_LEFT:
+                    power = previous
+                elif self.method == ENERGY_METHOD_RIGHT:
+                    power = watts
+                else:
+                    power = (previous + watts) / 2
+                added = power * elapsed / 3_600_000
+                self.total_kwh += added
+
+        self._times[self._head] = when
+        self._watts[self._head] = watts
+        self._head = (self._head + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+        return added
+
+    def restore(self, total_kwh: float) -> None:
+        """Continue from the total reached before a restart.
+
+        Energy integrated before the restore is kept on top of it. Only the
+        first restore counts, so re-adding the sensor cannot apply it twice.
+        """
+        if not self._restored:
+            self._restored = True
+            self.total_kwh += total_kwh
+
+    def average_power(self) -> Optional[float]:
+        """Return the time-weighted mean power over the samples in the ring."""
+        if self._count < 2:
+            return None
+        size = len(self._times)
+        start = (self._head - self._count) % size
+        energy = duration = 0.0
+        for offset in range(1, self._count):
+            previous = (start + offset - 1) % size
+            current = (start + offset) % size
+            elapsed = self._times[current] - self._times[previous]
+            if 0 < elapsed <= self.max_gap:
+                energy += (self._watts[previous] + self._watts[current]) / 2 * elapsed
+                duration += elapsed
+        return energy / duration if duration else None
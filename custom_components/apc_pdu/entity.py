@@ -0,0 +1,89 @@
+# File: custom_components/apc_pdu/entity.py
+
+import time
+from typing import Any, Dict, Optional
+
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .coordinator import APCPDUCoordinator
+
+
+def pdu_device_info(host: str, device_info: Dict[str, Any]) -> DeviceInfo:
+    """Build the device registry info of a PDU from its discovered device info."""
+    # Use discovered device info with fallbacks
+    device_info_dict = {
+        "identifiers": {(DOMAIN, host)},
+        "name": device_info.get("name", f"APC PDU ({host})"),
+        "manufacturer": "APC",
+        "model": device_info.get("model", "Smart PDU"),
+        "configuration_url": f"http://{host}",
+    }
+
+    # Add serial number if available
+    if device_info.get("serial_number"):
+        device_info_dict["serial_number"] = device_info["serial_number"]
+
+    return DeviceInfo(**device_info_dict)
+
+
+class APCPDUEntity(CoordinatorEntity, RestoreEntity):
+    """Base class for entities reading from a PDU's coordinator snapshot.
+
+    Device info is built once. On each coordinator update the entity only
+    writes its state if its own slot in the snapshot changed since its last
+    write, or its availability changed, so a poll in which nothing moved
+    writes nothing to the state machine.
+
+    The first poll runs in the background after the entities are added, so
+    until it arrives each entity seeds its snapshot slot with the state it
+    had before Home Assistant restarted.
+    """
+
+    def __init__(self, coordinator: APCPDUCoordinator, device_info: Dict[str, Any]):
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self._attr_device_info = pdu_device_info(coordinator.host, device_info)
+        self._written_generation = -1
+        self._written_available = None
+        self._written_at: Optional[float] = None
+
+    def _changed_since(self, generation: int) -> bool:
+        """Return True if this entity's data changed after a snapshot generation."""
+        return True
+
+    def _should_write(self) -> bool:
+        """Return True if the state should be written on this update."""
+        return self._changed_since(self._written_generation)
+
+    def _update_attributes(self) -> None:
+        """Refresh cached attributes right before the state is written."""
+
+    async def _async_restore(self) -> None:
+        """Seed the snapshot with this entity's last known state."""
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if something this entity shows has changed."""
+        available = self.available
+        if available == self._written_available and not self._should_write():
+            return
+        self._write_state(available)
+
+    @callback
+    def _write_state(self, available: bool) -> None:
+        self._written_generation = self.coordinator.snapshot.generation
+        self._written_available = available
+        self._written_at = time.monotonic()
+        self._update_attributes()
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the last known state if the PDU was not polled yet, then cache attributes."""
+        if self.coordinator.data is None:
+            await self._async_restore()
+        self._update_attributes()
+        await super().async_added_to_hass()
@@ -0,0 +1,201 @@
+# File: custom_components/apc_pdu/fleet.py
+
+import asyncio
+import ipaddress
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from puresnmp.credentials import Credentials
+from puresnmp.exc import SnmpError
+
+from .const import (
+    DOMAIN,
+    FLEET_MAX_HOSTS,
+    FLEET_DISCOVERY_CONCURRENCY,
+    FLEET_DISCOVERY_TIMEOUT,
+    FLEET_MAX_CONCURRENT_POLLS,
+)
+from .coordinator import APCPDUCoordinator
+from .polling import DATA_CURRENT, DATA_OUTLETS
+from .snmp import APCPDUSession, discover_device_info, discover_outlets
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TooManyHostsError(ValueError):
+    """Raised when a host list expands to more than FLEET_MAX_HOSTS addresses."""
+
+
+def is_host_list(value: str) -> bool:
+    """Return True if the host field names several PDUs or a range."""
+    return bool(re.search(r"[\s,;/]", value.strip()))
+
+
+def parse_hosts(value: str) -> List[str]:
+    """Expand a list of hosts and CIDR ranges into individual hosts.
+
+    Entries may be separated by commas, semicolons or whitespace. Ranges
+    expand to their usable addresses; duplicates are dropped in order.
+    """
+    hosts: List[str] = []
+    for item in re.split(r"[\s,;]+", value.strip()):
+        if not item:
+            continue
+        if "/" in item:
+            network = ipaddress.ip_network(item, strict=False)
+            if network.num_addresses > FLEET_MAX_HOSTS + 2:
+                raise TooManyHostsError(item)
+            hosts.extend(str(address) for address in network.hosts())
+        else:
+            hosts.append(item)
+        if len(hosts) > FLEET_MAX_HOSTS:
+            raise TooManyHostsError(item)
+    return list(dict.fromkeys(hosts))
+
+
+async def async_discover_pdus(
+    hosts: List[str],
+    community: str,
+    concurrency: int = FLEET_DISCOVERY_CONCURRENCY,
+    credentials: Optional[Credentials] = None,
+) -> List[Dict[str, Any]]:
+    """Discover outlets and device info on many hosts in parallel.
+
+    At most concurrency hosts are probed at once, each with a short timeout
+    since most addresses of a range will not answer. Returns the config of
+    every host that turned out to be a PDU, in the order given. With SNMPv3
+    credentials each host's engine is discovered on its own session.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def discover(host: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            session = APCPDUSession(
+                host, community, timeout=FLEET_DISCOVERY_TIMEOUT, retries=1,
+                credentials=credentials,
+            )
+            try:
+                await session.async_connect()
+                outlets, device_info = await asyncio.gather(
+                    discover_outlets(session), discover_device_info(session)
+                )
+                if not outlets:
+                    return None
+            except (OSError, SnmpError) as e:
+                # e.g. no answer to SNMPv3 engine discovery
+                _LOGGER.debug("Could not reach %s: %s", host, e)
+                return None
+            finally:
+                await session.async_close()
+        return {
+            "host": host,
+            "outlet_count": len(outlets),
+            "outlet_names": {str(num): name for num, name in outlets},
+            "device_info": device_info,
+        }
+
+    results = await asyncio.gather(*(discover(host) for host in hosts))
+    pdus = [pdu for pdu in results if pdu is not None]
+    _LOGGER.info("Discovered %d PDUs on %d hosts", len(pdus), len(hosts))
+    return pdus
+
+
+class FleetScheduler:
+    """Poll every PDU of a fleet entry from one loop.
+
+    The coordinators of a fleet run no timers of their own. The scheduler
+    spreads their polls evenly across the poll interval, then refreshes each
+    one whenever its PollingPolicy says it is due, with at most
+    FLEET_MAX_CONCURRENT_POLLS polls running at once, so dozens of PDUs never
+    all hit the network in the same second.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinators: List[APCPDUCoordinator],
+        max_concurrent: int = FLEET_MAX_CONCURRENT_POLLS,
+    ) -> None:
+        self.hass = hass
+        self.coordinators = coordinators
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._next_run: Dict[APCPDUCoordinator, float] = {}
+        self._running: set = set()
+        self._wakeup = asyncio.Event()
+        self._entry: Optional[ConfigEntry] = None
+
+    def async_start(self, entry: ConfigEntry) -> None:
+        """Start the poll loop, which stops when the entry unloads.
+
+        Each PDU is first polled after its coordinator's first_refresh_delay
+        plus an equal share of its current poll interval, so the fleet stays
+        spread across the interval from the first poll on.
+        """
+        self._entry = entry
+        now = asyncio.get_running_loop().time()
+        count = len(self.coordinators)
+        for number, coordinator in enumerate(self.coordinators):
+            policy = coordinator.policy
+            interval = min(policy.intervals[DATA_CURRENT], policy.intervals[DATA_OUTLETS])
+            offset = interval * number / count
+            self._next_run[coordinator] = now + coordinator.first_refresh_delay + offset
+            entry.async_on_unload(
+                coordinator.async_add_listener(self._listener(coordinator))
+            )
+        entry.async_create_background_task(
+            self.hass, self._async_run(), f"{DOMAIN}_fleet_{entry.entry_id}"
+        )
+
+    def reschedule(self) -> None:
+        """Recompute every PDU's next poll, e.g. after the intervals changed."""
+        for coordinator in self.coordinators:
+            self._schedule(coordinator)
+
+    def _listener(self, coordinator: APCPDUCoordinator):
+        @callback
+        def _async_updated() -> None:
+            # Refreshes from SETs and traps move the schedule too
+            self._schedule(coordinator)
+        return _async_updated
+
+    def _schedule(self, coordinator: APCPDUCoordinator) -> None:
+        delay = coordinator.policy.next_interval().total_seconds()
+        self._next_run[coordinator] = asyncio.get_running_loop().time() + delay
+        self._wakeup.set()
+
+    async def _async_run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            for coordinator, when in self._next_run.items():
+                if when <= now and coordinator not in self._running:
+                    self._running.add(coordinator)
+                    self._entry.async_create_background_task(
+                        self.hass,
+                        self._async_refresh(coordinator),
+                        f"{DOMAIN}_fleet_refresh_{coordinator.host}",
+                    )
+
+            waiting = [
+                when for coordinator, when in self._next_run.items()
+                if coordinator not in self._running
+            ]
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    max(min(waiting) - loop.time(), 0) if waiting else None,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _async_refresh(self, coordinator: APCPDUCoordinator) -> None:
+        try:
+            async with self._semaphore:
+                await coordinator.async_refresh()
+        finally:
+            self._running.discard(coordinator)
+            self._schedule(coordinator)
@@ -0,0 +1,120 @@
+# File: custom_components/apc_pdu/guard.py
+
+from typing import Dict, List, Optional, Tuple
+
+from .const import (
+    OUTLET_ON,
+    GUARD_NEAR_RATIO,
+    DEFAULT_GUARD_HYSTERESIS,
+)
+
+# Guard actions, each fired as an event
+GUARD_NEAR = "near"  # current crossed the near threshold, fast polling starts
+GUARD_NORMAL = "normal"  # current fell back below the near threshold
+GUARD_TRIPPED = "tripped"  # current reached the limit
+GUARD_SHED = "shed"  # outlets were switched off
+GUARD_SHED_FAILED = "shed_failed"  # the SET switching them off failed
+GUARD_EXHAUSTED = "exhausted"  # over the limit with nothing left to shed
+GUARD_CLEARED = "cleared"  # current fell below the limit minus the hysteresis
+
+
+def parse_shed_order(value: str) -> List[int]:
+    """Parse a comma-separated outlet list, first shed first.
+
+    Raises ValueError for anything but distinct positive outlet numbers.
+    """
+    outlets = [int(part) for part in value.replace(" ", "").split(",") if part]
+    if any(outlet < 1 for outlet in outlets) or len(set(outlets)) != len(outlets):
+        raise ValueError(value)
+    return outlets
+
+
+class OvercurrentGuard:
+    """Decide when to shed outlets of a PDU that nears its current limit.
+
+    Evaluated on every current reading. Above GUARD_NEAR_RATIO of the limit
+    the PDU is polled quickly. At the limit the guard trips and picks the
+    outlets to shed from the priority order: with per-outlet metering just
+    enough of them to bring the current below the limit minus the
+    hysteresis, otherwise one per reading until the current drops. The
+    guard clears once the current is below the limit minus the hysteresis.
+    Shed outlets are never switched back on by the guard.
+    """
+
+    __slots__ = ("limit", "hysteresis", "shed_order", "near", "tripped", "exhausted")
+
+    def __init__(self) -> None:
+        self.limit = 0.0
+        self.hysteresis = DEFAULT_GUARD_HYSTERESIS
+        self.shed_order: List[int] = []
+        self.near = False
+        self.tripped = False
+        self.exhausted = False
+
+    def configure(self, limit: float, hysteresis: float, shed_order: List[int]) -> None:
+        """Apply new settings, keeping the current state."""
+        self.limit = limit
+        self.hysteresis = hysteresis
+        self.shed_order = shed_order
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    @property
+    def watching(self) -> bool:
+        """Return True while the PDU should be polled quickly."""
+        return self.near or self.tripped
+
+    def evaluate(
+        self,
+        current: Optional[float],
+        states: Dict[int, Optional[int]],
+        loads: Dict[int, float],
+    ) -> Tuple[List[str], List[int]]:
+        """Return the actions a current reading causes and the outlets to shed.
+
+        states holds the state of every outlet in the shed order, loads the
+        per-outlet current of metered PDUs.
+        """
+        if not self.enabled or current is None:
+            return [], []
+
+        actions = []
+        near = current >= self.limit * GUARD_NEAR_RATIO
+        if near != self.near:
+            actions.append(GUARD_NEAR if near else GUARD_NORMAL)
+            self.near = near
+
+        shed: List[int] = []
+        if current >= self.limit:
+            if not self.tripped:
+                self.tripped = True
+                actions.append(GUARD_TRIPPED)
+            shed = self._select(current, states, loads)
+            if shed:
+                self.exhausted = False
+            elif not self.exhausted:
+                self.exhausted = True
+                actions.append(GUARD_EXHAUSTED)
+        elif self.tripped and current < self.limit - self.hysteresis:
+            self.tripped = False
+            self.exhausted = False
+            actions.append(GUARD_CLEARED)
+        return actions, shed
+
+    def _select(
+        self, current: float, states: Dict[int, Optional[int]], loads: Dict[int, float]
+    ) -> List[int]:
+        candidates = [outlet for outlet in self.shed_order if states.get(outlet) == OUTLET_ON]
+        if not loads:
+            # Unmetered: one outlet per reading, the fast poll shows its effect
+            return candidates[:1]
+        target = self.limit - self.hysteresis
+        shed = []
+        for outlet in candidates:
+            if current < target:
+                break
+            shed.append(outlet)
+            current -= loads.get(outlet, 0.0)
+        return shed
@@ -0,0 +1,215 @@
+# File: custom_components/apc_pdu/metrics.py
+
+import math
+from http import HTTPStatus
+from typing import Any, Dict, List, Tuple
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN, CONF_METRICS, OUTLET_ON
+from .coordinator import APCPDUCoordinator
+from .stats import LATENCY_BUCKETS, SNMPStats
+
+DATA_METRICS_VIEW = f"{DOMAIN}_metrics_view"
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Snapshot readings: data key -> (metric family, type, help, label of the row index)
+_READING_FAMILIES = {
+    "total_current": (
+        "apc_pdu_current_amperes", "gauge", "Total current drawn through the PDU.", None,
+    ),
+    "total_energy": (
+        "apc_pdu_energy_kilowatt_hours", "counter",
+        "Energy integrated from the total current, on PDUs without kWh counters.", None,
+    ),
+    "outlet_current": (
+        "apc_pdu_outlet_current_amperes", "gauge", "Current drawn by an outlet.", "outlet",
+    ),
+    "outlet_power": (
+        "apc_pdu_outlet_power_watts", "gauge", "Power drawn by an outlet.", "outlet",
+    ),
+    "outlet_energy": (
+        "apc_pdu_outlet_energy_kilowatt_hours", "counter", "Energy used by an outlet.", "outlet",
+    ),
+    "phase_current": (
+        "apc_pdu_phase_current_amperes", "gauge", "Current drawn on a phase.", "phase",
+    ),
+    "bank_current": (
+        "apc_pdu_bank_current_amperes", "gauge", "Current drawn on a bank.", "bank",
+    ),
+    "probe_temperature": (
+        "apc_pdu_probe_temperature_celsius", "gauge", "Temperature at a probe.", "probe",
+    ),
+    "probe_humidity": (
+        "apc_pdu_probe_humidity_percent", "gauge", "Relative humidity at a probe.", "probe",
+    ),
+}
+
+# Families rendered from the SNMP statistics: name -> (type, help)
+_STATS_FAMILIES = {
+    "apc_pdu_snmp_packets": ("counter", "SNMP packets sent, retransmits included."),
+    "apc_pdu_snmp_timeouts": ("counter", "SNMP requests that got no response."),
+    "apc_pdu_snmp_errors": ("counter", "SNMP operations that failed."),
+    "apc_pdu_snmp_retransmits": ("counter", "SNMP requests sent again after a timeout."),
+    "apc_pdu_snmp_busy_skips": ("counter", "Polls skipped while the PDU was still busy."),
+    "apc_pdu_snmp_latency_seconds": ("histogram", "SNMP response latency."),
+}
+
+# Every family in exposition order: name -> (type, help)
+_FAMILIES = {
+    "apc_pdu_up": ("gauge", "Whether the last poll of the PDU succeeded."),
+    "apc_pdu_outlet_state": ("gauge", "Outlet state, 1 for on."),
+    **{family: (kind, text) for family, kind, text, _ in _READING_FAMILIES.values()},
+    **_STATS_FAMILIES,
+}
+
+
+@callback
+def async_register_metrics_view(hass: HomeAssistant) -> None:
+    """Register the metrics view once, the first time an entry enables it."""
+    if DATA_METRICS_VIEW not in hass.data:
+        view = APCPDUMetricsView(hass)
+        hass.http.register_view(view)
+        hass.data[DATA_METRICS_VIEW] = view
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class APCPDUMetricsView(HomeAssistantView):
+    """Serve every PDU's latest data in the OpenMetrics text format.
+
+    Everything is rendered from the coordinators' snapshots and session
+    statistics, so a scrape never sends SNMP. Samples are cached per PDU
+    and metric family, and a PDU is only rendered again once its snapshot
+    generation, availability or SNMP counters moved.
+    """
+
+    url = "/api/apc_pdu/metrics"
+    name = "api:apc_pdu:metrics"
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the view."""
+        self.hass = hass
+        # (entry id, host) -> (cache key, family -> rendered samples)
+        self._cache: Dict[Tuple[str, str], Tuple[tuple, Dict[str, str]]] = {}
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Return the metrics of the PDUs of every entry that enables them."""
+        pdus = self._pdus()
+        if not pdus:
+            return self.json_message("APC PDU metrics are not enabled", HTTPStatus.NOT_FOUND)
+
+        seen = set()
+        rendered: List[Dict[str, str]] = []
+        for cache_id, pdu in pdus:
+            seen.add(cache_id)
+            rendered.append(self._render_cached(cache_id, pdu))
+        for cache_id in set(self._cache) - seen:
+            del self._cache[cache_id]
+
+        lines = []
+        for family, (kind, text) in _FAMILIES.items():
+            samples = "".join(chunks.get(family, "") for chunks in rendered)
+            if samples:
+                lines.append(f"# TYPE {family} {kind}\n# HELP {family} {text}\n{samples}")
+        lines.append("# EOF\n")
+        return web.Response(
+            body="".join(lines).encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    def _pdus(self) -> List[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        """Return the PDUs of the loaded entries that have metrics enabled."""
+        pdus = []
+        for entry_id, entry_data in self.hass.data.get(DOMAIN, {}).items():
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            if entry is None or not entry.options.get(CONF_METRICS):
+                continue
+            for host, pdu in entry_data["pdus"].items():
+                pdus.append(((entry_id, host), pdu))
+        return pdus
+
+    def _render_cached(self, cache_id: Tuple[str, str], pdu: Dict[str, Any]) -> Dict[str, str]:
+        """Return the PDU's rendered samples, rendering them only if it changed."""
+        coordinator: APCPDUCoordinator = pdu["coordinator"]
+        stats: SNMPStats = coordinator.session.stats
+        key = (
+            coordinator.snapshot.generation,
+            coordinator.last_update_success,
+            stats.packets,
+            stats.responses,
+            stats.timeouts,
+            stats.errors,
+            stats.retransmits,
+            stats.busy,
+        )
+        cached = self._cache.get(cache_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        chunks = _render_pdu(pdu)
+        self._cache[cache_id] = (key, chunks)
+        return chunks
+
+
+def _render_pdu(pdu: Dict[str, Any]) -> Dict[str, str]:
+    """Render one PDU's samples, grouped by metric family."""
+    coordinator: APCPDUCoordinator = pdu["coordinator"]
+    snapshot = coordinator.snapshot
+    pdu_label = {"pdu": coordinator.host}
+    chunks: Dict[str, List[str]] = {}
+
+    def sample(family: str, labels: Dict[str, Any], value: float, suffix: str = "") -> None:
+        chunks.setdefault(family, []).append(
+            f"{family}{suffix}{{{_labels(labels)}}} {_number(value)}\n"
+        )
+
+    sample("apc_pdu_up", pdu_label, int(coordinator.last_update_success))
+
+    names = (coordinator.data or {}).get("outlet_names") or {
+        int(num): name for num, name in pdu["metadata"]["outlet_names"].items()
+    }
+    for outlet in range(1, coordinator.outlet_count + 1):
+        state = snapshot.outlet(outlet)
+        if state is not None:
+            labels = {**pdu_label, "outlet": outlet, "name": names.get(outlet, f"Outlet {outlet}")}
+            sample("apc_pdu_outlet_state", labels, int(state == OUTLET_ON))
+
+    for key, column in snapshot.readings.items():
+        family, kind, _, index_label = _READING_FAMILIES[key]
+        suffix = "_total" if kind == "counter" else ""
+        for index, value in enumerate(column):
+            if math.isnan(value) or (index == 0 and index_label is not None):
+                continue
+            labels = {**pdu_label, index_label: index} if index_label else pdu_label
+            sample(family, labels, value, suffix)
+
+    stats: SNMPStats = coordinator.session.stats
+    for operation, op_stats in stats.operations.items():
+        labels = {**pdu_label, "operation": operation}
+        sample("apc_pdu_snmp_packets", labels, op_stats.packets, "_total")
+        sample("apc_pdu_snmp_timeouts", labels, op_stats.timeouts, "_total")
+        sample("apc_pdu_snmp_errors", labels, op_stats.errors, "_total")
+        cumulative = 0
+        for bound, count in zip((*map(str, LATENCY_BUCKETS), "+Inf"), op_stats.buckets):
+            cumulative += count
+            sample("apc_pdu_snmp_latency_seconds", {**labels, "le": bound}, cumulative, "_bucket")
+        sample("apc_pdu_snmp_latency_seconds", labels, op_stats.responses, "_count")
+        sample("apc_pdu_snmp_latency_seconds", labels, op_stats.latency_total, "_sum")
+    sample("apc_pdu_snmp_retransmits", pdu_label, stats.retransmits, "_total")
+    sample("apc_pdu_snmp_busy_skips", pdu_label, stats.busy, "_total")
+
+    return {family: "".join(lines) for family, lines in chunks.items()}
@@ -0,0 +1,197 @@
+# File: custom_components/apc_pdu/polling.py
+
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Set
+
+from .const import (
+    SENSOR_UPDATE_INTERVAL,
+    SWITCH_UPDATE_INTERVAL,
+    METADATA_UPDATE_INTERVAL,
+    PROBE_UPDATE_INTERVAL,
+    FAST_POLL_INTERVAL,
+    FAST_POLL_WINDOW,
+    MAX_BACKOFF_INTERVAL,
+    TRAP_RECONCILE_INTERVAL,
+    TRAP_HEALTH_WINDOW,
+    DEFAULT_CURRENT_DEADBAND,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_PERCENT_DEADBAND,
+    DEFAULT_HEARTBEAT,
+)
+
+# Deadband kinds for published values
+DEADBAND_CURRENT = "current"
+DEADBAND_POWER = "power"
+
+# Data classes polled at their own interval
+DATA_CURRENT = "current"  # total current and metering
+DATA_OUTLETS = "outlets"  # outlet states
+DATA_METADATA = "metadata"  # outlet names and device information
+DATA_PROBES = "probes"  # temperature and humidity probes
+
+# Data classes that never trigger a poll of their own; when due they are
+# added to the next request made for current or outlets
+RIDER_DATA_CLASSES = {DATA_PROBES}
+
+
+class PollingPolicy:
+    """Decide what to poll on a PDU and when.
+
+    Each data class has its own interval. After a SET or a detected outlet
+    change, outlets and current are polled every FAST_POLL_INTERVAL seconds
+    for a short window. While the PDU is unreachable the interval backs off
+    exponentially up to MAX_BACKOFF_INTERVAL. While SNMP traps from the PDU
+    are arriving, outlet states are pushed and only polled every
+    TRAP_RECONCILE_INTERVAL seconds to catch anything missed. Probes are
+    only read along with current or outlets, so they never cost a request
+    of their own.
+    """
+
+    def __init__(
+        self,
+        current_interval: float = SENSOR_UPDATE_INTERVAL,
+        outlet_interval: float = SWITCH_UPDATE_INTERVAL,
+        metadata_interval: float = METADATA_UPDATE_INTERVAL,
+        probe_interval: float = PROBE_UPDATE_INTERVAL,
+        fast_interval: float = FAST_POLL_INTERVAL,
+        fast_window: float = FAST_POLL_WINDOW,
+        max_backoff: float = MAX_BACKOFF_INTERVAL,
+        reconcile_interval: float = TRAP_RECONCILE_INTERVAL,
+    ) -> None:
+        self.intervals: Dict[str, float] = {
+            DATA_CURRENT: current_interval,
+            DATA_OUTLETS: outlet_interval,
+            DATA_METADATA: metadata_interval,
+            DATA_PROBES: probe_interval,
+        }
+        self.fast_interval = fast_interval
+        self.fast_window = fast_window
+        self.max_backoff = max_backoff
+        self.reconcile_interval = reconcile_interval
+        self.push_enabled = False
+        self.failures = 0
+        self._last_polled: Dict[str, Optional[float]] = {key: None for key in self.intervals}
+        self._fast_until = 0.0
+        self._last_push: Optional[float] = None
+
+    def _interval(self, data_class: str, now: float) -> float:
+        if data_class in (DATA_CURRENT, DATA_OUTLETS) and now < self._fast_until:
+            return min(self.fast_interval, self.intervals[data_class])
+        if data_class == DATA_OUTLETS and self.push_healthy:
+            return max(self.reconcile_interval, self.intervals[data_class])
+        return self.intervals[data_class]
+
+    def push_received(self, now: Optional[float] = None) -> None:
+        """Record a trap received from the PDU."""
+        self._last_push = time.monotonic() if now is None else now
+
+    @property
+    def push_healthy(self) -> bool:
+        """Return True if traps are enabled and have recently arrived."""
+        return (
+            self.push_enabled
+            and self._last_push is not None
+            and time.monotonic() - self._last_push < TRAP_HEALTH_WINDOW
+        )
+
+    def due(self, now: Optional[float] = None) -> Set[str]:
+        """Return the data classes that should be polled now."""
+        now = time.monotonic() if now is None else now
+        # Half a second of slack so timer jitter does not push a class a whole cycle
+        return {
+            data_class
+            for data_class, last in self._last_polled.items()
+            if last is None or now - last >= self._interval(data_class, now) - 0.5
+        }
+
+    def mark_polled(self, data_classes: Set[str], now: Optional[float] = None) -> None:
+        """Record a successful poll of the given data classes."""
+        now = time.monotonic() if now is None else now
+        for data_class in data_classes:
+            self._last_polled[data_class] = now
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """Record a poll that got no response."""
+        self.failures += 1
+
+    def trigger_fast_poll(self, now: Optional[float] = None) -> None:
+        """Poll outlets and current quickly for the next fast window."""
+        now = time.monotonic() if now is None else now
+        self._fast_until = now + self.fast_window
+
+    @property
+    def fast_polling(self) -> bool:
+        """Return True while inside a fast-poll window."""
+        return time.monotonic() < self._fast_until
+
+    def next_interval(self, now: Optional[float] = None) -> timedelta:
+        """Return the delay until the next poll should run."""
+        now = time.monotonic() if now is None else now
+        if self.failures:
+            base = min(self.intervals[DATA_CURRENT], self.intervals[DATA_OUTLETS])
+            delay = min(base * 2 ** (self.failures - 1), self.max_backoff)
+            return timedelta(seconds=delay)
+        
+        delays = []
+        for data_class, last in self._last_polled.items():
+            if data_class in RIDER_DATA_CLASSES:
+                continue
+            if last is None:
+                return timedelta(seconds=0)
+            delays.append(last + self._interval(data_class, now) - now)
+        return timedelta(seconds=max(min(delays), 1.0))
+
+
+class PublishPolicy:
+    """Decide when a sensor writes a new state.
+
+    A value is written when it moved by more than its deadband: the larger
+    of the absolute band for its unit and a percentage of the last written
+    value. Values without a deadband kind are written on any change. Every
+    heartbeat seconds a sensor writes its state even if nothing moved, so
+    history shows it is alive.
+    """
+
+    def __init__(
+        self,
+        current_deadband: float = DEFAULT_CURRENT_DEADBAND,
+        power_deadband: float = DEFAULT_POWER_DEADBAND,
+        percent_deadband: float = DEFAULT_PERCENT_DEADBAND,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+    ) -> None:
+        self.deadbands: Dict[str, float] = {
+            DEADBAND_CURRENT: current_deadband,
+            DEADBAND_POWER: power_deadband,
+        }
+        self.percent_deadband = percent_deadband
+        self.heartbeat = heartbeat
+
+    def heartbeat_due(self, written_at: Optional[float], now: Optional[float] = None) -> bool:
+        """Return True if a sensor last written at written_at should write again."""
+        if not self.heartbeat or written_at is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - written_at >= self.heartbeat
+
+    def should_publish(
+        self,
+        kind: Optional[str],
+        written: Optional[float],
+        value: Optional[float],
+        written_at: Optional[float],
+        now: Optional[float] = None,
+    ) -> bool:
+        """Return True if value differs enough from the last written one."""
+        if value is None or written is None:
+            return value != written
+        if self.heartbeat_due(written_at, now):
+            return True
+        if value == written:
+            return False
+        band = max(
+            self.deadbands.get(kind, 0.0) if kind else 0.0,
+            abs(written) * self.percent_deadband / 100 if kind else 0.0,
+        )
+        return abs(value - written) > band
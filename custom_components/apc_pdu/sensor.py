@@ -2,30 +2,100 @@
 
 import logging
 from typing import Optional
-from datetime import timedelta
 
 from homeassistant.components.sensor import (
-    SensorEntity,
+    RestoreSensor,
     SensorDeviceClass,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import UnitOfElectricCurrent
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-    UpdateFailed,
+from homeassistant.const import (
+    EntityCategory,
+    PERCENTAGE,
+    UnitOfElectricCurrent,
+    UnitOfEnergy,
+    UnitOfPower,
+    UnitOfTemperature,
+    UnitOfTime,
 )
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, CURRENT_OID
-from .snmp import snmp_get
+from .const import DOMAIN
+from .coordinator import APCPDUCoordinator
+from .entity import APCPDUEntity
+from .polling import DATA_CURRENT, DATA_PROBES, DEADBAND_CURRENT, DEADBAND_POWER
+from .stats import SNMPStats
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=30)
+# Metering sensors: data key -> (label, capability, device class, state class, unit, icon)
+METERING_SENSORS = {
+    "outlet_current": (
+        "Current", "metered_outlets", SensorDeviceClass.CURRENT,
+        SensorStateClass.MEASUREMENT, UnitOfElectricCurrent.AMPERE, "mdi:current-ac",
+    ),
+    "outlet_power": (
+        "Power", "metered_outlets", SensorDeviceClass.POWER,
+        SensorStateClass.MEASUREMENT, UnitOfPower.WATT, "mdi:flash",
+    ),
+    "outlet_energy": (
+        "Energy", "metered_outlets", SensorDeviceClass.ENERGY,
+        SensorStateClass.TOTAL_INCREASING, UnitOfEnergy.KILO_WATT_HOUR, "mdi:lightning-bolt",
+    ),
+    "phase_current": (
+        "Current", "phases", SensorDeviceClass.CURRENT,
+        SensorStateClass.MEASUREMENT, UnitOfElectricCurrent.AMPERE, "mdi:current-ac",
+    ),
+    "bank_current": (
+        "Current", "banks", SensorDeviceClass.CURRENT,
+        SensorStateClass.MEASUREMENT, UnitOfElectricCurrent.AMPERE, "mdi:current-ac",
+    ),
+    "probe_temperature": (
+        "Temperature", "probes", SensorDeviceClass.TEMPERATURE,
+        SensorStateClass.MEASUREMENT, UnitOfTemperature.CELSIUS, "mdi:thermometer",
+    ),
+    "probe_humidity": (
+        "Humidity", "humidity_probes", SensorDeviceClass.HUMIDITY,
+        SensorStateClass.MEASUREMENT, PERCENTAGE, "mdi:water-percent",
+    ),
+}
+
+# SNMP diagnostic sensors: key -> (label, state class, unit, icon, enabled by default, value)
+STATS_SENSORS = {
+    "snmp_latency_p50": (
+        "SNMP Latency p50", SensorStateClass.MEASUREMENT, UnitOfTime.MILLISECONDS,
+        "mdi:timer-outline", False, lambda stats: stats.latency_ms(50),
+    ),
+    "snmp_latency_p95": (
+        "SNMP Latency p95", SensorStateClass.MEASUREMENT, UnitOfTime.MILLISECONDS,
+        "mdi:timer-outline", True, lambda stats: stats.latency_ms(95),
+    ),
+    "snmp_packets": (
+        "SNMP Packets", SensorStateClass.TOTAL_INCREASING, None,
+        "mdi:swap-horizontal", False, lambda stats: stats.packets,
+    ),
+    "snmp_timeouts": (
+        "SNMP Timeouts", SensorStateClass.TOTAL_INCREASING, None,
+        "mdi:timer-alert-outline", True, lambda stats: stats.timeouts,
+    ),
+    "snmp_errors": (
+        "SNMP Errors", SensorStateClass.TOTAL_INCREASING, None,
+        "mdi:alert-circle-outline", True, lambda stats: stats.errors,
+    ),
+    "snmp_varbinds_per_packet": (
+        "SNMP Varbinds per Packet", SensorStateClass.MEASUREMENT, None,
+        "mdi:package-variant", False, lambda stats: (
+            None if stats.varbinds_per_packet is None else round(stats.varbinds_per_packet, 1)
+        ),
+    ),
+}
+
+# Deadband applied to each metering device class, energy is written on any change
+_DEADBANDS = {
+    SensorDeviceClass.CURRENT: DEADBAND_CURRENT,
+    SensorDeviceClass.POWER: DEADBAND_POWER,
+}
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -33,122 +103,278 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up APC PDU sensors from a config entry."""
-    host = config_entry.data["host"]
-    community = config_entry.data["community"]
-    device_info = config_entry.data.get("device_info", {})
+    sensors = []
+    for host, pdu in hass.data[DOMAIN][config_entry.entry_id]["pdus"].items():
+        sensors.extend(_pdu_sensors(host, pdu))
+    async_add_entities(sensors)
+
+
+def _pdu_sensors(host: str, pdu: dict) -> list:
+    """Create the sensors of one PDU."""
+    coordinator = pdu["coordinator"]
+    device_info = pdu["metadata"]["device_info"]
     
     _LOGGER.info("Setting up APC PDU current sensor for %s", host)
     
-    # Create coordinator for data updates
-    coordinator = APCPDUCoordinator(hass, host, community)
+    # Create total current sensor entity
+    sensors = [APCPDUCurrentSensor(coordinator, device_info)]
     
-    # Fetch initial data
-    await coordinator.async_config_entry_first_refresh()
+    # Add metering sensors only for the tables detected at setup
+    capabilities = pdu["capabilities"]
+    outlet_names = pdu["metadata"]["outlet_names"]
+    probe_names = capabilities.get("probe_names", {})
+    for key, (label, capability, *_) in METERING_SENSORS.items():
+        for index in capabilities.get(capability, []):
+            if capability == "metered_outlets":
+                name = f"APC {outlet_names.get(str(index), f'Outlet {index}')} {label}"
+            elif capability in ("probes", "humidity_probes"):
+                name = f"APC {probe_names.get(str(index)) or f'Probe {index}'} {label}"
+            elif capability == "phases":
+                name = f"APC PDU Phase {index} {label}"
+            else:
+                name = f"APC PDU Bank {index} {label}"
+            sensors.append(APCPDUMeteringSensor(coordinator, device_info, key, index, name))
     
-    # Create single current sensor entity
-    sensors = [APCPDUCurrentSensor(coordinator, device_info)]
+    # Energy integrated from the total current, for PDUs without kWh counters
+    if coordinator.energy is not None:
+        sensors.append(APCPDUEnergySensor(coordinator, device_info))
     
-    async_add_entities(sensors)
+    # SNMP statistics, to find slow PDUs and tune poll intervals
+    for key in STATS_SENSORS:
+        sensors.append(APCPDUStatsSensor(coordinator, device_info, key))
+    
+    return sensors
+
 
+class APCPDUSensor(APCPDUEntity, RestoreSensor):
+    """Base class for APC PDU sensors.
 
-class APCPDUCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching APC PDU data from SNMP."""
+    The unique ID is the PDU host and the sensor key, plus the row for
+    per-row sensors. On each update the state is written only if the
+    publish policy says the value moved beyond the sensor's deadband, or a
+    heartbeat is due.
+    """
     
-    def __init__(self, hass: HomeAssistant, host: str, community: str):
-        """Initialize the coordinator."""
-        super().__init__(
-            hass,
-            _LOGGER,
-            name=DOMAIN,
-            update_interval=SCAN_INTERVAL,
+    _deadband: Optional[str] = None
+    
+    def __init__(
+        self,
+        coordinator: APCPDUCoordinator,
+        device_info: dict,
+        key: str,
+        icon: str,
+        index: Optional[int] = None,
+    ):
+        """Initialize the sensor."""
+        super().__init__(coordinator, device_info)
+        self._key = key
+        self._index = index
+        self._icon = icon
+        if index is None:
+            self._attr_unique_id = f"{coordinator.host}_{key}"
+        else:
+            self._attr_unique_id = f"{coordinator.host}_{key}_{index}"
+        self._written_value = None
+    
+    def _should_write(self) -> bool:
+        return self.coordinator.publish.should_publish(
+            self._deadband, self._written_value, self.native_value, self._written_at
         )
-        self.host = host
-        self.community = community
-        
-    async def _async_update_data(self):
-        """Fetch data from APC PDU."""
-        try:
-            data = {}
-            
-            # Fetch total current reading from PDU
-            current_value = await self.hass.async_add_executor_job(
-                snmp_get, self.host, self.community, CURRENT_OID
+    
+    @callback
+    def _write_state(self, available: bool) -> None:
+        self._written_value = self.native_value
+        super()._write_state(available)
+    
+    @property
+    def icon(self) -> str:
+        """Return the icon for the sensor."""
+        return self._icon
+
+
+class APCPDUReadingSensor(APCPDUSensor):
+    """Base class for sensors showing a reading of the coordinator snapshot.
+
+    The state only changes when the sensor's slot in the snapshot does,
+    and until the first poll arrives that slot is seeded with the state
+    from before the restart.
+    """
+    
+    def __init__(
+        self,
+        coordinator: APCPDUCoordinator,
+        device_info: dict,
+        key: str,
+        icon: str,
+        deadband: Optional[str],
+        index: Optional[int] = None,
+    ):
+        """Initialize the sensor."""
+        super().__init__(coordinator, device_info, key, icon, index)
+        self._deadband = deadband
+        # PDU-wide readings are kept in row 0 of the snapshot
+        self._row = index if index is not None else 0
+    
+    @property
+    def force_update(self) -> bool:
+        """Writes are already filtered, so a heartbeat must reach the recorder."""
+        return bool(self.coordinator.publish.heartbeat)
+    
+    def _changed_since(self, generation: int) -> bool:
+        return self.coordinator.snapshot.reading_changed_since(self._key, self._row, generation)
+    
+    def _should_write(self) -> bool:
+        if not self._changed_since(self._written_generation):
+            return self.coordinator.publish.heartbeat_due(self._written_at)
+        return super()._should_write()
+    
+    async def _async_restore(self) -> None:
+        last = await self.async_get_last_sensor_data()
+        if last is not None and isinstance(last.native_value, (int, float)):
+            self.coordinator.snapshot.restore_reading(
+                self._key, self._row, float(last.native_value)
             )
-            
-            if current_value is not None:
-                # Convert from deciamps to amps (typical APC PDU format)
-                data["total_current"] = current_value / 10.0
-                _LOGGER.debug("PDU total current: %.1f A", data["total_current"])
-            else:
-                _LOGGER.warning("Failed to read total current from PDU")
-                data["total_current"] = None
-                    
-            return data
-            
-        except Exception as err:
-            _LOGGER.exception("Error communicating with APC PDU at %s", self.host)
-            raise UpdateFailed(f"Error communicating with APC PDU: {err}")
+    
+    @property
+    def native_value(self) -> Optional[float]:
+        """Return the current value."""
+        return self.coordinator.snapshot.reading(self._key, self._row)
+    
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.last_update_success and self.native_value is not None
 
 
-class APCPDUCurrentSensor(CoordinatorEntity, SensorEntity):
+class APCPDUCurrentSensor(APCPDUReadingSensor):
     """Representation of an APC PDU total current sensor."""
     
     def __init__(self, coordinator: APCPDUCoordinator, device_info: dict):
         """Initialize the sensor."""
-        super().__init__(coordinator)
-        self._device_info = device_info
+        super().__init__(
+            coordinator, device_info, "total_current", "mdi:current-ac", DEADBAND_CURRENT
+        )
         self._attr_name = f"APC PDU Total Current"
-        self._attr_unique_id = f"{coordinator.host}_total_current"
         self._attr_device_class = SensorDeviceClass.CURRENT
         self._attr_state_class = SensorStateClass.MEASUREMENT
         self._attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
         self._attr_suggested_display_precision = 1
     
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device info to group with switches."""
-        # Use discovered device info with fallbacks
-        device_name = self._device_info.get("name", f"APC PDU ({self.coordinator.host})")
-        device_model = self._device_info.get("model", "Smart PDU")
-        device_serial = self._device_info.get("serial_number")
-        
-        device_info_dict = {
-            "identifiers": {(DOMAIN, self.coordinator.host)},
-            "name": device_name,
-            "manufacturer": "APC",
-            "model": device_model,
-            "configuration_url": f"http://{self.coordinator.host}",
+    def _update_attributes(self) -> None:
+        self._attr_extra_state_attributes = {
+            "pdu_host": self.coordinator.host,
+            "measurement_type": "total_current",
+            "update_interval": self.coordinator.policy.intervals[DATA_CURRENT],
         }
-        
-        # Add serial number if available
-        if device_serial:
-            device_info_dict["serial_number"] = device_serial
-        
-        return DeviceInfo(**device_info_dict)
+
+
+class APCPDUMeteringSensor(APCPDUReadingSensor):
+    """Representation of a per-outlet, per-phase, per-bank or probe sensor."""
     
-    @property
-    def extra_state_attributes(self):
-        """Return extra state attributes."""
-        return {
+    def __init__(
+        self,
+        coordinator: APCPDUCoordinator,
+        device_info: dict,
+        key: str,
+        index: int,
+        name: str,
+    ):
+        """Initialize the sensor."""
+        _, _, device_class, state_class, unit, icon = METERING_SENSORS[key]
+        super().__init__(
+            coordinator, device_info, key, icon, _DEADBANDS.get(device_class), index
+        )
+        self._attr_name = name
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_native_unit_of_measurement = unit
+        self._attr_suggested_display_precision = 0 if key in ("outlet_power", "probe_humidity") else 1
+        # Probes are read on their own, slower interval
+        self._data_class = DATA_PROBES if key.startswith("probe_") else DATA_CURRENT
+    
+    def _update_attributes(self) -> None:
+        self._attr_extra_state_attributes = {
             "pdu_host": self.coordinator.host,
-            "measurement_type": "total_current",
-            "update_interval": SCAN_INTERVAL.total_seconds(),
+            "measurement_type": self._key,
+            "index": self._index,
+            "update_interval": self.coordinator.policy.intervals[self._data_class],
         }
+
+
+class APCPDUEnergySensor(APCPDUReadingSensor):
+    """Energy used by the PDU, integrated from its total current.
+
+    The coordinator feeds each current reading into the PDU's energy
+    accumulator. The running total is restored after a restart and the
+    accumulator continues from it.
+    """
     
-    @property
-    def native_value(self) -> Optional[float]:
-        """Return the current value."""
-        return self.coordinator.data.get("total_current")
+    def __init__(self, coordinator: APCPDUCoordinator, device_info: dict):
+        """Initialize the sensor."""
+        super().__init__(coordinator, device_info, "total_energy", "mdi:lightning-bolt", None)
+        self._attr_name = "APC PDU Energy"
+        self._attr_device_class = SensorDeviceClass.ENERGY
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+        self._attr_suggested_display_precision = 3
+    
+    async def _async_restore(self) -> None:
+        last = await self.async_get_last_sensor_data()
+        if last is not None and isinstance(last.native_value, (int, float)):
+            energy = self.coordinator.energy
+            energy.restore(float(last.native_value))
+            self.coordinator.snapshot.restore_reading(self._key, self._row, energy.total_kwh)
+    
+    def _update_attributes(self) -> None:
+        energy = self.coordinator.energy
+        average_power = energy.average_power()
+        self._attr_extra_state_attributes = {
+            "pdu_host": self.coordinator.host,
+            "measurement_type": "total_energy",
+            "method": energy.method,
+            "voltage": self.coordinator.voltage,
+            "power_factor": self.coordinator.power_factor,
+            "average_power": round(average_power, 1) if average_power is not None else None,
+            "gaps": energy.gaps,
+            "missed_seconds": round(energy.missed_seconds),
+        }
+
+
+class APCPDUStatsSensor(APCPDUSensor):
+    """Diagnostic sensor reporting the PDU's SNMP session statistics.
+
+    Statistics move with every request rather than with the snapshot, and
+    count from the start of the session, so nothing is restored.
+    """
+    
+    def __init__(self, coordinator: APCPDUCoordinator, device_info: dict, key: str):
+        """Initialize the sensor."""
+        label, state_class, unit, icon, enabled, _ = STATS_SENSORS[key]
+        super().__init__(coordinator, device_info, key, icon)
+        self._attr_name = f"APC PDU {label}"
+        self._attr_device_class = SensorDeviceClass.DURATION if unit else None
+        self._attr_state_class = state_class
+        self._attr_native_unit_of_measurement = unit
+        self._attr_suggested_display_precision = 1 if unit else None
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = enabled
+    
+    def _update_attributes(self) -> None:
+        stats: SNMPStats = self.coordinator.session.stats
+        self._attr_extra_state_attributes = {
+            "pdu_host": self.coordinator.host,
+            "measurement_type": self._key,
+            "retransmits": stats.retransmits,
+            "busy_skips": stats.busy,
+            "last_error": stats.last_error,
+        }
     
     @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        return (
-            self.coordinator.last_update_success
-            and self.coordinator.data.get("total_current") is not None
-        )
+    def native_value(self):
+        """Return the statistic."""
+        return STATS_SENSORS[self._key][5](self.coordinator.session.stats)
     
     @property
-    def icon(self) -> str:
-        """Return the icon for the sensor."""
-        return "mdi:current-ac"
\ No newline at end of file
+    def available(self) -> bool:
+        """Statistics stay available while the PDU is unreachable."""
+        return True
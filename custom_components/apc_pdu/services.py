@@ -0,0 +1,137 @@
+# File: custom_components/apc_pdu/services.py
+
+import asyncio
+import logging
+from collections import defaultdict
+
+import voluptuous as vol
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+
+from .commands import async_run_power_up, plan_power_up
+from .const import (
+    DOMAIN,
+    OUTLET_ON,
+    OUTLET_OFF,
+    OUTLET_REBOOT,
+    OUTLET_ON_DELAYED,
+    OUTLET_OFF_DELAYED,
+    OUTLET_REBOOT_DELAYED,
+    POWER_UP_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_OUTLETS = "set_outlets"
+SERVICE_OUTLET_COMMAND = "outlet_command"
+SERVICE_POWER_UP_SEQUENCE = "power_up_sequence"
+
+ATTR_STATE = "state"
+ATTR_COMMAND = "command"
+ATTR_DELAY = "delay"
+ATTR_PDU_DELAY = "pdu_delay"
+
+DATA_POWER_UP = f"{DOMAIN}_power_up"
+
+# Service command -> sPDUOutletCtl value
+COMMANDS = {
+    "on": OUTLET_ON,
+    "off": OUTLET_OFF,
+    "reboot": OUTLET_REBOOT,
+    "delayed_on": OUTLET_ON_DELAYED,
+    "delayed_off": OUTLET_OFF_DELAYED,
+    "delayed_reboot": OUTLET_REBOOT_DELAYED,
+}
+
+SET_OUTLETS_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_STATE): vol.In(["on", "off"]),
+})
+
+OUTLET_COMMAND_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_COMMAND): vol.In(list(COMMANDS)),
+})
+
+POWER_UP_SEQUENCE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Optional(ATTR_DELAY, default=POWER_UP_DELAY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(ATTR_PDU_DELAY, default=0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+
+def _resolve_outlets(hass: HomeAssistant, entity_ids):
+    """Group outlet switch entities by the coordinator of their PDU."""
+    registry = er.async_get(hass)
+    domain_data = hass.data.get(DOMAIN, {})
+    grouped = defaultdict(list)
+    
+    for entity_id in entity_ids:
+        entry = registry.async_get(entity_id)
+        if entry is None or entry.platform != DOMAIN or entry.domain != "switch":
+            raise HomeAssistantError(f"{entity_id} is not an APC PDU outlet")
+        entry_data = domain_data.get(entry.config_entry_id)
+        if entry_data is None:
+            raise HomeAssistantError(f"PDU for {entity_id} is not loaded")
+        host, outlet = entry.unique_id.rsplit("_", 1)
+        grouped[entry_data["pdus"][host]["coordinator"]].append(int(outlet))
+    
+    return grouped
+
+
+async def _async_send(hass: HomeAssistant, entity_ids, command: int) -> None:
+    """Send one outlet command to a group of outlets with one SET per PDU."""
+    grouped = _resolve_outlets(hass, entity_ids)
+    
+    coordinators = list(grouped)
+    results = await asyncio.gather(*(
+        coordinator.async_set_outlets({outlet: command for outlet in grouped[coordinator]})
+        for coordinator in coordinators
+    ))
+    failed = [c.host for c, ok in zip(coordinators, results) if not ok]
+    
+    if failed:
+        raise HomeAssistantError(f"Failed to switch outlets on PDU {', '.join(failed)}")
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the APC PDU services."""
+    
+    async def async_set_outlets(call: ServiceCall) -> None:
+        """Switch a group of outlets with one SET per PDU."""
+        state = OUTLET_ON if call.data[ATTR_STATE] == "on" else OUTLET_OFF
+        await _async_send(hass, call.data[ATTR_ENTITY_ID], state)
+    
+    async def async_outlet_command(call: ServiceCall) -> None:
+        """Reboot or switch outlets, immediately or after their delays."""
+        await _async_send(hass, call.data[ATTR_ENTITY_ID], COMMANDS[call.data[ATTR_COMMAND]])
+    
+    async def async_power_up_sequence(call: ServiceCall) -> None:
+        """Switch outlets on one after another, across any number of PDUs."""
+        grouped = _resolve_outlets(hass, call.data[ATTR_ENTITY_ID])
+        plan = plan_power_up(
+            list(grouped.items()), call.data[ATTR_DELAY], call.data[ATTR_PDU_DELAY]
+        )
+        
+        # A new sequence replaces one still running
+        previous = hass.data.get(DATA_POWER_UP)
+        if previous is not None and not previous.done():
+            _LOGGER.info("Cancelling the running power-up sequence")
+            previous.cancel()
+        hass.data[DATA_POWER_UP] = hass.async_create_background_task(
+            async_run_power_up(plan), f"{DOMAIN}_power_up"
+        )
+    
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_OUTLETS, async_set_outlets, schema=SET_OUTLETS_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_OUTLET_COMMAND, async_outlet_command, schema=OUTLET_COMMAND_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_POWER_UP_SEQUENCE, async_power_up_sequence,
+        schema=POWER_UP_SEQUENCE_SCHEMA,
+    )
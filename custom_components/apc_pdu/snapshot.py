@@ -0,0 +1,105 @@
+# File: custom_components/apc_pdu/snapshot.py
+
+import math
+from array import array
+from typing import Dict, Iterable, Optional
+
+# Outlet state slot value for an outlet the PDU did not report
+_UNKNOWN = 0
+
+
+class PDUSnapshot:
+    """Latest outlet states and readings of one PDU in compact arrays.
+
+    Outlet states and each metering column are arrays indexed by outlet,
+    phase or bank number (index 0 unused); the total current has a single
+    slot at index 0. Every update bumps the generation, and each slot
+    remembers the generation its value last changed in, so an entity can
+    tell in constant time whether it has anything new to write.
+    """
+
+    __slots__ = (
+        "generation",
+        "outlets",
+        "readings",
+        "_outlet_changed",
+        "_reading_changed",
+    )
+
+    def __init__(self, outlet_count: int, reading_rows: Dict[str, int]) -> None:
+        """Size the arrays; reading_rows maps each reading to its highest index."""
+        self.generation = 0
+        self.outlets = array("b", [_UNKNOWN] * (outlet_count + 1))
+        self._outlet_changed = array("L", [0] * (outlet_count + 1))
+        self.readings: Dict[str, array] = {}
+        self._reading_changed: Dict[str, array] = {}
+        for key, rows in {"total_current": 0, **reading_rows}.items():
+            self.readings[key] = array("d", [math.nan] * (rows + 1))
+            self._reading_changed[key] = array("L", [0] * (rows + 1))
+
+    def outlet(self, outlet: int) -> Optional[int]:
+        """Return the reported state of an outlet."""
+        if 0 < outlet < len(self.outlets) and self.outlets[outlet] != _UNKNOWN:
+            return self.outlets[outlet]
+        return None
+
+    def reading(self, key: str, index: int = 0) -> Optional[float]:
+        """Return a reading, or None if the PDU did not report it."""
+        column = self.readings.get(key)
+        if column is None or index >= len(column) or math.isnan(column[index]):
+            return None
+        return column[index]
+
+    def outlet_changed_since(self, outlet: int, generation: int) -> bool:
+        return 0 < outlet < len(self.outlets) and self._outlet_changed[outlet] > generation
+
+    def reading_changed_since(self, key: str, index: int, generation: int) -> bool:
+        changed = self._reading_changed.get(key)
+        return changed is not None and index < len(changed) and changed[index] > generation
+
+    def restore_outlet(self, outlet: int, state: int) -> None:
+        """Seed an outlet the PDU has not reported yet with its last known state."""
+        if 0 < outlet < len(self.outlets) and self.outlets[outlet] == _UNKNOWN:
+            self.outlets[outlet] = state
+
+    def restore_reading(self, key: str, index: int, value: float) -> None:
+        """Seed a reading the PDU has not reported yet with its last known value."""
+        column = self.readings.get(key)
+        if column is not None and index < len(column) and math.isnan(column[index]):
+            column[index] = value
+
+    def update(self, data: dict) -> None:
+        """Apply a coordinator data dict as the next generation."""
+        self.generation += 1
+        generation = self.generation
+
+        outlets = data.get("outlets") or {}
+        slots, changed = self.outlets, self._outlet_changed
+        for outlet in range(1, len(slots)):
+            state = outlets.get(outlet, _UNKNOWN)
+            if slots[outlet] != state:
+                slots[outlet] = state
+                changed[outlet] = generation
+
+        for key, column in self.readings.items():
+            values = data.get(key)
+            if key == "total_current":
+                values = {0: values} if values is not None else {}
+            elif values is None:
+                continue
+            changed = self._reading_changed[key]
+            for index in range(len(column)):
+                value = values.get(index)
+                value = math.nan if value is None else float(value)
+                current = column[index]
+                # NaN never equals itself, so compare missing values explicitly
+                if value != current and not (math.isnan(value) and math.isnan(current)):
+                    column[index] = value
+                    changed[index] = generation
+
+    def touch_outlets(self, outlets: Iterable[int]) -> None:
+        """Mark outlets as changed without new data, e.g. for optimistic state."""
+        self.generation += 1
+        for outlet in outlets:
+            if 0 < outlet < len(self.outlets):
+                self._outlet_changed[outlet] = self.generation
@@ -1,13 +1,184 @@
 # File: custom_components/apc_pdu/snmp.py
 
+import asyncio
+import heapq
+import itertools
 import logging
-from typing import Optional, Dict, List, Tuple
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional, Dict, List, Set, Tuple, TypedDict, Union
 
-from puresnmp import Client, V2C, PyWrapper
-from puresnmp.types import Integer 
+import puresnmp.plugins.priv as priv_plugins
+import puresnmp_plugins.security.usm as usm
+from puresnmp import Auth, Client, Priv, V2C, V3, PyWrapper
+from puresnmp.adt import EncryptedMessage, PlainMessage, ScopedPDU
+from puresnmp.credentials import Credentials
+from puresnmp.exc import ErrorResponse, NoSuchOID, SnmpError, Timeout, TooBig
+from puresnmp.pdu import BulkGetRequest, EndOfMibView, Report
+from puresnmp.plugins.security import create as create_security_model
+from puresnmp.types import Integer
+from x690.types import ObjectIdentifier, OctetString
+from puresnmp.util import get_request_id, localise_key
+
+from .const import (
+    DEFAULT_PORT,
+    DEFAULT_COMMUNITY,
+    DEFAULT_MAX_REPETITIONS,
+    SNMP_MAX_MESSAGE_SIZE,
+    SNMP_TIMEOUT,
+    SNMP_RETRIES,
+    SNMP_MAX_IN_FLIGHT,
+    SNMP_MAX_QUEUED,
+    SNMP_V3_KEY_CACHE,
+    CONF_SNMP_VERSION,
+    CONF_USERNAME,
+    CONF_AUTH_PROTOCOL,
+    CONF_AUTH_KEY,
+    CONF_PRIV_PROTOCOL,
+    CONF_PRIV_KEY,
+    SNMP_VERSION_3,
+    OUTLET_INDEX_OID,
+    OUTLET_NAME_OID,
+    DEVICE_NAME_OID,
+    DEVICE_MODEL_OID,
+    DEVICE_SERIAL_OID,
+    SYS_UPTIME_OID,
+    OUTLET_METERED_CURRENT_OID,
+    PHASE_CURRENT_OID,
+    BANK_CURRENT_OID,
+    PROBE_NAME_OID,
+    PROBE_TEMPERATURE_OID,
+    PROBE_HUMIDITY_OID,
+)
+from .stats import SNMPStats, OP_GET, OP_WALK, OP_BULK, OP_BULKWALK, OP_SET, OP_DISCOVER
 
 _LOGGER = logging.getLogger(__name__)
 
+# Request priorities, lower is served first
+PRIORITY_CONTROL = 0  # SETs and the reads confirming them
+PRIORITY_POLL = 1  # routine polling
+
+_priority: ContextVar[int] = ContextVar("apc_pdu_snmp_priority", default=PRIORITY_POLL)
+_operation: ContextVar[str] = ContextVar("apc_pdu_snmp_operation", default=OP_GET)
+
+@contextmanager
+def control_priority():
+    """Run the SNMP requests made inside this block ahead of routine polling."""
+    token = _priority.set(PRIORITY_CONTROL)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+@contextmanager
+def _operation_scope(name: str):
+    """Attribute the packets sent inside this block to an operation."""
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+def current_priority() -> int:
+    """Return the priority SNMP requests made now would be queued with."""
+    return _priority.get()
+
+class PDUBusyError(Exception):
+    """Raised when a PDU already has too many poll requests queued."""
+
+def snmp_credentials(config: Dict[str, Any]) -> Credentials:
+    """Build the puresnmp credentials of a config entry's data."""
+    if config.get(CONF_SNMP_VERSION) != SNMP_VERSION_3:
+        return V2C(config.get("community", DEFAULT_COMMUNITY))
+    auth = priv = None
+    if config.get(CONF_AUTH_KEY):
+        auth = Auth(config[CONF_AUTH_KEY].encode(), config.get(CONF_AUTH_PROTOCOL, "sha1"))
+        # USM has no privacy without authentication
+        if config.get(CONF_PRIV_KEY) and config.get(CONF_PRIV_PROTOCOL, "none") != "none":
+            priv = Priv(config[CONF_PRIV_KEY].encode(), config[CONF_PRIV_PROTOCOL])
+    return V3(config[CONF_USERNAME], auth, priv)
+
+@lru_cache(maxsize=SNMP_V3_KEY_CACHE)
+def _localised_key(auth: Auth, priv: Priv, engine_id: bytes) -> bytes:
+    return localise_key(V3("", auth, priv), engine_id)
+
+
+class _CachingUserSecurityModel(usm.UserSecurityModel):
+    """The USM with the privacy key derived once per credentials and engine.
+
+    puresnmp localizes the privacy passphrase (1 MB of hashing) for every
+    message it encrypts or decrypts, although the key only depends on the
+    credentials and the engine ID. Only the clients of this integration use
+    this model; messages without privacy go through puresnmp unchanged.
+    Authentication keys are already cached by the auth plugins.
+    """
+
+    def generate_request_message(
+        self, message: PlainMessage, security_engine_id: bytes, credentials: Credentials
+    ) -> Union[PlainMessage, EncryptedMessage]:
+        if not isinstance(credentials, V3) or credentials.priv is None:
+            return super().generate_request_message(message, security_engine_id, credentials)
+        engine_config = self.local_config[security_engine_id]
+        engine_boots = engine_config["authoritative_engine_boots"]
+        engine_time = engine_config["authoritative_engine_time"]
+        key = _localised_key(credentials.auth, credentials.priv, security_engine_id)
+        try:
+            encrypted, salt = priv_plugins.create(credentials.priv.method).encrypt_data(
+                key, security_engine_id, engine_boots, engine_time, bytes(message.scoped_pdu)
+            )
+        except Exception as exc:
+            raise usm.EncryptionError(f"Unable to encrypt message ({exc})") from exc
+        security_parameters = usm.USMSecurityParameters(
+            security_engine_id,
+            engine_boots,
+            engine_time,
+            credentials.username.encode("ascii"),
+            b"",
+            salt,
+        )
+        encrypted_message = replace(
+            message,
+            scoped_pdu=OctetString(encrypted),
+            security_parameters=bytes(security_parameters),
+        )
+        return usm.apply_authentication(encrypted_message, credentials, security_engine_id)
+
+    def process_incoming_message(
+        self, message: Union[PlainMessage, EncryptedMessage], credentials: Credentials
+    ) -> PlainMessage:
+        if (
+            not isinstance(credentials, V3)
+            or credentials.priv is None
+            or isinstance(message, PlainMessage)
+        ):
+            return super().process_incoming_message(message, credentials)
+        security_parameters = usm.USMSecurityParameters.decode(message.security_parameters)
+        if security_parameters.user_name != credentials.username.encode("ascii"):
+            raise usm.UnknownUser(f"Unknown user {security_parameters.user_name!r}")
+        usm.verify_authentication(message, credentials, security_parameters)
+        if not isinstance(message.scoped_pdu, OctetString):
+            raise SnmpError("Received an unencrypted PDU in an encrypted message")
+        engine_id = security_parameters.authoritative_engine_id
+        key = _localised_key(credentials.auth, credentials.priv, engine_id)
+        try:
+            decrypted = priv_plugins.create(credentials.priv.method).decrypt_data(
+                key,
+                engine_id,
+                security_parameters.authoritative_engine_boots,
+                security_parameters.authoritative_engine_time,
+                security_parameters.priv_params,
+                message.scoped_pdu.value,
+            )
+            plain = replace(message, scoped_pdu=ScopedPDU.decode(decrypted))
+        except Exception as exc:
+            raise usm.DecryptionError(f"Unable to decrypt message ({exc})") from exc
+        usm.validate_usm_message(plain)
+        return plain
+
 def _clean_snmp_string(value) -> str:
     """Clean SNMP string values that may be bytes or byte string representations."""
     if value is None:
@@ -29,82 +200,659 @@ def _clean_snmp_string(value) -> str:
     # Regular string, just strip quotes
     return str_value.strip('"')
 
-def snmp_get(ip: str, community: str, oid: str) -> Optional[int]:
-    """Synchronous SNMP GET operation for executor."""
-    try:
-        client = PyWrapper(Client(ip, V2C(community)))
-        # This is now sync and will be run in executor
-        import asyncio
-        value = asyncio.run(client.get(oid))
-        return int(value)
-    except Exception as e:
-        _LOGGER.exception("SNMP GET failed on %s (%s): %s", ip, oid, e)
-        return None
+class PDUDeviceInfo(TypedDict, total=False):
+    """Device information read from the PDU."""
 
-def snmp_get_string(ip: str, community: str, oid: str) -> Optional[str]:
-    """Synchronous SNMP GET operation for string values."""
+    name: str
+    model: str
+    serial_number: str
+
+# Rough encoded sizes used to pack GET requests; values are assumed to be
+# at most a short display string.
+_MESSAGE_OVERHEAD = 64
+_VARBIND_OVERHEAD = 6
+_VALUE_SIZE_ESTIMATE = 64
+
+def _pack_oids(oids: List[str], max_message_size: int) -> List[List[str]]:
+    """Split OIDs into groups whose responses should fit in one message."""
+    budget = max_message_size - _MESSAGE_OVERHEAD
+    groups = []
+    group = []
+    size = 0
+    for oid in oids:
+        cost = _VARBIND_OVERHEAD + len(oid.split(".")) + _VALUE_SIZE_ESTIMATE
+        if group and size + cost > budget:
+            groups.append(group)
+            group = []
+            size = 0
+        group.append(oid)
+        size += cost
+    if group:
+        groups.append(group)
+    return groups
+
+def oid_index(oid: str, base_oid: str) -> Optional[int]:
+    """Return the integer row index of an OID directly below base_oid."""
+    prefix = base_oid.strip(".") + "."
+    oid = str(oid).lstrip(".")
+    if not oid.startswith(prefix):
+        return None
     try:
-        client = PyWrapper(Client(ip, V2C(community)))
-        import asyncio
-        value = asyncio.run(client.get(oid))
-        return str(value)
-    except Exception as e:
-        _LOGGER.exception("SNMP GET string failed on %s (%s): %s", ip, oid, e)
+        return int(oid[len(prefix):])
+    except ValueError:
         return None
 
-def snmp_walk(ip: str, community: str, base_oid: str) -> Dict[str, any]:
-    """Synchronous SNMP WALK operation for executor."""
-    try:
-        client = PyWrapper(Client(ip, V2C(community)))
-        import asyncio
-        results = {}
+class _SNMPDatagramProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol that hands the next response to the waiting request."""
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if self.future is not None and not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(exc)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.transport = None
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(exc or ConnectionError("SNMP socket closed"))
+
+
+class _EngineState:
+    """The USM engine of a PDU, discovered once per session.
+
+    Stands in for puresnmp's DiscoData on the client's message processor.
+    puresnmp keeps sending the engine time seen at discovery, which agents
+    reject once it is more than 150 seconds off, so the time here advances
+    with the local clock.
+    """
+
+    __slots__ = (
+        "authoritative_engine_id",
+        "authoritative_engine_boots",
+        "unknown_engine_ids",
+        "_engine_time",
+        "_discovered_at",
+    )
+
+    def __init__(self, disco) -> None:
+        self.authoritative_engine_id: bytes = disco.authoritative_engine_id
+        self.authoritative_engine_boots: int = disco.authoritative_engine_boots
+        self.unknown_engine_ids: int = disco.unknown_engine_ids
+        self._engine_time: int = disco.authoritative_engine_time
+        self._discovered_at = time.monotonic()
+
+    @property
+    def authoritative_engine_time(self) -> int:
+        return self._engine_time + int(time.monotonic() - self._discovered_at)
+
+
+class _RequestScheduler:
+    """Limit the requests in flight to one PDU, serving control traffic first.
+
+    Requests beyond max_in_flight wait in a priority queue. Poll requests are
+    refused with PDUBusyError once max_queued are already waiting, so a slow
+    PDU sheds polls instead of building an unbounded backlog.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self, priority: int) -> None:
+        """Wait for a request slot."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if priority != PRIORITY_CONTROL and len(self._waiters) >= self.max_queued:
+            raise PDUBusyError(f"{len(self._waiters)} SNMP requests already queued")
         
-        # Perform SNMP walk
-        async def _walk():
-            async for oid, value in client.walk(base_oid):
-                results[str(oid)] = value
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before we were cancelled
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            raise
+
+    def resize(self, max_in_flight: int) -> None:
+        """Change the limit, starting waiting requests if it was raised."""
+        self.max_in_flight = max_in_flight
+        while self._waiters and self.in_flight < self.max_in_flight:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter, or free it."""
+        if self.in_flight > self.max_in_flight:
+            # The limit was lowered, retire this slot
+            self.in_flight -= 1
+            return
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class APCPDUSession:
+    """Persistent SNMP session for a single PDU.
+
+    One session is created per (host, credentials) when the config entry is
+    set up. It owns a single puresnmp client and a small pool of connected UDP
+    sockets which are reused for every request, and all operations run
+    directly on the event loop. A per-PDU scheduler caps the requests in
+    flight, and identical reads that are already pending share one request.
+    Every exchange is recorded in the session's SNMPStats.
+
+    With SNMPv3 credentials the engine ID, boots and time are discovered
+    once when the client is created and kept for the life of the session,
+    so authenticated requests take as many round trips as v2c. A report
+    from the agent, e.g. after it rebooted, drops them and the next request
+    discovers the engine again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        community: str,
+        port: int = DEFAULT_PORT,
+        timeout: int = SNMP_TIMEOUT,
+        retries: int = SNMP_RETRIES,
+        max_message_size: int = SNMP_MAX_MESSAGE_SIZE,
+        max_in_flight: int = SNMP_MAX_IN_FLIGHT,
+        max_queued: int = SNMP_MAX_QUEUED,
+        credentials: Optional[Credentials] = None,
+    ) -> None:
+        self.host = host
+        self.community = community
+        self.credentials = credentials or V2C(community)
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_message_size = max_message_size
+        self._address: Optional[str] = None
+        self._client: Optional[PyWrapper] = None
+        self._idle: List[_SNMPDatagramProtocol] = []
+        self._scheduler = _RequestScheduler(max_in_flight, max_queued)
+        self._pending: Dict[tuple, asyncio.Future] = {}
+        self._engine: Optional[_EngineState] = None
+        self.stats = SNMPStats()
+        # Optional SETs the agent rejected, not tried again on this session
+        self.unsupported: Set[Tuple[str, int]] = set()
+
+    @property
+    def address(self) -> Optional[str]:
+        """Return the resolved IP address of the PDU, once connected."""
+        return self._address
+
+    @property
+    def congested(self) -> bool:
+        """Return True if every request slot is busy and more are waiting."""
+        return self._scheduler.queued > 0
+
+    async def async_resolve(self) -> str:
+        """Resolve the host to the address of the PDU, without any SNMP traffic."""
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_DGRAM
+        )
+        self._address = infos[0][4][0]
+        return self._address
+
+    async def async_connect(self) -> None:
+        """Resolve the host and create the SNMP client."""
+        if self._client is not None:
+            return
+        await self.async_resolve()
+        client = Client(
+            self._address, self.credentials, port=self.port, sender=self._send
+        )
+        client.configure(timeout=self.timeout, retries=self.retries)
+        if isinstance(self.credentials, V3):
+            await self._async_setup_v3(client)
+        self._client = PyWrapper(client)
+
+    def configure(
+        self, timeout: float, retries: int, max_in_flight: Optional[int] = None
+    ) -> None:
+        """Change the timeout, retries and request limit of a running session."""
+        self.timeout = timeout
+        self.retries = retries
+        if self._client is not None:
+            self._client.client.configure(timeout=timeout, retries=retries)
+        if max_in_flight is not None:
+            self._scheduler.resize(max_in_flight)
+
+    async def _async_setup_v3(self, client: Client) -> None:
+        """Give the client the cached engine state, discovering it if needed."""
+        mpm = client.mpm
+        if self._engine is None:
+            security_model = create_security_model(3)
+            with _operation_scope(OP_DISCOVER):
+                disco = await security_model.send_discovery_message(mpm.transport_handler)
+            self._engine = _EngineState(disco)
+            _LOGGER.debug(
+                "Discovered SNMPv3 engine %s on %s",
+                self._engine.authoritative_engine_id.hex(), self.host,
+            )
+        mpm.disco = self._engine
+        mpm.security_model = _CachingUserSecurityModel()
+        decode = mpm.decode
+
+        def decode_response(whole_msg: bytes, credentials: Credentials):
+            pdu = decode(whole_msg, credentials)
+            if isinstance(pdu, Report):
+                # notInTimeWindow or unknownEngineID: the engine state is
+                # stale, rediscover it on the next request
+                self._engine = None
+                self._client = None
+                oid = pdu.value.varbinds[0].oid if pdu.value.varbinds else None
+                raise SnmpError(f"SNMPv3 report {oid} from {self.host}")
+            return pdu
+
+        mpm.decode = decode_response
+
+    async def async_close(self) -> None:
+        """Close the UDP sockets and drop the client."""
+        self._client = None
+        while self._idle:
+            protocol = self._idle.pop()
+            if protocol.transport is not None:
+                protocol.transport.close()
+
+    async def _send(
+        self,
+        endpoint,
+        packet: bytes,
+        timeout: int = SNMP_TIMEOUT,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        retries: int = SNMP_RETRIES,
+    ) -> bytes:
+        """Send a packet on a pooled socket and wait for the reply.
+
+        Used as the puresnmp sender. Each socket carries one exchange at a
+        time, so a response always belongs to the request waiting on that
+        socket. If any attempt timed out the socket is discarded afterwards,
+        so a late reply can never be read as the answer to another request.
+        puresnmp's request IDs come from the clock and would not tell them
+        apart.
+        """
+        loop = asyncio.get_running_loop()
+        stats = self.stats.operation(_operation.get())
+        await self._scheduler.acquire(_priority.get())
+        protocol = None
+        timed_out = False
+        try:
+            while self._idle and protocol is None:
+                protocol = self._idle.pop()
+                if protocol.transport is None:
+                    protocol = None
+            if protocol is None:
+                _, protocol = await loop.create_datagram_endpoint(
+                    _SNMPDatagramProtocol,
+                    remote_addr=(str(endpoint.ip), endpoint.port),
+                )
+            for attempt in range(max(retries, 1)):
+                protocol.future = loop.create_future()
+                protocol.transport.sendto(packet)
+                stats.packets += 1
+                if attempt:
+                    self.stats.retransmits += 1
+                sent_at = loop.time()
+                try:
+                    response = await asyncio.wait_for(protocol.future, timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    stats.timeouts += 1
+                    _LOGGER.debug(
+                        "SNMP request to %s timed out (attempt %d/%d)",
+                        self.host, attempt + 1, retries,
+                    )
+                else:
+                    stats.record_response(loop.time() - sent_at)
+                    return response
+            raise Timeout(f"{timeout} second timeout exceeded on {self.host}")
+        finally:
+            if protocol is not None:
+                protocol.future = None
+                if timed_out or self._client is None or protocol.transport is None:
+                    if protocol.transport is not None:
+                        protocol.transport.close()
+                else:
+                    self._idle.append(protocol)
+            self._scheduler.release()
+
+    async def _coalesce(self, key: tuple, factory):
+        """Share one pending read between identical callers."""
+        key = (current_priority(),) + key
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(factory())
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _ensure_client(self) -> PyWrapper:
+        if self._client is None:
+            await self.async_connect()
+        return self._client
+
+    def _record_failure(self, operation: str, target, error: Exception) -> None:
+        """Count a failed operation and log it."""
+        self.stats.record_error(operation, error)
+        if isinstance(error, Timeout):
+            # An unreachable PDU is expected, it shows up in the stats and as
+            # unavailable entities rather than a traceback per request
+            _LOGGER.debug("SNMP %s timed out on %s (%s)", operation, self.host, target)
+        else:
+            _LOGGER.error(
+                "SNMP %s failed on %s (%s): %s", operation, self.host, target, error,
+                exc_info=error,
+            )
+
+    async def async_get(self, oid: str) -> Optional[int]:
+        """SNMP GET operation for integer values."""
+        value = (await self.async_get_many([oid]))[oid]
+        return None if value is None else int(value)
+
+    async def async_get_string(self, oid: str) -> Optional[str]:
+        """SNMP GET operation for string values."""
+        value = (await self.async_get_many([oid]))[oid]
+        return None if value is None else str(value)
+
+    async def async_get_many(self, oids: List[str]) -> Dict[str, Any]:
+        """SNMP GET for several OIDs, packed into as few requests as possible.
+
+        Returns a dict of OID to value. OIDs the agent does not have
+        (noSuchObject/noSuchInstance) or that could not be read map to None
+        without affecting the others.
+        """
+        results = await self._coalesce(
+            ("get", tuple(oids)), lambda: self._get_many(oids)
+        )
+        return dict(results)
+
+    async def _get_many(self, oids: List[str]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {oid: None for oid in oids}
+        try:
+            client = await self._ensure_client()
+        except Exception as e:
+            self._record_failure(OP_GET, oids, e)
             return results
-        
-        return asyncio.run(_walk())
-    except Exception as e:
-        _LOGGER.exception("SNMP WALK failed on %s (%s): %s", ip, base_oid, e)
-        return {}
+        with _operation_scope(OP_GET):
+            for group in _pack_oids(list(results), self.max_message_size):
+                await self._get_group(client, group, results)
+        return results
+
+    async def _get_group(
+        self, client: PyWrapper, group: List[str], results: Dict[str, Any]
+    ) -> None:
+        """Read one packed group, splitting it further if the agent requires."""
+        try:
+            values = await client.multiget(group)
+        except TooBig:
+            if len(group) == 1:
+                _LOGGER.warning("SNMP response too big on %s (%s)", self.host, group[0])
+                return
+            # Our size estimate was off for this agent, split and try again
+            middle = len(group) // 2
+            await self._get_group(client, group[:middle], results)
+            await self._get_group(client, group[middle:], results)
+            return
+        except NoSuchOID as e:
+            # SNMPv1-style agents reject the whole request for one missing OID
+            missing = str(e.offending_oid).lstrip(".") if e.offending_oid else None
+            remaining = [oid for oid in group if oid != missing]
+            _LOGGER.debug("SNMP GET on %s: no such OID %s", self.host, missing)
+            if remaining and len(remaining) < len(group):
+                await self._get_group(client, remaining, results)
+            return
+        except PDUBusyError:
+            self.stats.busy += 1
+            _LOGGER.debug("PDU %s is busy, skipped GET of %s", self.host, group)
+            return
+        except Exception as e:
+            self._record_failure(OP_GET, group, e)
+            return
+        self.stats.operation(OP_GET).varbinds += len(group)
+        results.update(zip(group, values))
+
+    async def async_walk(self, base_oid: str) -> Dict[str, Any]:
+        """SNMP WALK operation."""
+        try:
+            client = await self._ensure_client()
+            results = {}
+            with _operation_scope(OP_WALK):
+                async for oid, value in client.walk(base_oid):
+                    results[str(oid)] = value
+            self.stats.operation(OP_WALK).varbinds += len(results)
+            return results
+        except Exception as e:
+            self._record_failure(OP_WALK, base_oid, e)
+            return {}
+
+    async def async_bulk_table(
+        self, column_oids: List[str], max_repetitions: int = DEFAULT_MAX_REPETITIONS
+    ) -> Dict[str, Dict[int, Any]]:
+        """Retrieve table columns together using GETBULK requests.
+
+        All columns are walked side by side, so each request returns
+        max_repetitions rows of every column. The result maps each column OID
+        to a dict of row index to value.
+        """
+        return await self._coalesce(
+            ("table", tuple(column_oids), max_repetitions),
+            lambda: self._bulk_table(column_oids, max_repetitions),
+        )
 
-def discover_outlets(ip: str, community: str) -> List[Tuple[int, str]]:
+    async def _bulk_table(
+        self, column_oids: List[str], max_repetitions: int
+    ) -> Dict[str, Dict[int, Any]]:
+        table: Dict[str, Dict[int, Any]] = {column: {} for column in column_oids}
+        try:
+            async for column, index, value in self.async_iter_bulk_table(
+                column_oids, max_repetitions
+            ):
+                table[column][index] = value
+            return table
+        except PDUBusyError:
+            self.stats.busy += 1
+            _LOGGER.debug("PDU %s is busy, skipped walk of %s", self.host, column_oids)
+            return table
+        except Exception as e:
+            self._record_failure(OP_BULKWALK, column_oids, e)
+            return table
+
+    async def async_iter_bulk_table(
+        self, column_oids: List[str], max_repetitions: int = DEFAULT_MAX_REPETITIONS
+    ) -> AsyncIterator[Tuple[str, int, Any]]:
+        """Stream table cells as each GETBULK response arrives.
+
+        Yields (column OID, row index, value), so the caller can work on the
+        first rows while the rest are still on the wire; the walk ends with
+        the response that leaves the table. Unlike async_bulk_table the walk
+        is not shared with other callers and errors are raised.
+
+        puresnmp's bulkwalk keys each response by OID and stops at the first
+        endOfMibView, so a short column running past its table into another
+        requested column, or off the end of the MIB, shifts or cuts the rows
+        of the others. The varbinds are instead assigned to columns by
+        position, as RFC 3416 lays them out, and each column ends on its
+        own.
+        """
+        client = (await self._ensure_client()).client
+        stats = self.stats.operation(OP_BULKWALK)
+        columns = {column: ObjectIdentifier(column) for column in column_oids}
+        cursors = dict(columns)
+        while cursors:
+            request_id = get_request_id()
+            request = BulkGetRequest(request_id, 0, max_repetitions, *cursors.values())
+            # Scope only the request, not the caller's code between rows
+            with _operation_scope(OP_BULKWALK):
+                response = await client._send(request, request_id)
+            varbinds = response.value.varbinds
+            if not len(cursors) <= len(varbinds) <= len(cursors) * max_repetitions:
+                # Less than a row would never end the walk
+                raise SnmpError(
+                    f"GETBULK returned {len(varbinds)} varbinds for "
+                    f"{len(cursors)} columns of {max_repetitions} rows"
+                )
+            stats.varbinds += len(varbinds)
+            walking = list(cursors)
+            finished: Set[str] = set()
+            for position, (oid, value) in enumerate(varbinds):
+                column = walking[position % len(walking)]
+                if column in finished:
+                    continue
+                if (
+                    isinstance(value, EndOfMibView)
+                    or oid not in columns[column]
+                    or not cursors[column] < oid
+                ):
+                    finished.add(column)
+                    continue
+                cursors[column] = oid
+                yield column, oid_index(oid, column), value.pythonize()
+            for column in finished:
+                del cursors[column]
+
+    async def async_bulk_get(
+        self,
+        scalar_oids: List[str],
+        repeating_oids: List[str],
+        max_repetitions: int = DEFAULT_MAX_REPETITIONS,
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Single SNMP GETBULK request.
+
+        Returns the scalar (GETNEXT) results and the repeated rows, both keyed
+        by the returned OID, or None if the request failed.
+        """
+        return await self._coalesce(
+            ("bulk", tuple(scalar_oids), tuple(repeating_oids), max_repetitions),
+            lambda: self._bulk_get(scalar_oids, repeating_oids, max_repetitions),
+        )
+
+    async def _bulk_get(
+        self,
+        scalar_oids: List[str],
+        repeating_oids: List[str],
+        max_repetitions: int,
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        try:
+            client = await self._ensure_client()
+            with _operation_scope(OP_BULK):
+                result = await client.bulkget(
+                    scalar_oids, repeating_oids, max_list_size=max_repetitions
+                )
+            scalars = {str(oid): value for oid, value in result.scalars.items()}
+            listing = {str(oid): value for oid, value in result.listing.items()}
+            self.stats.operation(OP_BULK).varbinds += len(scalars) + len(listing)
+            return scalars, listing
+        except PDUBusyError:
+            self.stats.busy += 1
+            _LOGGER.debug("PDU %s is busy, skipped GETBULK", self.host)
+            return None
+        except Exception as e:
+            self._record_failure(OP_BULK, scalar_oids + repeating_oids, e)
+            return None
+
+    async def async_set_many(self, values: Dict[str, int]) -> bool:
+        """SNMP SET of several integer OIDs, packed into as few requests as possible."""
+        try:
+            client = await self._ensure_client()
+            with control_priority(), _operation_scope(OP_SET):
+                for group in _pack_oids(list(values), self.max_message_size):
+                    await client.multiset({oid: Integer(values[oid]) for oid in group})
+                    self.stats.operation(OP_SET).varbinds += len(group)
+            _LOGGER.debug("SNMP SET successful on %s: %s", self.host, values)
+            return True
+        except Exception as e:
+            self._record_failure(OP_SET, list(values), e)
+            return False
+
+    async def async_set(self, oid: str, value: int, optional: bool = False) -> bool:
+        """SNMP SET operation for integer values.
+
+        An optional SET is one the caller has a fallback for: if the agent
+        rejects it, that is remembered in unsupported and logged at debug.
+        """
+        try:
+            client = await self._ensure_client()
+            with control_priority(), _operation_scope(OP_SET):
+                await client.set(oid, Integer(value))
+            self.stats.operation(OP_SET).varbinds += 1
+            _LOGGER.debug("SNMP SET successful on %s (%s) = %s", self.host, oid, value)
+            return True
+        except ErrorResponse as e:
+            if not optional:
+                self._record_failure(OP_SET, oid, e)
+                return False
+            self.stats.record_error(OP_SET, e)
+            self.unsupported.add((oid, value))
+            _LOGGER.debug("PDU %s does not support SET %s = %s: %s", self.host, oid, value, e)
+            return False
+        except Exception as e:
+            self._record_failure(OP_SET, oid, e)
+            return False
+
+async def discover_outlets(
+    session: APCPDUSession, max_repetitions: int = DEFAULT_MAX_REPETITIONS
+) -> List[Tuple[int, str]]:
     """Discover outlets and their names from the PDU."""
+    ip = session.host
     try:
-        from .const import OUTLET_INDEX_OID, OUTLET_NAME_OID
-        
-        # Walk the outlet index OID to get all outlet numbers
-        index_results = snmp_walk(ip, community, OUTLET_INDEX_OID)
-        name_results = snmp_walk(ip, community, OUTLET_NAME_OID)
+        # Walk the index and name columns together, keyed by row index, and
+        # parse the rows of each response while the next one is on its way
+        names: Dict[int, Any] = {}
+        indexes: Dict[int, Any] = {}
+        async for column, row, value in session.async_iter_bulk_table(
+            [OUTLET_INDEX_OID, OUTLET_NAME_OID], max_repetitions=max_repetitions
+        ):
+            if column == OUTLET_NAME_OID:
+                names[row] = value
+            else:
+                indexes[row] = value
         
         outlets = []
         
-        # Process index results to get outlet numbers
-        for oid, value in index_results.items():
+        for row, value in indexes.items():
             try:
-                # Extract the outlet index from the OID
-                # OID format: 1.3.6.1.4.1.318.1.1.12.3.3.1.1.1.X where X is outlet number
-                outlet_num = int(oid.split('.')[-1])
                 outlet_index = int(value)
-                
-                # Find corresponding name
-                name_oid = None
-                outlet_name = f"Outlet {outlet_index}"  # Default name
-                
-                # Look for matching name OID
-                for name_oid_key, name_value in name_results.items():
-                    if name_oid_key.endswith(f".{outlet_num}"):
-                        outlet_name = _clean_snmp_string(name_value)
-                        break
-                
-                outlets.append((outlet_index, outlet_name))
-                _LOGGER.debug("Discovered outlet %d: %s", outlet_index, outlet_name)
-                
-            except (ValueError, IndexError) as e:
-                _LOGGER.warning("Failed to parse outlet from OID %s: %s", oid, e)
+            except (TypeError, ValueError) as e:
+                _LOGGER.warning("Failed to parse outlet index for row %d: %s", row, e)
                 continue
+            
+            name = names.get(row)
+            outlet_name = _clean_snmp_string(name) if name is not None else f"Outlet {outlet_index}"
+            
+            outlets.append((outlet_index, outlet_name))
+            _LOGGER.debug("Discovered outlet %d: %s", outlet_index, outlet_name)
         
         # Sort by outlet number
         outlets.sort(key=lambda x: x[0])
@@ -112,30 +860,29 @@ def discover_outlets(ip: str, community: str) -> List[Tuple[int, str]]:
         return outlets
         
     except Exception as e:
+        session.stats.record_error(OP_BULKWALK, e)
         _LOGGER.exception("Failed to discover outlets on %s: %s", ip, e)
         return []
 
-def discover_device_info(ip: str, community: str) -> Dict[str, str]:
+async def discover_device_info(session: APCPDUSession) -> PDUDeviceInfo:
     """Discover device information from the PDU."""
+    ip = session.host
     try:
-        from .const import DEVICE_NAME_OID, DEVICE_MODEL_OID, DEVICE_SERIAL_OID
-        
-        device_info = {}
-        
-        # Get device name
-        device_name = snmp_get_string(ip, community, DEVICE_NAME_OID)
-        if device_name:
-            device_info["name"] = _clean_snmp_string(device_name)
+        # Name, model and serial number in a single request
+        values = await session.async_get_many(
+            [DEVICE_NAME_OID, DEVICE_MODEL_OID, DEVICE_SERIAL_OID]
+        )
         
-        # Get device model
-        device_model = snmp_get_string(ip, community, DEVICE_MODEL_OID)
-        if device_model:
-            device_info["model"] = _clean_snmp_string(device_model)
+        device_info: PDUDeviceInfo = {}
         
-        # Get serial number
-        device_serial = snmp_get_string(ip, community, DEVICE_SERIAL_OID)
-        if device_serial:
-            device_info["serial_number"] = _clean_snmp_string(device_serial)
+        for key, oid in (
+            ("name", DEVICE_NAME_OID),
+            ("model", DEVICE_MODEL_OID),
+            ("serial_number", DEVICE_SERIAL_OID),
+        ):
+            value = _clean_snmp_string(values.get(oid))
+            if value:
+                device_info[key] = value
         
         _LOGGER.info(
             "Discovered device info for %s: %s (Model: %s, S/N: %s)", 
@@ -151,15 +898,83 @@ def discover_device_info(ip: str, community: str) -> Dict[str, str]:
         _LOGGER.exception("Failed to discover device info on %s: %s", ip, e)
         return {}
 
-def snmp_set(ip: str, community: str, oid: str, value: int) -> bool:
-    """Synchronous SNMP SET operation for executor."""
+
+def no_capabilities() -> Dict[str, Any]:
+    """Return the capabilities of a PDU without metering tables or probes."""
+    return {
+        "metered_outlets": [], "phases": [], "banks": [],
+        "probes": [], "humidity_probes": [], "probe_names": {},
+    }
+
+
+async def discover_capabilities(
+    session: APCPDUSession, max_repetitions: int = DEFAULT_MAX_REPETITIONS
+) -> Optional[Dict[str, Any]]:
+    """Discover which metering tables and environmental probes the PDU provides.
+
+    Returns the row indices of metered outlets, phases, banks, temperature
+    probes and probes that also measure humidity, plus the probe names.
+    Models without a table, such as unmetered PDUs, get an empty list for it.
+    Returns None if the walk did not complete, so a failed request is never
+    mistaken for a PDU without metering.
+    """
+    ip = session.host
+    columns = [
+        OUTLET_METERED_CURRENT_OID,
+        PHASE_CURRENT_OID,
+        BANK_CURRENT_OID,
+        PROBE_NAME_OID,
+        PROBE_TEMPERATURE_OID,
+        PROBE_HUMIDITY_OID,
+    ]
+    table: Dict[str, Dict[int, Any]] = {column: {} for column in columns}
     try:
-        client = PyWrapper(Client(ip, V2C(community)))
-        # This is now sync and will be run in executor
-        import asyncio
-        asyncio.run(client.set(oid, Integer(value)))
-        _LOGGER.debug("SNMP SET successful on %s (%s) = %s", ip, oid, value)
-        return True
+        async for column, row, value in session.async_iter_bulk_table(
+            columns, max_repetitions=max_repetitions
+        ):
+            table[column][row] = value
+        capabilities = {
+            "metered_outlets": sorted(table[OUTLET_METERED_CURRENT_OID]),
+            "phases": sorted(table[PHASE_CURRENT_OID]),
+            "banks": sorted(table[BANK_CURRENT_OID]),
+            "probes": sorted(table[PROBE_TEMPERATURE_OID]),
+            # Temperature-only probes report a humidity of -1
+            "humidity_probes": sorted(
+                row for row, value in table[PROBE_HUMIDITY_OID].items() if int(value) >= 0
+            ),
+            "probe_names": {
+                str(row): _clean_snmp_string(name)
+                for row, name in table[PROBE_NAME_OID].items()
+            },
+        }
+        _LOGGER.info(
+            "Discovered metering on %s: %d outlets, %d phases, %d banks, %d probes",
+            ip,
+            len(capabilities["metered_outlets"]),
+            len(capabilities["phases"]),
+            len(capabilities["banks"]),
+            len(capabilities["probes"]),
+        )
+        return capabilities
+        
     except Exception as e:
-        _LOGGER.exception("SNMP SET failed on %s (%s): %s", ip, oid, e)
-        return False
\ No newline at end of file
+        session.stats.record_error(OP_BULKWALK, e)
+        _LOGGER.warning("Failed to discover metering capabilities on %s: %s", ip, e)
+        return None
+
+
+async def probe_device(session: APCPDUSession) -> Tuple[Optional[str], Optional[float]]:
+    """Read the serial number and uptime in seconds with a single GET."""
+    values = await session.async_get_many([DEVICE_SERIAL_OID, SYS_UPTIME_OID])
+    serial = values[DEVICE_SERIAL_OID]
+    uptime = values[SYS_UPTIME_OID]
+    return (
+        _clean_snmp_string(serial) if serial is not None else None,
+        uptime.total_seconds() if uptime is not None else None,
+    )
+
+
+async def probe_reachable(session: APCPDUSession) -> bool:
+    """Return True if the PDU answers a single GET of its uptime."""
+    values = await session.async_get_many([SYS_UPTIME_OID])
+    return values[SYS_UPTIME_OID] is not None
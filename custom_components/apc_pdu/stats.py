@@ -0,0 +1,159 @@
+# File: custom_components/apc_pdu/stats.py
+
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from .const import SNMP_STATS_WINDOW
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# SNMP operations tracked by the session
+OP_GET = "get"
+OP_WALK = "walk"
+OP_BULK = "bulk"
+OP_BULKWALK = "bulkwalk"
+OP_SET = "set"
+OP_DISCOVER = "discover"
+
+
+def _percentile(samples: Iterable[float], percent: float) -> Optional[float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class OperationStats:
+    """Counters and latencies for one kind of SNMP operation."""
+
+    __slots__ = (
+        "packets", "responses", "timeouts", "errors", "varbinds",
+        "latency_total", "buckets", "recent",
+    )
+
+    def __init__(self, window: int = SNMP_STATS_WINDOW) -> None:
+        self.packets = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.varbinds = 0
+        self.latency_total = 0.0
+        # One count per bucket in LATENCY_BUCKETS plus one for anything slower
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def record_response(self, elapsed: float) -> None:
+        self.responses += 1
+        self.latency_total += elapsed
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.recent.append(elapsed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "packets": self.packets,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "varbinds": self.varbinds,
+            "latency_mean_ms": _ms(self.latency_total / self.responses if self.responses else None),
+            "latency_p50_ms": _ms(_percentile(self.recent, 50)),
+            "latency_p95_ms": _ms(_percentile(self.recent, 95)),
+            "latency_histogram": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+                "le_inf": self.buckets[-1],
+            },
+        }
+
+
+class SNMPStats:
+    """Rolling SNMP statistics for one PDU.
+
+    The session records every packet it sends, each response with its
+    latency, timeouts, retransmits and failed operations, grouped by
+    operation. Counters are cumulative since the session was created and
+    latency percentiles cover the last SNMP_STATS_WINDOW responses of each
+    operation. Recording is a few integer updates, cheap enough for the
+    hot path.
+    """
+
+    def __init__(self, window: int = SNMP_STATS_WINDOW) -> None:
+        self.window = window
+        self.operations: Dict[str, OperationStats] = {}
+        self.retransmits = 0
+        self.busy = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self.started = time.time()
+
+    def operation(self, name: str) -> OperationStats:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats(self.window)
+        return stats
+
+    def record_error(self, name: str, error: Exception) -> None:
+        self.operation(name).errors += 1
+        self.last_error = f"{name}: {type(error).__name__}: {error}"
+        self.last_error_at = time.time()
+
+    @property
+    def packets(self) -> int:
+        return sum(stats.packets for stats in self.operations.values())
+
+    @property
+    def responses(self) -> int:
+        return sum(stats.responses for stats in self.operations.values())
+
+    @property
+    def timeouts(self) -> int:
+        return sum(stats.timeouts for stats in self.operations.values())
+
+    @property
+    def errors(self) -> int:
+        return sum(stats.errors for stats in self.operations.values())
+
+    @property
+    def varbinds_per_packet(self) -> Optional[float]:
+        packets = self.packets
+        if not packets:
+            return None
+        return sum(stats.varbinds for stats in self.operations.values()) / packets
+
+    def latency_percentile(self, percent: float) -> Optional[float]:
+        """Return a latency percentile in seconds over recent responses."""
+        return _percentile(
+            (sample for stats in self.operations.values() for sample in stats.recent),
+            percent,
+        )
+
+    def latency_ms(self, percent: float) -> Optional[float]:
+        """Return a latency percentile in milliseconds, rounded for display."""
+        return _ms(self.latency_percentile(percent))
+
+    def as_dict(self) -> Dict[str, Any]:
+        varbinds_per_packet = self.varbinds_per_packet
+        return {
+            "packets": self.packets,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "retransmits": self.retransmits,
+            "errors": self.errors,
+            "busy_skips": self.busy,
+            "varbinds_per_packet": (
+                round(varbinds_per_packet, 2) if varbinds_per_packet is not None else None
+            ),
+            "latency_p50_ms": self.latency_ms(50),
+            "latency_p95_ms": self.latency_ms(95),
+            "latency_p99_ms": self.latency_ms(99),
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "since": self.started,
+            "operations": {name: stats.as_dict() for name, stats in self.operations.items()},
+        }
@@ -1,56 +1,55 @@
 # File: custom_components/apc_pdu/switch.py
 
-import asyncio
 import logging
 from homeassistant.core import HomeAssistant
 from homeassistant.components.switch import SwitchEntity
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import STATE_OFF, STATE_ON
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.exceptions import HomeAssistantError
 
-from .snmp import snmp_get, snmp_set
-from .const import DOMAIN, BASE_OID
+from .coordinator import APCPDUCoordinator
+from .const import DOMAIN, OUTLET_ON, OUTLET_OFF
+from .entity import APCPDUEntity
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
-    data = config_entry.data
-    host = data["host"]
-    community = data["community"]
-    outlet_count = int(data["outlet_count"])
-    outlet_names = data.get("outlet_names", {})
-    device_info = data.get("device_info", {})
-    
-    _LOGGER.info("Setting up %d outlet switches for PDU %s", outlet_count, host)
-    
     entities = []
-    for outlet in range(1, outlet_count + 1):
-        outlet_name = outlet_names.get(str(outlet), f"Outlet {outlet}")
-        entities.append(APCPDUSwitch(hass, host, community, outlet, outlet_name, device_info))
+    # A fleet entry holds several PDUs, each becomes its own device
+    for host, pdu in hass.data[DOMAIN][config_entry.entry_id]["pdus"].items():
+        coordinator = pdu["coordinator"]
+        metadata = pdu["metadata"]
+        outlet_count = int(metadata["outlet_count"])
+        outlet_names = metadata["outlet_names"]
+        device_info = metadata["device_info"]
+        
+        _LOGGER.info("Setting up %d outlet switches for PDU %s", outlet_count, host)
+        
+        for outlet in range(1, outlet_count + 1):
+            outlet_name = outlet_names.get(str(outlet), f"Outlet {outlet}")
+            entities.append(APCPDUSwitch(coordinator, outlet, outlet_name, device_info))
     
     async_add_entities(entities)
 
-class APCPDUSwitch(SwitchEntity):
-    _attr_should_poll = True
+class APCPDUSwitch(APCPDUEntity, SwitchEntity):
+    """An APC PDU outlet, reading its state from the shared coordinator."""
 
-    def __init__(self, hass: HomeAssistant, host: str, community: str, outlet: int, outlet_name: str, device_info: dict) -> None:
-        self._hass = hass
-        self._host = host
-        self._community = community
+    def __init__(self, coordinator: APCPDUCoordinator, outlet: int, outlet_name: str, device_info: dict) -> None:
+        super().__init__(coordinator, device_info)
+        self._host = coordinator.host
         self._outlet = outlet
         self._outlet_name = outlet_name
-        self._device_info = device_info
-        self._state = None
-        self._available = True
+        self._attr_unique_id = f"{self._host}_{self._outlet}"
 
     @property
     def name(self) -> str:
         return f"APC {self._outlet_name}"
 
     @property
-    def unique_id(self) -> str:
-        return f"{self._host}_{self._outlet}"
+    def _state(self):
+        """Return the raw outlet state (1=on, 2=off), optimistic while a command is pending."""
+        return self.coordinator.outlet_state(self._outlet)
 
     @property
     def is_on(self) -> bool:
@@ -58,115 +57,39 @@ class APCPDUSwitch(SwitchEntity):
 
     @property
     def available(self) -> bool:
-        return self._available
+        return self.coordinator.last_update_success and self._state in [1, 2]
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        # Use discovered device info with fallbacks
-        device_name = self._device_info.get("name", f"APC PDU ({self._host})")
-        device_model = self._device_info.get("model", "Smart PDU")
-        device_serial = self._device_info.get("serial_number")
-        
-        device_info_dict = {
-            "identifiers": {(DOMAIN, self._host)},
-            "name": device_name,
-            "manufacturer": "APC",
-            "model": device_model,
-            "configuration_url": f"http://{self._host}",
-        }
-        
-        # Add serial number if available
-        if device_serial:
-            device_info_dict["serial_number"] = device_serial
-        
-        return DeviceInfo(**device_info_dict)
+    def _changed_since(self, generation: int) -> bool:
+        return self.coordinator.snapshot.outlet_changed_since(self._outlet, generation)
 
-    @property
-    def extra_state_attributes(self):
-        """Return extra state attributes."""
-        return {
+    async def _async_restore(self) -> None:
+        last_state = await self.async_get_last_state()
+        if last_state is not None and last_state.state in (STATE_ON, STATE_OFF):
+            self.coordinator.snapshot.restore_outlet(
+                self._outlet, OUTLET_ON if last_state.state == STATE_ON else OUTLET_OFF
+            )
+
+    def _update_attributes(self) -> None:
+        # Pick up renames made on the PDU by the periodic metadata poll
+        if self.coordinator.data and "outlet_names" in self.coordinator.data:
+            self._outlet_name = self.coordinator.data["outlet_names"].get(self._outlet, self._outlet_name)
+        self._attr_extra_state_attributes = {
             "outlet_number": self._outlet,
             "outlet_name": self._outlet_name,
             "pdu_host": self._host,
+            "command_pending": self.coordinator.pending.state(self._outlet) is not None,
         }
 
-    async def async_update(self) -> None:
-        """Fetch new state data for this switch."""
-        oid = f"{BASE_OID}.{self._outlet}"
-        try:
-            result = await self._hass.async_add_executor_job(
-                snmp_get, self._host, self._community, oid
-            )
-            
-            if result in [1, 2]:  # 1=on, 2=off for APC PDUs
-                self._state = result
-                self._available = True
-            else:
-                _LOGGER.warning(f"Invalid state {result} for outlet {self._outlet} ({self._outlet_name})")
-                self._available = False
-                
-        except Exception as e:
-            _LOGGER.error(f"Error updating outlet {self._outlet} ({self._outlet_name}): {e}")
-            self._available = False
-
     async def async_turn_on(self, **kwargs) -> None:
         """Turn the switch on."""
-        oid = f"{BASE_OID}.{self._outlet}"
-        try:
-            success = await self._hass.async_add_executor_job(
-                snmp_set, self._host, self._community, oid, 1
-            )
-            if success:
-                self._available = True
-                # Wait for state change with retry
-                expected_state = 1
-                state_confirmed = False
-                for attempt in range(5):  # Try up to 5 times
-                    await asyncio.sleep(0.1 * (attempt + 1))  # 0.1, 0.2, 0.3, 0.4, 0.5
-                    await self.async_update()
-                    if self._state == expected_state:
-                        state_confirmed = True
-                        break
-                
-                if not state_confirmed:
-                    _LOGGER.warning(f"State change not confirmed for outlet {self._outlet} ({self._outlet_name}) after 5 attempts")
-                
-                self.async_write_ha_state()
-            else:
-                _LOGGER.warning(f"Failed to turn on outlet {self._outlet} ({self._outlet_name})")
-                raise HomeAssistantError(f"Failed to turn on outlet {self._outlet} ({self._outlet_name})")
-        except Exception as e:
-            _LOGGER.error(f"Error turning on outlet {self._outlet} ({self._outlet_name}): {e}")
-            self._available = False
-            raise HomeAssistantError(f"Error turning on outlet {self._outlet} ({self._outlet_name}): {e}")
+        await self._async_switch(OUTLET_ON, "on")
 
     async def async_turn_off(self, **kwargs) -> None:
         """Turn the switch off."""
-        oid = f"{BASE_OID}.{self._outlet}"
-        try:
-            success = await self._hass.async_add_executor_job(
-                snmp_set, self._host, self._community, oid, 2
-            )
-            if success:
-                self._available = True
-                # Wait for state change with retry
-                expected_state = 2
-                state_confirmed = False
-                for attempt in range(5):  # Try up to 5 times
-                    await asyncio.sleep(0.1 * (attempt + 1))  # 0.1, 0.2, 0.3, 0.4, 0.5
-                    await self.async_update()
-                    if self._state == expected_state:
-                        state_confirmed = True
-                        break
-                
-                if not state_confirmed:
-                    _LOGGER.warning(f"State change not confirmed for outlet {self._outlet} ({self._outlet_name}) after 5 attempts")
-                
-                self.async_write_ha_state()
-            else:
-                _LOGGER.warning(f"Failed to turn off outlet {self._outlet} ({self._outlet_name})")
-                raise HomeAssistantError(f"Failed to turn off outlet {self._outlet} ({self._outlet_name})")
-        except Exception as e:
-            _LOGGER.error(f"Error turning off outlet {self._outlet} ({self._outlet_name}): {e}")
-            self._available = False
-            raise HomeAssistantError(f"Error turning off outlet {self._outlet} ({self._outlet_name}): {e}")
\ No newline at end of file
+        await self._async_switch(OUTLET_OFF, "off")
+
+    async def _async_switch(self, state: int, action: str) -> None:
+        """Send the command; the coordinator confirms it in the background."""
+        if not await self.coordinator.async_set_outlets({self._outlet: state}):
+            _LOGGER.warning("Failed to turn %s outlet %d (%s)", action, self._outlet, self._outlet_name)
+            raise HomeAssistantError(f"Failed to turn {action} outlet {self._outlet} ({self._outlet_name})")
@@ -0,0 +1,148 @@
+# File: custom_components/apc_pdu/trap.py
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+from x690 import decode
+from x690.types import Sequence, UnknownType
+from x690.util import encode_length
+from puresnmp.pdu import Trap
+
+from .const import DOMAIN, TRAP_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_TRAP_LISTENER = f"{DOMAIN}_trap_listener"
+
+# SNMPv2 trap varbinds
+SNMP_TRAP_OID = "1.3.6.1.6.3.1.1.4.1.0"
+
+# SNMPv1 Trap-PDU, context tag 4, which puresnmp does not model
+V1_TRAP_TAG = 0xA4
+V1_ENTERPRISE_SPECIFIC = 6
+# Generic traps 0-5 as SNMPv2 trap OIDs (coldStart ... egpNeighborLoss)
+V1_GENERIC_TRAP_OID = "1.3.6.1.6.3.1.1.5"
+
+
+def _decode_v1_trap(pdu: UnknownType) -> Tuple[str, Dict[str, Any]]:
+    """Return the SNMPv2 trap OID and varbinds of an SNMPv1 Trap-PDU.
+
+    Enterprise-specific traps map to <enterprise>.0.<specific-trap> as in
+    RFC 3584, so APC's outletOn arrives as 1.3.6.1.4.1.318.0.41 either way.
+    """
+    body = pdu.value
+    fields, _ = decode(b"\x30" + encode_length(len(body)) + body, enforce_type=Sequence)
+    enterprise, _, generic, specific, _, varbinds = fields
+    if generic.pythonize() == V1_ENTERPRISE_SPECIFIC:
+        trap_oid = f"{enterprise.pythonize()}.0.{specific.pythonize()}"
+    else:
+        trap_oid = f"{V1_GENERIC_TRAP_OID}.{generic.pythonize() + 1}"
+    values = {str(varbind[0].pythonize()): varbind[1].pythonize() for varbind in varbinds}
+    return trap_oid, values
+
+
+class _TrapProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol passing every received trap to the listener."""
+
+    def __init__(self, listener: "APCTrapListener") -> None:
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.listener.handle_packet(data, addr)
+
+
+class APCTrapListener:
+    """UDP SNMP trap listener shared by all APC PDU config entries.
+
+    Each coordinator registers the address of its PDU and the community it
+    expects. Incoming SNMPv1 and SNMPv2c traps are decoded and routed to the coordinator
+    for their source address; traps from unknown hosts or with the wrong
+    community are dropped.
+    """
+
+    def __init__(self, port: int = TRAP_PORT) -> None:
+        self.port = port
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._routes: Dict[str, Tuple[str, Any]] = {}
+
+    @property
+    def running(self) -> bool:
+        """Return True while the listener socket is bound."""
+        return self._transport is not None
+
+    async def async_start(self) -> None:
+        """Bind the trap socket."""
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _TrapProtocol(self), local_addr=("0.0.0.0", self.port)
+        )
+        _LOGGER.info("Listening for APC PDU SNMP traps on UDP port %d", self.port)
+
+    def stop(self) -> None:
+        """Close the trap socket."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def register(self, address: str, community: str, coordinator) -> None:
+        """Route traps from address to the coordinator."""
+        self._routes[address] = (community, coordinator)
+
+    def unregister(self, address: str) -> bool:
+        """Stop routing traps from address, returning True if none are left."""
+        self._routes.pop(address, None)
+        return not self._routes
+
+    def handle_packet(self, data: bytes, addr) -> None:
+        """Decode a trap and hand it to the coordinator of its PDU."""
+        route = self._routes.get(addr[0])
+        if route is None:
+            _LOGGER.debug("Ignoring SNMP trap from unknown host %s", addr[0])
+            return
+        community, coordinator = route
+        
+        try:
+            message, _ = decode(data, enforce_type=Sequence)
+            trap_community = message[1].pythonize()
+            pdu = message[2]
+            if isinstance(pdu, UnknownType) and pdu.tag == V1_TRAP_TAG:
+                # APC NMCs send SNMPv1 traps unless configured otherwise
+                trap_oid, values = _decode_v1_trap(pdu)
+            elif isinstance(pdu, Trap):
+                values = {str(varbind.oid): varbind.value.pythonize() for varbind in pdu.value.varbinds}
+                trap_oid = values.pop(SNMP_TRAP_OID, None)
+            else:
+                _LOGGER.debug("Ignoring SNMP message that is not a trap from %s", addr[0])
+                return
+        except Exception as e:
+            _LOGGER.debug("Failed to decode SNMP trap from %s: %s", addr[0], e)
+            return
+        
+        if trap_community != community.encode():
+            _LOGGER.warning("Ignoring SNMP trap with wrong community from %s", addr[0])
+            return
+        if trap_oid is None:
+            return
+        
+        _LOGGER.debug("SNMP trap %s from %s: %s", trap_oid, addr[0], values)
+        coordinator.async_handle_trap(str(trap_oid), values)
+
+
+async def async_get_trap_listener(hass: HomeAssistant) -> APCTrapListener:
+    """Return the shared trap listener, starting it on first use."""
+    listener = hass.data.get(DATA_TRAP_LISTENER)
+    if listener is None:
+        listener = APCTrapListener()
+        await listener.async_start()
+        hass.data[DATA_TRAP_LISTENER] = listener
+    return listener
+
+
+def async_release_trap_listener(hass: HomeAssistant, address: str) -> None:
+    """Unregister a PDU and stop the listener once no PDU uses it."""
+    listener = hass.data.get(DATA_TRAP_LISTENER)
+    if listener is not None and listener.unregister(address):
+        listener.stop()
+        hass.data.pop(DATA_TRAP_LISTENER)
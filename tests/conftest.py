@@ -0,0 +1,25 @@
+"""Make the integration's modules importable without Home Assistant.
+
+Most modules are plain Python and are tested on their own. The package
+__init__ sets up config entries and needs Home Assistant, so the package is
+registered without running it, as tools/benchmark.py does. Tests of modules
+that import Home Assistant skip when it is not installed.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+for name, path in (
+    ("custom_components", ROOT / "custom_components"),
+    ("custom_components.apc_pdu", ROOT / "custom_components" / "apc_pdu"),
+):
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [str(path)]
+        sys.modules[name] = package
+
+# The simulated PDU agent used by the SNMP tests
+sys.path.insert(0, str(ROOT / "tools"))
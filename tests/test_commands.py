@@ -0,0 +1,76 @@
+"""Tests for pending outlet commands and staggered power-up."""
+
+import asyncio
+
+from custom_components.apc_pdu.commands import (
+    PendingCommands,
+    async_run_power_up,
+    plan_power_up,
+)
+from custom_components.apc_pdu.const import OUTLET_OFF, OUTLET_ON
+
+
+class _FakeCoordinator:
+    """Records when each power-up SET was sent."""
+
+    def __init__(self, host, duration=0.0, ok=True):
+        self.host = host
+        self.duration = duration
+        self.ok = ok
+        self.sent = []
+
+    async def async_set_outlets(self, outlets):
+        self.sent.append((asyncio.get_running_loop().time(), dict(outlets)))
+        await asyncio.sleep(self.duration)
+        return self.ok
+
+
+def test_pending_commands_resolve_on_reported_state():
+    pending = PendingCommands()
+    pending.add(1, OUTLET_ON, deadline=10)
+    pending.add(2, OUTLET_OFF, deadline=10)
+    assert pending.state(1) == OUTLET_ON
+
+    assert pending.resolve({1: OUTLET_ON, 2: OUTLET_ON}, now=5) == ([1], [])
+    assert pending.state(1) is None
+    # Unconfirmed until the deadline, then dropped
+    assert pending.resolve({2: OUTLET_ON}, now=11) == ([], [2])
+    assert not pending
+
+
+def test_plan_staggers_outlets_and_pdus():
+    first, second = object(), object()
+    plan = plan_power_up([(first, [1, 2]), (second, [5])], delay=2.0, pdu_delay=1.0)
+    assert plan == [
+        (0.0, [(first, {1: OUTLET_ON})]),
+        (1.0, [(second, {5: OUTLET_ON})]),
+        (2.0, [(first, {2: OUTLET_ON})]),
+    ]
+
+
+def test_plan_sends_simultaneous_outlets_in_one_step():
+    pdu = object()
+    assert plan_power_up([(pdu, [1, 2])], delay=0.0) == [
+        (0.0, [(pdu, {1: OUTLET_ON, 2: OUTLET_ON})])
+    ]
+
+
+def test_slow_pdu_neither_delays_others_nor_loses_its_spacing():
+    slow = _FakeCoordinator("slow", duration=0.3, ok=False)
+    fast = _FakeCoordinator("fast")
+    plan = plan_power_up([(slow, [1, 2, 3]), (fast, [1, 2, 3])], delay=0.05)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        failed = await async_run_power_up(plan)
+        return start, failed
+
+    start, failed = asyncio.run(run())
+    assert failed == ["slow"]
+
+    fast_times = [when - start for when, _ in fast.sent]
+    assert fast_times[-1] < 0.25
+
+    slow_times = [when for when, _ in slow.sent]
+    for previous, current in zip(slow_times, slow_times[1:]):
+        assert current - previous >= 0.3 + 0.05 - 0.01
@@ -0,0 +1,63 @@
+"""Tests for the energy accumulator."""
+
+import pytest
+
+from custom_components.apc_pdu.const import (
+    ENERGY_METHOD_LEFT,
+    ENERGY_METHOD_RIGHT,
+    ENERGY_METHOD_TRAPEZOIDAL,
+)
+from custom_components.apc_pdu.energy import EnergyAccumulator
+
+
+@pytest.mark.parametrize(
+    ("method", "expected"),
+    [
+        (ENERGY_METHOD_TRAPEZOIDAL, 0.2),
+        (ENERGY_METHOD_LEFT, 0.1),
+        (ENERGY_METHOD_RIGHT, 0.3),
+    ],
+)
+def test_integration_methods(method, expected):
+    energy = EnergyAccumulator(method=method, max_gap=7200)
+    assert energy.add(0, 100) == 0.0
+    assert energy.add(3600, 300) == pytest.approx(expected)
+    assert energy.total_kwh == pytest.approx(expected)
+
+
+def test_gaps_are_not_bridged():
+    energy = EnergyAccumulator(max_gap=60)
+    energy.add(0, 1000)
+    energy.add(30, 1000)
+    energy.add(330, 1000)
+    assert energy.total_kwh == pytest.approx(1000 * 30 / 3_600_000)
+    assert energy.gaps == 1
+    assert energy.missed_seconds == 300
+
+
+def test_samples_out_of_order_are_ignored():
+    energy = EnergyAccumulator(max_gap=60)
+    energy.add(10, 1000)
+    assert energy.add(10, 2000) == 0.0
+    assert energy.add(5, 2000) == 0.0
+    assert energy.total_kwh == 0.0
+
+
+def test_restore_adds_to_energy_integrated_before_it():
+    energy = EnergyAccumulator(max_gap=7200)
+    energy.add(0, 1000)
+    energy.add(3600, 1000)
+    energy.restore(50.0)
+    assert energy.total_kwh == pytest.approx(51.0)
+    # A second restore, e.g. the sensor added again, does not count twice
+    energy.restore(51.0)
+    assert energy.total_kwh == pytest.approx(51.0)
+
+
+def test_average_power_over_the_ring():
+    energy = EnergyAccumulator(max_gap=60, size=4)
+    assert energy.average_power() is None
+    for when, watts in ((0, 100), (10, 100), (20, 300), (30, 300), (40, 300)):
+        energy.add(when, watts)
+    # The ring holds the last four samples: 100, 300, 300, 300
+    assert energy.average_power() == pytest.approx((200 + 300 + 300) / 3)
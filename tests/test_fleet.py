@@ -0,0 +1,30 @@
+"""Tests for fleet host list parsing."""
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.apc_pdu.fleet import (  # noqa: E402
+    TooManyHostsError,
+    is_host_list,
+    parse_hosts,
+)
+
+
+def test_is_host_list():
+    assert not is_host_list("pdu1.example.com")
+    assert not is_host_list(" 10.0.0.5 ")
+    assert is_host_list("10.0.0.5, 10.0.0.6")
+    assert is_host_list("10.0.0.0/30")
+    assert is_host_list("pdu1 pdu2")
+
+
+def test_parse_hosts_expands_ranges_and_drops_duplicates():
+    assert parse_hosts("10.0.0.0/30; pdu1,10.0.0.1\n pdu1") == ["10.0.0.1", "10.0.0.2", "pdu1"]
+
+
+def test_parse_hosts_limits_the_number_of_addresses():
+    with pytest.raises(TooManyHostsError):
+        parse_hosts("10.0.0.0/16")
+    with pytest.raises(ValueError):
+        parse_hosts("10.0.0.0/33")
@@ -0,0 +1,76 @@
+"""Tests for the overcurrent guard."""
+
+import pytest
+
+from custom_components.apc_pdu.const import OUTLET_OFF, OUTLET_ON
+from custom_components.apc_pdu.guard import (
+    GUARD_CLEARED,
+    GUARD_EXHAUSTED,
+    GUARD_NEAR,
+    GUARD_NORMAL,
+    GUARD_TRIPPED,
+    OvercurrentGuard,
+    parse_shed_order,
+)
+
+
+def _guard(limit=10.0, hysteresis=1.0, shed_order=(3, 1, 2)):
+    guard = OvercurrentGuard()
+    guard.configure(limit, hysteresis, list(shed_order))
+    return guard
+
+
+def test_parse_shed_order():
+    assert parse_shed_order("3, 1,2") == [3, 1, 2]
+    assert parse_shed_order("") == []
+    for value in ("0,1", "1,1", "a,2", "-1"):
+        with pytest.raises(ValueError):
+            parse_shed_order(value)
+
+
+def test_disabled_guard_does_nothing():
+    guard = _guard(limit=0.0)
+    assert guard.evaluate(50.0, {1: OUTLET_ON}, {}) == ([], [])
+    assert not guard.watching
+
+
+def test_near_threshold_starts_and_stops_fast_polling():
+    guard = _guard()
+    assert guard.evaluate(9.5, {}, {}) == ([GUARD_NEAR], [])
+    assert guard.watching
+    assert guard.evaluate(9.6, {}, {}) == ([], [])
+    assert guard.evaluate(5.0, {}, {}) == ([GUARD_NORMAL], [])
+    assert not guard.watching
+
+
+def test_unmetered_pdu_sheds_one_outlet_per_reading():
+    guard = _guard()
+    states = {1: OUTLET_ON, 2: OUTLET_ON, 3: OUTLET_OFF}
+    actions, shed = guard.evaluate(11.0, states, {})
+    assert actions == [GUARD_NEAR, GUARD_TRIPPED]
+    assert shed == [1]
+
+    states[1] = OUTLET_OFF
+    assert guard.evaluate(10.5, states, {}) == ([], [2])
+
+
+def test_metered_pdu_sheds_just_enough_outlets():
+    guard = _guard()
+    states = {1: OUTLET_ON, 2: OUTLET_ON, 3: OUTLET_ON}
+    loads = {3: 1.0, 1: 2.5, 2: 4.0}
+    _, shed = guard.evaluate(12.0, states, loads)
+    # 12 - 1 - 2.5 = 8.5, below the limit minus the hysteresis
+    assert shed == [3, 1]
+
+
+def test_exhausted_then_cleared_below_the_hysteresis():
+    guard = _guard()
+    states = {1: OUTLET_OFF, 2: OUTLET_OFF, 3: OUTLET_OFF}
+    actions, shed = guard.evaluate(11.0, states, {})
+    assert GUARD_EXHAUSTED in actions and shed == []
+    # Reported once only
+    assert guard.evaluate(11.0, states, {}) == ([], [])
+    # Still tripped within the hysteresis
+    assert GUARD_CLEARED not in guard.evaluate(9.5, states, {})[0]
+    assert GUARD_CLEARED in guard.evaluate(8.5, states, {})[0]
+    assert not guard.tripped
@@ -0,0 +1,99 @@
+"""Tests for the polling and publishing policies."""
+
+import time
+
+from custom_components.apc_pdu.polling import (
+    DATA_CURRENT,
+    DATA_METADATA,
+    DATA_OUTLETS,
+    DATA_PROBES,
+    DEADBAND_CURRENT,
+    PollingPolicy,
+    PublishPolicy,
+)
+
+POLLED = {DATA_CURRENT, DATA_OUTLETS, DATA_METADATA, DATA_PROBES}
+
+
+def test_everything_is_due_before_the_first_poll():
+    policy = PollingPolicy()
+    assert policy.due(0) == POLLED
+    assert policy.next_interval(0).total_seconds() == 0
+
+
+def test_each_data_class_comes_due_at_its_own_interval():
+    policy = PollingPolicy(current_interval=30, outlet_interval=60)
+    policy.mark_polled(POLLED, now=100)
+    assert policy.due(120) == set()
+    assert policy.due(131) == {DATA_CURRENT}
+    assert policy.due(161) == {DATA_CURRENT, DATA_OUTLETS}
+    assert policy.next_interval(100).total_seconds() == 30
+
+
+def test_probes_never_schedule_a_poll_of_their_own():
+    policy = PollingPolicy(current_interval=30, outlet_interval=30)
+    policy.mark_polled({DATA_CURRENT, DATA_OUTLETS, DATA_METADATA}, now=100)
+    assert DATA_PROBES in policy.due(100)
+    assert policy.next_interval(100).total_seconds() == 30
+
+
+def test_failures_back_off_exponentially_up_to_the_limit():
+    policy = PollingPolicy(current_interval=30, outlet_interval=30, max_backoff=100)
+    policy.record_failure()
+    assert policy.next_interval(0).total_seconds() == 30
+    policy.record_failure()
+    assert policy.next_interval(0).total_seconds() == 60
+    policy.record_failure()
+    assert policy.next_interval(0).total_seconds() == 100
+    policy.mark_polled(POLLED, now=0)
+    assert policy.failures == 0
+
+
+def test_fast_polling_after_a_change():
+    policy = PollingPolicy(current_interval=30, outlet_interval=30, fast_interval=2, fast_window=20)
+    policy.mark_polled(POLLED, now=100)
+    policy.trigger_fast_poll(now=100)
+    assert policy.next_interval(100).total_seconds() == 2
+    assert policy.due(102) == {DATA_CURRENT, DATA_OUTLETS}
+    # Past the window the normal intervals apply again
+    assert policy.due(125) == set()
+
+
+def test_healthy_traps_slow_outlet_polling_to_reconciliation():
+    policy = PollingPolicy(current_interval=30, outlet_interval=30, reconcile_interval=300)
+    policy.push_enabled = True
+    policy.push_received()
+    now = time.monotonic()
+    policy.mark_polled(POLLED, now=now)
+    assert policy.due(now + 31) == {DATA_CURRENT}
+    assert DATA_OUTLETS in policy.due(now + 301)
+
+
+def test_publish_missing_values_whenever_they_change():
+    publish = PublishPolicy(heartbeat=0)
+    assert publish.should_publish(DEADBAND_CURRENT, None, 1.0, None)
+    assert publish.should_publish(DEADBAND_CURRENT, 1.0, None, 0)
+    assert not publish.should_publish(DEADBAND_CURRENT, None, None, 0)
+
+
+def test_publish_only_changes_beyond_the_deadband():
+    publish = PublishPolicy(current_deadband=0.1, heartbeat=0)
+    assert not publish.should_publish(DEADBAND_CURRENT, 1.0, 1.05, 0)
+    assert publish.should_publish(DEADBAND_CURRENT, 1.0, 1.2, 0)
+    # Values without a deadband kind are written on any change
+    assert publish.should_publish(None, 1.0, 1.05, 0)
+    assert not publish.should_publish(None, 1.0, 1.0, 0)
+
+
+def test_publish_percent_deadband_scales_with_the_value():
+    publish = PublishPolicy(percent_deadband=10, heartbeat=0)
+    assert not publish.should_publish(DEADBAND_CURRENT, 10.0, 10.5, 0)
+    assert publish.should_publish(DEADBAND_CURRENT, 10.0, 11.5, 0)
+
+
+def test_publish_heartbeat_writes_unchanged_values():
+    publish = PublishPolicy(current_deadband=1.0, heartbeat=60)
+    assert not publish.should_publish(DEADBAND_CURRENT, 1.0, 1.0, 0, now=30)
+    assert publish.should_publish(DEADBAND_CURRENT, 1.0, 1.0, 0, now=61)
+    assert publish.heartbeat_due(0, now=61)
+    assert not publish.heartbeat_due(None, now=61)
@@ -0,0 +1,67 @@
+"""Tests for the PDU snapshot arrays."""
+
+from custom_components.apc_pdu.const import OUTLET_OFF, OUTLET_ON
+from custom_components.apc_pdu.snapshot import PDUSnapshot
+
+
+def test_unreported_slots_read_as_none():
+    snapshot = PDUSnapshot(4, {"outlet_current": 4})
+    assert snapshot.outlet(1) is None
+    assert snapshot.outlet(9) is None
+    assert snapshot.reading("total_current") is None
+    assert snapshot.reading("outlet_current", 2) is None
+    assert snapshot.reading("phase_current", 1) is None
+
+
+def test_update_tracks_the_generation_each_slot_changed_in():
+    snapshot = PDUSnapshot(2, {"outlet_current": 2})
+    snapshot.update({
+        "outlets": {1: OUTLET_ON, 2: OUTLET_OFF},
+        "total_current": 1.5,
+        "outlet_current": {1: 0.5, 2: 1.0},
+    })
+    assert snapshot.generation == 1
+    assert snapshot.outlet(1) == OUTLET_ON
+    assert snapshot.reading("total_current") == 1.5
+    assert snapshot.reading("outlet_current", 2) == 1.0
+
+    snapshot.update({
+        "outlets": {1: OUTLET_ON, 2: OUTLET_ON},
+        "total_current": 1.5,
+        "outlet_current": {1: 0.5, 2: 1.5},
+    })
+    assert not snapshot.outlet_changed_since(1, 1)
+    assert snapshot.outlet_changed_since(2, 1)
+    assert not snapshot.reading_changed_since("total_current", 0, 1)
+    assert snapshot.reading_changed_since("outlet_current", 2, 1)
+
+
+def test_readings_missing_from_an_update_are_kept():
+    snapshot = PDUSnapshot(1, {"outlet_current": 1})
+    snapshot.update({"total_current": 1.0, "outlet_current": {1: 0.5}})
+    snapshot.update({"total_current": 1.0})
+    assert snapshot.reading("outlet_current", 1) == 0.5
+    assert not snapshot.reading_changed_since("outlet_current", 1, 1)
+
+
+def test_restore_only_seeds_unreported_slots():
+    snapshot = PDUSnapshot(2, {})
+    snapshot.restore_outlet(1, OUTLET_ON)
+    snapshot.restore_reading("total_current", 0, 2.0)
+    assert snapshot.outlet(1) == OUTLET_ON
+    assert snapshot.reading("total_current") == 2.0
+
+    snapshot.update({"outlets": {1: OUTLET_OFF}, "total_current": 3.0})
+    snapshot.restore_outlet(1, OUTLET_ON)
+    snapshot.restore_reading("total_current", 0, 2.0)
+    assert snapshot.outlet(1) == OUTLET_OFF
+    assert snapshot.reading("total_current") == 3.0
+
+
+def test_touch_outlets_marks_them_changed():
+    snapshot = PDUSnapshot(3, {})
+    snapshot.update({"outlets": {1: OUTLET_ON, 2: OUTLET_ON, 3: OUTLET_ON}})
+    snapshot.touch_outlets([2, 7])
+    assert snapshot.generation == 2
+    assert snapshot.outlet_changed_since(2, 1)
+    assert not snapshot.outlet_changed_since(1, 1)
@@ -0,0 +1,116 @@
+"""Tests for the SNMP session against the simulated PDU agent."""
+
+import asyncio
+
+import pytest
+
+from apc_pdu_sim import start_agents
+from custom_components.apc_pdu.const import (
+    BANK_CURRENT_OID,
+    DEVICE_MODEL_OID,
+    DEVICE_NAME_OID,
+    OUTLET_METERED_CURRENT_OID,
+    OUTLET_METERED_POWER_OID,
+    PHASE_CURRENT_OID,
+)
+from custom_components.apc_pdu.snmp import APCPDUSession, discover_capabilities
+
+
+def _run_against_agent(test, **agent_options):
+    """Run test(session, agent) against one simulated PDU."""
+
+    async def run():
+        [(agent, port)] = await start_agents(1, seed=1, **agent_options)
+        session = APCPDUSession("127.0.0.1", "public", port=port, timeout=1, retries=1)
+        try:
+            return await test(session, agent)
+        finally:
+            await session.async_close()
+            agent.transport.close()
+
+    return asyncio.run(run())
+
+
+def test_late_reply_is_never_read_as_the_next_answer():
+    async def test(session, agent):
+        # The agent answers after the only attempt timed out
+        session.configure(timeout=0.2, retries=1)
+        assert await session.async_get_string(DEVICE_NAME_OID) is None
+        agent.latency = 0.0
+        session.configure(timeout=1, retries=1)
+        model = await session.async_get_string(DEVICE_MODEL_OID)
+        values = await session.async_get_many([DEVICE_NAME_OID, DEVICE_MODEL_OID])
+        return model, values
+
+    model, values = _run_against_agent(test, latency=0.3)
+    assert model == str(values[DEVICE_MODEL_OID])
+    assert values[DEVICE_NAME_OID] is not None
+
+
+def test_discover_capabilities():
+    async def test(session, agent):
+        return await discover_capabilities(session)
+
+    capabilities = _run_against_agent(test, outlets=8, probes=2)
+    assert capabilities["metered_outlets"] == list(range(1, 9))
+    assert capabilities["probes"] == [1, 2]
+
+
+def test_table_walk_keeps_long_columns_past_short_ones():
+    columns = [OUTLET_METERED_CURRENT_OID, OUTLET_METERED_POWER_OID, PHASE_CURRENT_OID, BANK_CURRENT_OID]
+
+    async def test(session, agent):
+        # The agent truncates the reply, so the walk takes several requests
+        # while the phase column has long run past its single row
+        return await session.async_bulk_table(columns, max_repetitions=25)
+
+    table = _run_against_agent(test, outlets=24)
+    assert sorted(table[OUTLET_METERED_CURRENT_OID]) == list(range(1, 25))
+    assert sorted(table[OUTLET_METERED_POWER_OID]) == list(range(1, 25))
+    assert sorted(table[PHASE_CURRENT_OID]) == [1]
+    assert sorted(table[BANK_CURRENT_OID]) == [1, 2]
+
+
+def test_incomplete_discovery_is_not_mistaken_for_no_metering():
+    async def test(session, agent):
+        session.configure(timeout=0.1, retries=1)
+        agent.loss = 1.0
+        return await discover_capabilities(session)
+
+    assert _run_against_agent(test) is None
+
+
+def test_v3_privacy_round_trips_with_the_stock_security_model():
+    pytest.importorskip("puresnmp_plugins.priv.aes")
+    import puresnmp_plugins.security.usm as usm
+    from puresnmp import Auth, Priv, V3
+    from puresnmp.adt import HeaderData, Message, PlainMessage, ScopedPDU, V3Flags
+    from puresnmp.pdu import GetRequest, PDUContent
+    from puresnmp.util import localise_key
+    from puresnmp.varbind import VarBind
+    from x690.types import Integer, Null, ObjectIdentifier, OctetString
+
+    from custom_components.apc_pdu.snmp import _CachingUserSecurityModel
+
+    engine_id = b"\x80\x00\x13\x70\x01\x02\x03\x04"
+    credentials = V3("user", Auth(b"authpass12", "sha1"), Priv(b"privpass12", "aes"))
+    request = PlainMessage(
+        Integer(3),
+        HeaderData(42, 65000, V3Flags(True, True, True), 3),
+        b"",
+        ScopedPDU(
+            OctetString(engine_id),
+            OctetString(b""),
+            GetRequest(PDUContent(42, [VarBind(ObjectIdentifier(DEVICE_NAME_OID), Null())])),
+        ),
+    )
+    ours, stock = _CachingUserSecurityModel(), usm.UserSecurityModel()
+    for model in (ours, stock):
+        model.set_engine_timing(engine_id, 5, 1000)
+
+    for sender, receiver in ((ours, stock), (stock, ours)):
+        packet = bytes(sender.generate_request_message(request, engine_id, credentials))
+        received = receiver.process_incoming_message(Message.decode(packet), credentials)
+        assert received.scoped_pdu.data.value.request_id == 42
+    # puresnmp itself is left alone
+    assert usm.localise_key is localise_key
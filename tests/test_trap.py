@@ -0,0 +1,82 @@
+"""Tests for SNMP trap decoding and routing."""
+
+from datetime import timedelta
+from ipaddress import IPv4Address
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from puresnmp.pdu import PDUContent, Trap  # noqa: E402
+from puresnmp.types import IpAddress, TimeTicks  # noqa: E402
+from puresnmp.varbind import VarBind  # noqa: E402
+from x690.types import Integer, ObjectIdentifier, OctetString, Sequence  # noqa: E402
+from x690.util import encode_length  # noqa: E402
+
+from custom_components.apc_pdu.const import (  # noqa: E402
+    TRAP_ARG_INTEGER_OID,
+    TRAP_OUTLET_ON_OID,
+)
+from custom_components.apc_pdu.trap import SNMP_TRAP_OID, APCTrapListener  # noqa: E402
+
+PDU_ADDRESS = "10.0.0.5"
+
+
+class _FakeCoordinator:
+    def __init__(self) -> None:
+        self.traps = []
+
+    def async_handle_trap(self, trap_oid, values) -> None:
+        self.traps.append((trap_oid, values))
+
+
+def _v1_trap(generic: int, specific: int, community: bytes = b"public") -> bytes:
+    body = b"".join(bytes(value) for value in (
+        ObjectIdentifier("1.3.6.1.4.1.318"),
+        IpAddress(IPv4Address(PDU_ADDRESS)),
+        Integer(generic),
+        Integer(specific),
+        TimeTicks(timedelta(seconds=10)),
+        Sequence([Sequence([ObjectIdentifier(TRAP_ARG_INTEGER_OID), Integer(3)])]),
+    ))
+    pdu = b"\xa4" + encode_length(len(body)) + body
+    header = bytes(Integer(0)) + bytes(OctetString(community))
+    return b"\x30" + encode_length(len(header) + len(pdu)) + header + pdu
+
+
+def _v2c_trap(community: bytes = b"public") -> bytes:
+    pdu = Trap(PDUContent(1, [
+        VarBind(ObjectIdentifier(SNMP_TRAP_OID), ObjectIdentifier(TRAP_OUTLET_ON_OID)),
+        VarBind(ObjectIdentifier(TRAP_ARG_INTEGER_OID), Integer(3)),
+    ]))
+    return bytes(Sequence([Integer(1), OctetString(community), pdu]))
+
+
+def _listener():
+    coordinator = _FakeCoordinator()
+    listener = APCTrapListener()
+    listener.register(PDU_ADDRESS, "public", coordinator)
+    return listener, coordinator
+
+
+@pytest.mark.parametrize("packet", [_v1_trap(6, 41), _v2c_trap()], ids=["v1", "v2c"])
+def test_outlet_trap_reaches_the_coordinator(packet):
+    listener, coordinator = _listener()
+    listener.handle_packet(packet, (PDU_ADDRESS, 162))
+    assert coordinator.traps == [(TRAP_OUTLET_ON_OID, {TRAP_ARG_INTEGER_OID: 3})]
+
+
+def test_generic_v1_trap_maps_to_its_snmpv2_oid():
+    listener, coordinator = _listener()
+    # linkUp
+    listener.handle_packet(_v1_trap(3, 0), (PDU_ADDRESS, 162))
+    assert coordinator.traps[0][0] == "1.3.6.1.6.3.1.1.5.4"
+
+
+def test_traps_from_unknown_hosts_or_communities_are_dropped():
+    listener, coordinator = _listener()
+    listener.handle_packet(_v2c_trap(), ("10.0.0.6", 162))
+    listener.handle_packet(_v2c_trap(b"private"), (PDU_ADDRESS, 162))
+    listener.handle_packet(_v1_trap(6, 41, b"private"), (PDU_ADDRESS, 162))
+    listener.handle_packet(b"\x30\x03garbage", (PDU_ADDRESS, 162))
+    assert coordinator.traps == []
@@ -0,0 +1,312 @@
+"""Simulated APC PDU SNMP agent for offline development and benchmarking.
+
+Emulates the parts of the PowerNet MIB used by the integration: outlet
+control, outlet index and name, total current, device information, sysUpTime
+and, optionally, the rPDU2 metering tables. Supports SNMPv2c GET, GETNEXT,
+GETBULK and SET, with injectable latency, packet loss and a cap on concurrent
+requests (requests beyond the cap are dropped, like a busy NMC).
+
+Run one or more agents from the command line:
+
+    python tools/apc_pdu_sim.py --count 10 --base-port 16100 --outlets 24
+"""
+
+import argparse
+import asyncio
+import bisect
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from x690 import decode
+from x690.types import Integer, ObjectIdentifier, OctetString, Sequence
+from x690.util import get_value_slice
+from puresnmp.pdu import EndOfMibView, GetResponse, NoSuchObject, PDUContent
+from puresnmp.types import Gauge, TimeTicks
+from puresnmp.varbind import VarBind
+
+# OIDs mirrored from custom_components/apc_pdu/const.py
+BASE_OID = "1.3.6.1.4.1.318.1.1.4.4.2.1.3"
+MASTER_CONTROL_OID = "1.3.6.1.4.1.318.1.1.4.2.1.0"
+CURRENT_OID = "1.3.6.1.4.1.318.1.1.12.2.3.1.1.2.1"
+OUTLET_CONFIG_TABLE = "1.3.6.1.4.1.318.1.1.4.5.2.1"
+OUTLET_INDEX_OID = "1.3.6.1.4.1.318.1.1.12.3.3.1.1.1"
+OUTLET_NAME_OID = "1.3.6.1.4.1.318.1.1.12.3.3.1.1.2"
+DEVICE_NAME_OID = "1.3.6.1.4.1.318.1.1.12.1.1.0"
+DEVICE_MODEL_OID = "1.3.6.1.4.1.318.1.1.12.1.5.0"
+DEVICE_SERIAL_OID = "1.3.6.1.4.1.318.1.1.12.1.6.0"
+SYS_UPTIME_OID = "1.3.6.1.2.1.1.3.0"
+OUTLET_METERED_TABLE = "1.3.6.1.4.1.318.1.1.26.9.4.3.1"
+PHASE_CURRENT_OID = "1.3.6.1.4.1.318.1.1.26.6.3.1.5"
+BANK_CURRENT_OID = "1.3.6.1.4.1.318.1.1.26.8.3.1.5"
+PROBE_TABLE = "1.3.6.1.4.1.318.1.1.26.10.2.2.1"
+
+# PDU tags
+GET, GETNEXT, RESPONSE, SET, GETBULK = 0, 1, 2, 3, 5
+
+ERROR_NOT_WRITABLE = 17
+
+
+def _key(oid: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in oid.strip(".").split("."))
+
+
+class SimulatedPDU(asyncio.DatagramProtocol):
+    """One simulated APC PDU agent."""
+
+    def __init__(
+        self,
+        outlets: int = 24,
+        metered: bool = True,
+        probes: int = 0,
+        latency: float = 0.0,
+        loss: float = 0.0,
+        max_concurrent: int = 4,
+        max_message_size: int = 1472,
+        community: str = "public",
+        serial: str = "SIM0000001",
+        seed: Optional[int] = None,
+    ) -> None:
+        self.outlets = outlets
+        self.metered = metered
+        self.probes = probes
+        self.latency = latency
+        self.loss = loss
+        self.max_concurrent = max_concurrent
+        self.max_message_size = max_message_size
+        self.community = community.encode()
+        self.serial = serial
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.active = 0
+        self.stats = {"received": 0, "responded": 0, "lost": 0, "busy": 0, "bad": 0}
+        self.mib: Dict[Tuple[int, ...], object] = {}
+        self._keys: List[Tuple[int, ...]] = []
+        self._build_mib()
+
+    def _set(self, oid: str, value) -> None:
+        self.mib[_key(oid)] = value
+
+    def _build_mib(self) -> None:
+        self._set(DEVICE_NAME_OID, OctetString(f"Sim PDU {self.serial}".encode()))
+        self._set(DEVICE_MODEL_OID, OctetString(b"AP8941" if self.metered else b"AP7920B"))
+        self._set(DEVICE_SERIAL_OID, OctetString(self.serial.encode()))
+        self._set(SYS_UPTIME_OID, TimeTicks(0))
+        self._set(MASTER_CONTROL_OID, Integer(6))  # noCommand
+        self._set(CURRENT_OID, Gauge(0))
+        for outlet in range(1, self.outlets + 1):
+            self._set(f"{BASE_OID}.{outlet}", Integer(1))
+            self._set(f"{OUTLET_INDEX_OID}.{outlet}", Integer(outlet))
+            self._set(f"{OUTLET_NAME_OID}.{outlet}", OctetString(f"Outlet {outlet}".encode()))
+            self._set(f"{OUTLET_CONFIG_TABLE}.2.{outlet}", Integer(0))  # power-on delay
+            self._set(f"{OUTLET_CONFIG_TABLE}.4.{outlet}", Integer(0))  # power-off delay
+            self._set(f"{OUTLET_CONFIG_TABLE}.5.{outlet}", Integer(5))  # reboot duration
+            if self.metered:
+                self._set(f"{OUTLET_METERED_TABLE}.3.{outlet}", OctetString(f"Outlet {outlet}".encode()))
+                self._set(f"{OUTLET_METERED_TABLE}.6.{outlet}", Gauge(0))
+                self._set(f"{OUTLET_METERED_TABLE}.7.{outlet}", Gauge(0))
+                self._set(f"{OUTLET_METERED_TABLE}.11.{outlet}", Gauge(0))
+        if self.metered:
+            self._set(f"{PHASE_CURRENT_OID}.1", Gauge(0))
+            self._set(f"{BANK_CURRENT_OID}.1", Gauge(0))
+            self._set(f"{BANK_CURRENT_OID}.2", Gauge(0))
+        for probe in range(1, self.probes + 1):
+            self._set(f"{PROBE_TABLE}.3.{probe}", OctetString(f"Rack {probe}".encode()))
+            self._set(f"{PROBE_TABLE}.8.{probe}", Integer(220))
+            # Every other probe is temperature-only
+            self._set(f"{PROBE_TABLE}.10.{probe}", Integer(45 if probe % 2 else -1))
+        self._keys = sorted(self.mib)
+
+    def _refresh_readings(self) -> None:
+        """Move the live readings along so every poll sees fresh values."""
+        self._set(SYS_UPTIME_OID, TimeTicks(int((time.monotonic() - self.started) * 100)))
+        total = 0
+        for outlet in range(1, self.outlets + 1):
+            on = self.mib[_key(f"{BASE_OID}.{outlet}")].value == 1
+            current = self.random.randint(1, 8) if on else 0
+            total += current
+            if self.metered:
+                self._set(f"{OUTLET_METERED_TABLE}.6.{outlet}", Gauge(current))
+                self._set(f"{OUTLET_METERED_TABLE}.7.{outlet}", Gauge(current * 23))
+                energy = self.mib[_key(f"{OUTLET_METERED_TABLE}.11.{outlet}")].value
+                self._set(f"{OUTLET_METERED_TABLE}.11.{outlet}", Gauge(energy + (1 if on else 0)))
+        self._set(CURRENT_OID, Gauge(total))
+        if self.metered:
+            self._set(f"{PHASE_CURRENT_OID}.1", Gauge(total))
+            self._set(f"{BANK_CURRENT_OID}.1", Gauge(total // 2))
+            self._set(f"{BANK_CURRENT_OID}.2", Gauge(total - total // 2))
+        for probe in range(1, self.probes + 1):
+            self._set(f"{PROBE_TABLE}.8.{probe}", Integer(self.random.randint(200, 260)))
+
+    # -- MIB access ---------------------------------------------------------
+
+    def _get(self, oid: ObjectIdentifier) -> VarBind:
+        value = self.mib.get(_key(str(oid)))
+        return VarBind(oid, value if value is not None else NoSuchObject(b""))
+
+    def _get_next(self, oid: ObjectIdentifier) -> VarBind:
+        position = bisect.bisect_right(self._keys, _key(str(oid)))
+        if position >= len(self._keys):
+            # An empty value, x690 cannot encode the default None
+            return VarBind(oid, EndOfMibView(b""))
+        key = self._keys[position]
+        return VarBind(ObjectIdentifier(".".join(map(str, key))), self.mib[key])
+
+    def _set_value(self, oid: ObjectIdentifier, value) -> bool:
+        key = _key(str(oid))
+        if str(oid).startswith(BASE_OID + ".") and key in self.mib:
+            # 1=on, 2=off, 3=reboot (ends up on), delayed variants act immediately
+            command = value.value
+            self.mib[key] = Integer(2 if command in (2, 6) else 1)
+            return True
+        if str(oid) == MASTER_CONTROL_OID:
+            state = 2 if value.value in (3, 7) else 1
+            for outlet in range(1, self.outlets + 1):
+                self._set(f"{BASE_OID}.{outlet}", Integer(state))
+            return True
+        return False
+
+    # -- protocol -----------------------------------------------------------
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.stats["received"] += 1
+        if self.loss and self.random.random() < self.loss:
+            self.stats["lost"] += 1
+            return
+        if self.active >= self.max_concurrent:
+            self.stats["busy"] += 1
+            return
+        self.active += 1
+        asyncio.ensure_future(self._respond(data, addr))
+
+    async def _respond(self, data: bytes, addr) -> None:
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            response = self._handle(data)
+            if response is not None and self.transport is not None:
+                self.transport.sendto(response, addr)
+                self.stats["responded"] += 1
+        finally:
+            self.active -= 1
+
+    def _handle(self, data: bytes) -> Optional[bytes]:
+        try:
+            outer = get_value_slice(data, 0)
+            version, index = decode(data, outer.bounds.start, enforce_type=Integer)
+            community, index = decode(data, index, enforce_type=OctetString)
+            tag = data[index] & 0x1F
+            pdu = get_value_slice(data, index)
+            request_id, index = decode(data, pdu.bounds.start, enforce_type=Integer)
+            first, index = decode(data, index, enforce_type=Integer)
+            second, index = decode(data, index, enforce_type=Integer)
+            varbinds, _ = decode(data, index, enforce_type=Sequence)
+            oids = [item[0] for item in varbinds]
+        except Exception:
+            self.stats["bad"] += 1
+            return None
+        if community.value != self.community:
+            self.stats["bad"] += 1
+            return None
+
+        self._refresh_readings()
+        error_status = error_index = 0
+        if tag == GET:
+            result = [self._get(oid) for oid in oids]
+        elif tag == GETNEXT:
+            result = [self._get_next(oid) for oid in oids]
+        elif tag == GETBULK:
+            result = self._get_bulk(oids, first.value, second.value)
+        elif tag == SET:
+            result = []
+            for position, item in enumerate(varbinds, start=1):
+                if not self._set_value(item[0], item[1]) and not error_status:
+                    error_status, error_index = ERROR_NOT_WRITABLE, position
+                result.append(VarBind(item[0], item[1]))
+        else:
+            self.stats["bad"] += 1
+            return None
+
+        message = Sequence([
+            version,
+            community,
+            GetResponse(PDUContent(request_id.value, result, error_status, error_index)),
+        ])
+        return bytes(message)
+
+    def _get_bulk(self, oids, non_repeaters: int, max_repetitions: int) -> List[VarBind]:
+        result = [self._get_next(oid) for oid in oids[:non_repeaters]]
+        cursors = list(oids[non_repeaters:])
+        size = sum(len(bytes(Sequence([vb.oid, vb.value]))) for vb in result)
+        for _ in range(max_repetitions):
+            if not cursors:
+                break
+            row = [self._get_next(oid) for oid in cursors]
+            row_size = sum(len(bytes(Sequence([vb.oid, vb.value]))) for vb in row)
+            if size + row_size > self.max_message_size - 64:
+                # Agents truncate GETBULK responses instead of answering tooBig
+                break
+            result.extend(row)
+            size += row_size
+            if all(isinstance(vb.value, EndOfMibView) for vb in row):
+                break
+            cursors = [vb.oid for vb in row]
+        return result
+
+
+async def start_agents(
+    count: int = 1, host: str = "127.0.0.1", base_port: int = 0, **kwargs
+) -> List[Tuple[SimulatedPDU, int]]:
+    """Start simulated PDUs and return each with the UDP port it listens on."""
+    loop = asyncio.get_running_loop()
+    agents = []
+    for number in range(count):
+        port = base_port + number if base_port else 0
+        transport, agent = await loop.create_datagram_endpoint(
+            lambda: SimulatedPDU(serial=f"SIM{number:07d}", **kwargs),
+            local_addr=(host, port),
+        )
+        agents.append((agent, transport.get_extra_info("sockname")[1]))
+    return agents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1, help="number of PDUs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=16100)
+    parser.add_argument("--outlets", type=int, default=24)
+    parser.add_argument("--unmetered", action="store_true")
+    parser.add_argument("--probes", type=int, default=0, help="temperature/humidity probes per PDU")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss ratio")
+    parser.add_argument("--max-concurrent", type=int, default=4)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        agents = await start_agents(
+            args.count,
+            host=args.host,
+            base_port=args.base_port,
+            outlets=args.outlets,
+            metered=not args.unmetered,
+            probes=args.probes,
+            latency=args.latency,
+            loss=args.loss,
+            max_concurrent=args.max_concurrent,
+        )
+        print(f"{len(agents)} simulated PDUs on {args.host}:{agents[0][1]}-{agents[-1][1]}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
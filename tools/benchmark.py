@@ -0,0 +1,182 @@
+"""Benchmark the integration's SNMP traffic against simulated PDUs.
+
+Starts a fleet of simulated agents (tools/apc_pdu_sim.py) in a separate
+process and drives them with the integration's own APCPDUSession and
+discovery helpers, without Home Assistant. For each scenario it reports
+packets per PDU, p50/p99 latency and client CPU time per PDU:
+
+    discover  outlet names, device info and metering capabilities
+    poll      one coordinator cycle: outlet states and total current in one
+              GETBULK plus the metering table
+    sensor    the total current alone, as a sensor-only refresh
+
+    python tools/benchmark.py --pdus 1 10 50 200 --cycles 20
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+INTEGRATION = ROOT / "custom_components" / "apc_pdu"
+
+
+def _load_integration():
+    """Import const.py and snmp.py without the Home Assistant package init."""
+    package = types.ModuleType("apc_pdu")
+    package.__path__ = [str(INTEGRATION)]
+    sys.modules["apc_pdu"] = package
+    for name in ("const", "snmp"):
+        spec = importlib.util.spec_from_file_location(f"apc_pdu.{name}", INTEGRATION / f"{name}.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[f"apc_pdu.{name}"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["apc_pdu.const"], sys.modules["apc_pdu.snmp"]
+
+
+const, snmp = _load_integration()
+
+_CURRENT_COLUMN_OID = const.CURRENT_OID.rsplit(".", 1)[0]
+_METERING_OIDS = [
+    const.OUTLET_METERED_CURRENT_OID,
+    const.OUTLET_METERED_POWER_OID,
+    const.OUTLET_METERED_ENERGY_OID,
+    const.PHASE_CURRENT_OID,
+    const.BANK_CURRENT_OID,
+]
+
+
+async def _discover(session, state: Dict) -> None:
+    outlets = await snmp.discover_outlets(session)
+    await snmp.discover_device_info(session)
+    capabilities = await snmp.discover_capabilities(session)
+    state["outlet_count"] = len(outlets)
+    state["metering_rows"] = len(capabilities["metered_outlets"])
+    state["probe_oids"] = [
+        f"{oid}.{row - 1}"
+        for oid, capability in (
+            (const.PROBE_TEMPERATURE_OID, "probes"),
+            (const.PROBE_HUMIDITY_OID, "humidity_probes"),
+        )
+        for row in capabilities[capability]
+    ]
+
+
+async def _poll(session, state: Dict) -> None:
+    # Mirrors APCPDUCoordinator._async_poll with every data class due
+    result = await session.async_bulk_get(
+        [_CURRENT_COLUMN_OID, *state["probe_oids"]],
+        [const.BASE_OID],
+        max_repetitions=state["outlet_count"],
+    )
+    if result is None:
+        raise RuntimeError("no response")
+    if state["metering_rows"]:
+        await session.async_bulk_table(_METERING_OIDS, max_repetitions=state["metering_rows"] + 1)
+
+
+async def _sensor(session, state: Dict) -> None:
+    result = await session.async_bulk_get([_CURRENT_COLUMN_OID], [], max_repetitions=0)
+    if result is None:
+        raise RuntimeError("no response")
+
+
+SCENARIOS = {"discover": _discover, "poll": _poll, "sensor": _sensor}
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+async def _run_scenario(sessions, states, scenario: str, cycles: int) -> Dict:
+    handler = SCENARIOS[scenario]
+    latencies: List[float] = []
+    failures = 0
+    packets_before = sum(session.stats.packets for session in sessions)
+    cpu_before = time.process_time()
+
+    async def one(session, state) -> None:
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await handler(session, state)
+        except Exception:
+            failures += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(cycles):
+        await asyncio.gather(*(one(session, state) for session, state in zip(sessions, states)))
+
+    operations = len(sessions) * cycles
+    return {
+        "packets": (sum(session.stats.packets for session in sessions) - packets_before) / operations,
+        "p50": _percentile(latencies, 50) * 1000 if latencies else float("nan"),
+        "p99": _percentile(latencies, 99) * 1000 if latencies else float("nan"),
+        "cpu": (time.process_time() - cpu_before) / operations * 1000,
+        "failures": failures,
+    }
+
+
+async def _benchmark(args, count: int) -> List[Dict]:
+    command = [
+        sys.executable, str(Path(__file__).with_name("apc_pdu_sim.py")),
+        "--count", str(count),
+        "--base-port", str(args.base_port),
+        "--outlets", str(args.outlets),
+        "--latency", str(args.latency),
+        "--loss", str(args.loss),
+        "--probes", str(args.probes),
+    ]
+    if args.unmetered:
+        command.append("--unmetered")
+    simulator = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE)
+    try:
+        await simulator.stdout.readline()  # ready banner
+        sessions = [
+            snmp.APCPDUSession("127.0.0.1", "public", port=args.base_port + number, timeout=1, retries=2)
+            for number in range(count)
+        ]
+        states = [{} for _ in sessions]
+        results = []
+        for scenario in SCENARIOS:
+            cycles = 1 if scenario == "discover" else args.cycles
+            result = await _run_scenario(sessions, states, scenario, cycles)
+            results.append({"pdus": count, "scenario": scenario, **result})
+        for session in sessions:
+            await session.async_close()
+        return results
+    finally:
+        simulator.terminate()
+        await simulator.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdus", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--outlets", type=int, default=24)
+    parser.add_argument("--unmetered", action="store_true")
+    parser.add_argument("--probes", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--base-port", type=int, default=16100)
+    args = parser.parse_args()
+
+    print(f"{'PDUs':>5} {'scenario':<9} {'pkts/PDU':>9} {'p50 ms':>8} {'p99 ms':>8} {'CPU ms/PDU':>11} {'failed':>7}")
+    for count in args.pdus:
+        for row in asyncio.run(_benchmark(args, count)):
+            print(
+                f"{row['pdus']:>5} {row['scenario']:<9} {row['packets']:>9.1f} "
+                f"{row['p50']:>8.1f} {row['p99']:>8.1f} {row['cpu']:>11.2f} {row['failures']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()